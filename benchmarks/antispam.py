@@ -0,0 +1,160 @@
+"""Measure the anti-spam engine's per-message cost and memory, and the whole
+bot under a steady stream of chat with a few spammers in it.
+
+Usage: python -m benchmarks.antispam [--users 50000] [--rate 1000] [--seconds 10] [--spammers 8]
+
+The first part calls `SpamEngine.check` directly with simulated time, for
+messages spread over 1000 and `--users` authors, so the cost per message
+can be compared as the number of tracked users grows. It also reports
+memory per tracked user and how many users are tracked at once at
+`--rate` messages per second.
+
+The second part feeds MESSAGE_CREATE through discord.py's parsers to a bot
+from `benchmarks.fakes` at `--rate` messages per second, in real time, for
+`--seconds`. Each spammer floods in one way (rate, duplicates, mentions or
+attachments), everyone else chats normally. Reports handler latencies, how
+late messages were fed and who got muted.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from benchmarks import fakes
+from benchmarks.handlers import sentence
+from benchmarks.replay import in_flight, percentile
+from cogs.utils.metrics import HANDLER_LATENCY
+from cogs.utils.spam import SpamEngine
+
+KINDS = ("rate", "duplicates", "mentions", "attachments")
+
+
+def engine_run(users: int, messages: int, rate: float) -> None:
+    engine = SpamEngine()
+    authors = [random.randrange(10 ** 17, 10 ** 18) for _ in range(users)]
+    hashes = [hash(sentence(8)) for _ in range(1000)]
+    timings = []
+    most = 0
+    for i in range(messages):
+        now = i / rate
+        start = time.perf_counter()
+        engine.check(authors[i % users], now, random.choice(hashes), random.random() < 0.1, 0)
+        timings.append(time.perf_counter() - start)
+        most = max(most, len(engine.users))
+
+    print(f"{users:>6} users: check p50 {percentile(timings, 0.5) * 1e6:5.2f}us  "
+          f"p99 {percentile(timings, 0.99) * 1e6:5.2f}us  at most {most} tracked, "
+          f"{engine.evicted} evicted, {sum(engine.tripped.values())} tripped")
+
+
+def engine_memory(users: int) -> None:
+    engine = SpamEngine()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for id in range(users):
+        engine.check(id, 0.0, 1, 0, 0)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    print(f"Memory: {used / users:.0f}B per tracked user, {used / 1024 / 1024:.1f}MB for {users}")
+
+
+def spam_message(author, kind: str, members: list) -> dict:
+    extra = {}
+    content = sentence(8)
+    if kind == "duplicates":
+        content = "join my server discord.gg/free-nitro"
+    elif kind == "mentions":
+        targets = random.sample(members, 3)
+        content = " ".join(f"<@{member.id}>" for member in targets)
+        extra["mentions"] = [fakes.user_data(member.id) for member in targets]
+    elif kind == "attachments":
+        extra["attachments"] = [{"id": str(fakes.snowflake()), "filename": "spam.png", "size": 1024,
+                                 "url": "https://example.com/spam.png", "proxy_url": "https://example.com/spam.png"}
+                                for _ in range(2)]
+    return fakes.message_data(fakes.CHANNEL_GENERAL, fakes.user_data(author.id), content, **extra)
+
+
+async def bot_run(args) -> None:
+    bot = await fakes.make_bot(members=args.members)
+    members = [member for member in bot.guild.members if not member.bot and member.id != fakes.MOD_ID]
+    spammers = {member: KINDS[i % len(KINDS)] for i, member in enumerate(members[:args.spammers])}
+    chatters = members[args.spammers:]
+    # spammers send a message every `--spam-interval` seconds, rate spammers three times as often,
+    # the rest of `--rate` is chat
+    intervals = {kind: args.spam_interval / 3 if kind == "rate" else args.spam_interval for kind in KINDS}
+    due = {member: random.random() * intervals[kind] for member, kind in spammers.items()}
+
+    # Discord sends GUILD_MEMBER_UPDATE once the mute role is added, the fake HTTP client doesn't
+    muted = []
+
+    def schedule_unmute(id, date):
+        muted.append(id)
+        bot.guild.get_member(id)._roles.add(fakes.ROLE_MUTE)
+    bot.tasks.schedule_unmute = schedule_unmute
+
+    loop = asyncio.get_event_loop()
+    parsers = bot._connection.parsers
+    HANDLER_LATENCY.values.clear()
+    lateness = []
+    total = args.rate * args.seconds
+
+    start = loop.time()
+    for i in range(total):
+        at = i / args.rate
+        target = start + at
+        await asyncio.sleep(max(0.0, target - loop.time()))
+        lateness.append(max(0.0, loop.time() - target))
+        author = min(due, key=due.get) if due else None
+        if author is not None and due[author] <= at:
+            kind = spammers[author]
+            due[author] += intervals[kind]
+            data = spam_message(author, kind, members)
+        else:
+            data = fakes.message_data(fakes.CHANNEL_GENERAL, fakes.user_data(random.choice(chatters).id), sentence())
+        parsers["MESSAGE_CREATE"](data)
+
+    await asyncio.gather(*in_flight())
+    handled = loop.time() - start
+    await fakes.settle(bot)
+
+    print(f"Fed {total} messages at {args.rate}/s, handled in {handled:.2f}s, "
+          f"lateness p50 {percentile(lateness, 0.5) * 1000:.1f}ms p99 {percentile(lateness, 0.99) * 1000:.1f}ms")
+    for labels in sorted(HANDLER_LATENCY.values):
+        if labels[0] == "listener" and "message" in labels[1]:
+            print(f"  {labels[1]:<24} {HANDLER_LATENCY.count(labels):>8}x  "
+                  f"p50 {HANDLER_LATENCY.quantile(0.5, labels) * 1000:>8.3f}ms  "
+                  f"p99 {HANDLER_LATENCY.quantile(0.99, labels) * 1000:>8.3f}ms")
+
+    stats = bot.get_cog("AntiSpam").engine.stats()
+    caught = {member.id for member in spammers} & set(muted)
+    print(f"Tripped: " + ", ".join(f"{rule} {count}" for rule, count in stats['tripped'].items()) +
+          f"; {len(caught)}/{len(spammers)} spammers muted, {len(muted) - len(caught)} others muted, "
+          f"{len(muted)} mutes in all, {stats['users']} members tracked")
+    calls = bot.fake_http.calls
+    print(f"{sum(calls.values())} REST calls: " +
+          ", ".join(f"{route} x{count}" for route, count in calls.most_common()))
+    await fakes.close(bot)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50000, help="authors for the engine benchmark")
+    parser.add_argument("--messages", type=int, default=200000, help="messages for the engine benchmark")
+    parser.add_argument("--rate", type=int, default=1000, help="messages per second")
+    parser.add_argument("--seconds", type=int, default=10, help="length of the bot run")
+    parser.add_argument("--members", type=int, default=20000, help="members in the bot run's guild")
+    parser.add_argument("--spammers", type=int, default=8)
+    parser.add_argument("--spam-interval", type=float, default=1.0, help="seconds between each spammer's messages")
+    args = parser.parse_args()
+
+    random.seed(0)
+    for users in sorted({1000, args.users}):
+        engine_run(users, args.messages, args.rate)
+    engine_memory(args.users)
+    await bot_run(args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""Seed synthetic moderation cases and time paginated history lookups.
+
+Usage: python -m benchmarks.cases [--cases 1000000] [--users 200000] [--mods 50] [--host 127.0.0.1]
+
+Uses its own database (cuthbert_bench) and drops it first, so it never
+touches real cases.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+
+from cogs.utils.cases import CaseStore
+
+TYPES = ["kick", "ban", "unban", "mute", "unmute"]
+
+
+def seed(store: CaseStore, cases: int, users: int, mods: int, batch: int = 10000) -> float:
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    for offset in range(0, cases, batch):
+        docs = []
+        for _ in range(min(batch, cases - offset)):
+            docs.append({
+                "_id": ObjectId(),
+                "type": random.choice(TYPES),
+                # skewed so some users have long histories to page through
+                "user_id": int(random.paretovariate(1.2)) % users,
+                "moderator_id": random.randrange(mods),
+                "reason": "Synthetic case",
+                "punishment": None,
+                "timestamp": now - timedelta(seconds=random.randrange(3 * 365 * 86400)),
+            })
+        store.collection.insert_many(docs, ordered=False)
+    return time.perf_counter() - start
+
+
+def time_pages(store: CaseStore, field: str, ids: list, depth: int) -> list:
+    """Time every page lookup while walking `depth` pages for each id, in ms"""
+
+    timings = []
+    for id in ids:
+        after = None
+        for _ in range(depth):
+            start = time.perf_counter()
+            docs = store.page(field, id, after, 10)
+            timings.append((time.perf_counter() - start) * 1000)
+            if len(docs) < 10:
+                break
+            after = CaseStore.cursor(docs[-1])
+    return timings
+
+
+def time_counts(store: CaseStore, field: str, ids: list) -> list:
+    """Time counting every case of each id, in ms. `!cases` used to do this for
+    its page count, it grows with the history while a page doesn't"""
+
+    timings = []
+    for id in ids:
+        start = time.perf_counter()
+        store.collection.count_documents({field: id})
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name}: {len(timings)} lookups, p50 {statistics.median(timings):.2f}ms, "
+          f"p99 {p99:.2f}ms, max {timings[-1]:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--mods", type=int, default=50)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    client = MongoClient(host=args.host)
+    client.drop_database("cuthbert_bench")
+    store = CaseStore(database="cuthbert_bench", client=client)
+
+    elapsed = seed(store, args.cases, args.users, args.mods)
+    print(f"Seeded {args.cases} cases in {elapsed:.1f}s ({args.cases / elapsed:.0f}/s)")
+
+    # user 1 gets the most cases thanks to the pareto skew, the rest are random
+    users = [1] + random.sample(range(args.users), 200)
+    report("cases (user, 5 pages deep)", time_pages(store, "user_id", users, 5))
+    report("modcases (moderator, 50 pages deep)", time_pages(store, "moderator_id", list(range(args.mods)), 50))
+    report("count_documents (user)", time_counts(store, "user_id", users))
+    report("count_documents (moderator)", time_counts(store, "moderator_id", list(range(args.mods))))
+
+    # make sure deep pages are served from the index rather than a scan
+    after = CaseStore.cursor(store.page("moderator_id", 0, None, 500)[-1])
+    plan = store.collection.find({"moderator_id": 0, "$or": [
+        {"timestamp": {"$lt": after[0]}}, {"timestamp": after[0], "_id": {"$lt": after[1]}}]}).sort(
+        [("timestamp", -1), ("_id", -1)]).limit(10).explain()
+    stats = plan["executionStats"]
+    print(f"Deep modcases page examined {stats['totalKeysExamined']} keys and "
+          f"{stats['totalDocsExamined']} documents to return {stats['nReturned']}")
+
+    client.drop_database("cuthbert_bench")
+
+
+if __name__ == "__main__":
+    main()
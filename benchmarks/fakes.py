@@ -0,0 +1,355 @@
+"""Offline stand-ins for Discord and MongoDB, for benchmarks.
+
+`make_bot` builds a real `commands.Bot` with the real cogs loaded, but its
+HTTP client never touches the network: every REST request is counted and
+answered with a synthetic payload. The guild, channels, roles and members
+are real discord.py models built from gateway-shaped data, so handlers run
+exactly the code they run in production.
+"""
+
+import asyncio
+import itertools
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import discord
+from discord.ext import commands
+
+from cogs.utils.audit import AuditSink
+from cogs.utils.cases import CaseStore
+from cogs.utils.dispatcher import LogDispatcher
+from cogs.utils.filters import FilterStore
+from cogs.utils.message_cache import MessageCache
+from cogs.utils.outbound import DEFAULT_LIMIT, ROUTE_LIMITS, TokenBucket
+from cogs.utils.permissions import Level, PermissionResolver
+from cogs.utils.users import UserResolver
+
+GUILD_ID = 1000
+CHANNEL_PUBLIC = 1001
+CHANNEL_PRIVATE = 1002
+CHANNEL_GENERAL = 1003
+ROLE_MOD = 1004
+ROLE_MUTE = 1005
+BOT_ID = 1006
+MOD_ID = 1007
+
+EXTENSIONS = ['cogs.commands.modactions', 'cogs.commands.help', 'cogs.commands.logs', 'cogs.commands.filter',
+              'cogs.commands.antispam']
+
+# snowflakes for everything created during a run, above the fixed ones
+_ids = itertools.count(10 ** 17)
+
+
+def snowflake() -> int:
+    return next(_ids)
+
+
+def timestamp(offset: float = 0) -> str:
+    return (datetime.utcnow() + timedelta(seconds=offset)).isoformat() + "+00:00"
+
+
+def user_data(id: int, name: str = None, bot: bool = False) -> dict:
+    return {"id": str(id), "username": name or f"user{id % 100000}", "discriminator": f"{id % 10000:04}",
+            "avatar": None, "bot": bot}
+
+
+def member_data(id: int, roles: list = (), nick: str = None) -> dict:
+    return {"user": user_data(id), "roles": [str(role) for role in roles], "nick": nick,
+            "joined_at": timestamp(), "deaf": False, "mute": False}
+
+
+def message_data(channel_id: int, author: dict, content: str, id: int = None, **extra) -> dict:
+    data = {"id": str(id or snowflake()), "channel_id": str(channel_id), "guild_id": str(GUILD_ID),
+            "author": author, "content": content, "timestamp": timestamp(), "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": [], "pinned": False, "type": 0}
+    data.update(extra)
+    return data
+
+
+def guild_data(members: int = 100) -> dict:
+    everyone = {"id": str(GUILD_ID), "name": "@everyone", "permissions": str(discord.Permissions.general().value),
+                "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}
+    roles = [everyone] + [
+        {"id": str(id), "name": name, "permissions": "0", "position": position, "color": 0,
+         "hoist": False, "managed": False, "mentionable": False}
+        for position, (id, name) in enumerate([(ROLE_MUTE, "Muted"), (ROLE_MOD, "Moderator")], 1)]
+    channels = [{"id": str(id), "name": name, "type": 0, "position": position, "permission_overwrites": []}
+                for position, (id, name) in enumerate(
+                    [(CHANNEL_PUBLIC, "public-logs"), (CHANNEL_PRIVATE, "private-logs"), (CHANNEL_GENERAL, "general")])]
+
+    member_list = [member_data(BOT_ID), member_data(MOD_ID, roles=[ROLE_MOD])]
+    member_list[0]["user"]["bot"] = True
+    member_list += [member_data(snowflake()) for _ in range(members)]
+
+    return {"id": str(GUILD_ID), "name": "Benchmark", "owner_id": str(MOD_ID), "region": "us-east",
+            "roles": roles, "channels": channels, "members": member_list, "member_count": len(member_list),
+            "emojis": [], "features": [], "premium_tier": 0, "large": False}
+
+
+def embed_length(data: dict) -> int:
+    """Characters Discord counts towards the 6000 per message limit, like `len(discord.Embed)`"""
+
+    return (len(data.get("title", "")) + len(data.get("description", ""))
+            + sum(len(field["name"]) + len(field["value"]) for field in data.get("fields", ()))
+            + len(data.get("footer", {}).get("text", "")) + len(data.get("author", {}).get("name", "")))
+
+
+class FakeResponse():
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class FakeHTTP():
+    """Answers REST requests with synthetic payloads and counts them per route.
+
+    With `limits`, requests also wait for Discord's rate limits the way
+    discord.py does it: first come first served per bucket, then globally.
+    """
+
+    def __init__(self, latency: float = 0.0, limits: bool = False, global_limit: int = 50):
+        self.latency = latency
+        self.limits = limits
+        self.calls = Counter()
+        # user IDs that answer 404
+        self.unknown_users = set()
+        # messages over Discord's embed or field limits, answered with a 400
+        self.rejected = 0
+
+        self.buckets = {}
+        self.locks = {}
+        self.global_bucket = TokenBucket(global_limit, 1.0, time.monotonic())
+        self.global_lock = asyncio.Lock()
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    async def _take(self, bucket: TokenBucket) -> None:
+        while True:
+            now = time.monotonic()
+            bucket.refill(now)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return
+            await asyncio.sleep(bucket.ready_at(now) - now)
+
+    async def _rate_limit(self, route) -> None:
+        key = (route.method, route.bucket)
+        if key not in self.locks:
+            self.locks[key] = asyncio.Lock()
+            limit, per = ROUTE_LIMITS.get((route.method, route.path), DEFAULT_LIMIT)
+            self.buckets[key] = TokenBucket(limit, per, time.monotonic())
+        async with self.locks[key]:
+            await self._take(self.buckets[key])
+            async with self.global_lock:
+                await self._take(self.global_bucket)
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        self.calls[f"{route.method} {route.path}"] += 1
+        if self.limits:
+            await self._rate_limit(route)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            # a real request always yields to the loop at least once
+            await asyncio.sleep(0)
+
+        payload = kwargs.get("json") or {}
+        if route.method == "POST" and route.path == "/channels/{channel_id}/messages":
+            embeds = payload.get("embeds") or ()
+            if (len(embeds) > 10 or sum(embed_length(embed) for embed in embeds) > 6000
+                    or any(len(field["value"]) > 1024 for embed in embeds for field in embed.get("fields", ()))):
+                self.rejected += 1
+                raise discord.HTTPException(FakeResponse(400, "Bad Request"),
+                                            {"code": 50035, "message": "Invalid Form Body"})
+            return message_data(route.channel_id, user_data(BOT_ID, "cuthbert", bot=True),
+                                payload.get("content") or "", embeds=payload.get("embeds", []))
+        if route.method == "POST" and route.path == "/users/@me/channels":
+            return {"id": str(snowflake()), "type": 1, "recipients": [user_data(int(payload["recipient_id"]))]}
+        if route.method == "GET" and route.path == "/users/{user_id}":
+            # Route only keeps channel and guild IDs around
+            user_id = int(route.url.rsplit("/", 1)[1])
+            if user_id in self.unknown_users:
+                raise discord.NotFound(FakeResponse(404, "Not Found"), {"code": 10013, "message": "Unknown User"})
+            return user_data(user_id)
+        if route.method == "GET" and route.path == "/channels/{channel_id}/webhooks":
+            return []
+        if route.method == "POST" and route.path == "/channels/{channel_id}/webhooks":
+            id = snowflake()
+            return {"id": str(id), "type": 1, "token": f"token-{id}", "channel_id": str(route.channel_id),
+                    "name": payload.get("name"), "avatar": None, "user": user_data(BOT_ID, "cuthbert", bot=True)}
+        return None
+
+
+class DeleteResult():
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class FakeCollection():
+    """Enough of a pymongo collection for CaseStore, AuditSink and FilterStore"""
+
+    def __init__(self):
+        self.documents = []
+
+    def create_index(self, *args, **kwargs):
+        return "index"
+
+    def insert_one(self, document):
+        self.documents.append(document)
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+    def find(self, query):
+        return [document for document in self.documents
+                if all(document.get(key) == value for key, value in query.items())]
+
+    def replace_one(self, query, document, upsert=False):
+        self.delete_one(query)
+        self.documents.append(document)
+
+    def delete_one(self, query):
+        for i, document in enumerate(self.documents):
+            if all(document.get(key) == value for key, value in query.items()):
+                del self.documents[i]
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    def count_documents(self, query):
+        return sum(all(document.get(key) == value for key, value in query.items()) for document in self.documents)
+
+
+class FakeMongo():
+    def __init__(self):
+        self.databases = {}
+
+    def __getitem__(self, name):
+        if name not in self.databases:
+            self.databases[name] = FakeDatabase()
+        return self.databases[name]
+
+
+class FakeDatabase():
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection()
+        return self.collections[name]
+
+
+class FakeTasks():
+    """Counts scheduled and cancelled unmutes instead of scheduling them"""
+
+    def __init__(self):
+        self.scheduled = 0
+        self.cancelled = 0
+
+    def schedule_unmute(self, id, date):
+        self.scheduled += 1
+
+    def cancel_unmute(self, id):
+        self.cancelled += 1
+
+
+async def send_error(ctx, error):
+    pass
+
+
+async def make_bot(members: int = 100, latency: float = 0.0, guild: dict = None, config: dict = None,
+                   raid_window: float = 1) -> commands.Bot:
+    """Build a bot with the real cogs, connected to nothing
+
+    Parameters
+    ----------
+    members : int, optional
+        Members in the fake guild, by default 100
+    latency : float, optional
+        Seconds every fake REST request takes, by default 0.0
+    guild : dict, optional
+        GUILD_CREATE data to build the guild from instead, i.e from a recording
+    config : dict, optional
+        Bot user and IDs to go with `guild`, as written by `GatewayRecorder`
+    raid_window : float, optional
+        Raid summary window in seconds, production uses 60 but a short window
+        lets summaries finish quickly, by default 1
+
+    Returns
+    -------
+    commands.Bot
+        The bot, with `bot.fake_http` counting REST calls and `bot.guild` set
+    """
+
+    intents = discord.Intents.default()
+    intents.members = True
+    bot = commands.Bot(command_prefix="!", intents=intents, loop=asyncio.get_event_loop())
+    bot.remove_command("help")
+
+    bot.fake_http = FakeHTTP(latency)
+    bot.http.request = bot.fake_http.request
+
+    state = bot._connection
+    config = config or {"user": user_data(BOT_ID, "cuthbert", bot=True), "guild_id": GUILD_ID,
+                        "channel_public": CHANNEL_PUBLIC, "channel_private": CHANNEL_PRIVATE,
+                        "role_mod": ROLE_MOD, "role_mute": ROLE_MUTE}
+    state.user = discord.ClientUser(state=state, data=config["user"])
+    bot.guild = state._add_guild_from_data(guild or guild_data(members))
+
+    mongo = FakeMongo()
+    bot.tasks = FakeTasks()
+    bot.log_dispatcher = LogDispatcher(bot)
+    bot.cases = CaseStore(client=mongo)
+    bot.filters = FilterStore(client=mongo)
+    bot.audit = AuditSink(bot, client=mongo)
+    bot.message_cache_dir = tempfile.TemporaryDirectory()
+    bot.message_cache = MessageCache(f"{bot.message_cache_dir.name}/messages.db")
+    bot.channel_public = config["channel_public"]
+    bot.channel_private = config["channel_private"]
+    bot.role_mod = config["role_mod"]
+    bot.role_mute = config["role_mute"]
+    bot.guild_id = config["guild_id"]
+    bot.perms = PermissionResolver(bot, {bot.role_mod: Level.MOD})
+    bot.user_resolver = UserResolver(bot)
+    bot.raid_threshold = 10
+    bot.raid_window = raid_window
+    bot.transcript_format = "txt"
+    bot.filter_mute = 600
+    bot.spam_mute = 900
+    bot.send_error = send_error
+    for extension in EXTENSIONS:
+        bot.load_extension(extension)
+    return bot
+
+
+async def settle(bot: commands.Bot) -> float:
+    """Let everything that was deferred during a workload finish: raid summaries,
+    debounced logs, batched log embeds and audit records
+
+    Returns
+    -------
+    float
+        Seconds it took
+    """
+
+    start = time.perf_counter()
+    logs = bot.get_cog("Logging")
+    await asyncio.gather(*list(logs.summary_tasks.values()))
+    await logs.flush()
+    await bot.log_dispatcher.drain()
+    await bot.audit.drain()
+    return time.perf_counter() - start
+
+
+async def close(bot: commands.Bot) -> None:
+    for worker in bot.log_dispatcher.workers.values():
+        worker.cancel()
+    for extension in EXTENSIONS:
+        bot.unload_extension(extension)
+    bot.message_cache.close()
+    bot.message_cache_dir.cleanup()
@@ -0,0 +1,197 @@
+"""Drive synthetic workloads through the real cog handlers, fully offline.
+
+Usage: python -m benchmarks.handlers [--only joins,edits,deletes,bulk,help] [--latency 0]
+
+Every workload gets a fresh bot from `benchmarks.fakes`. Handlers are
+awaited directly one event at a time, the way discord.py's dispatcher runs
+them, and then everything they deferred (debounced logs, batched embeds,
+audit records) is left to finish so the REST call count is complete.
+
+A second, smaller pass runs under tracemalloc: "alloc KB/event" is the
+average peak of memory allocated while handling one event, "retained
+B/event" is what was still allocated after the whole pass, per event.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+import discord
+
+from benchmarks import fakes
+
+WORDS = ("the quick brown fox jumps over lazy dog ban mute kick please stop spamming "
+         "that channel is for memes not for support questions thanks").split()
+
+
+def sentence(length: int = 16) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(length))
+
+
+def make_message(bot, channel_id: int, author: discord.Member, content: str, id: int = None) -> discord.Message:
+    channel = bot.guild.get_channel(channel_id)
+    return bot._connection.create_message(
+        channel=channel, data=fakes.message_data(channel_id, fakes.user_data(author.id), content, id=id))
+
+
+async def joins(bot, count: int) -> list:
+    logs = bot.get_cog("Logging")
+    state = bot._connection
+    events = []
+    for _ in range(count):
+        member = discord.Member(data=fakes.member_data(fakes.snowflake()), guild=bot.guild, state=state)
+        bot.guild._add_member(member)
+        events.append(lambda member=member: logs.on_member_join(member))
+    return events
+
+
+async def edits(bot, messages: int, edits: int) -> list:
+    """`edits` rapid edits to each of `messages` messages, half of which fell out of
+    discord.py's message cache and arrive as raw events"""
+
+    logs = bot.get_cog("Logging")
+    authors = [member for member in bot.guild.members if not member.bot]
+    events = []
+    for i in range(messages):
+        words = sentence(24).split()
+        message = make_message(bot, fakes.CHANNEL_GENERAL, random.choice(authors), " ".join(words))
+        await logs.on_message(message)
+
+        before = message
+        for _ in range(edits):
+            words[random.randrange(len(words))] = random.choice(WORDS)
+            content = " ".join(words)
+            if i % 2:
+                payload = discord.RawMessageUpdateEvent({"id": str(message.id), "channel_id": str(message.channel.id),
+                                                         "guild_id": str(fakes.GUILD_ID), "content": content})
+                events.append(lambda payload=payload: logs.on_raw_message_edit(payload))
+            else:
+                after = make_message(bot, fakes.CHANNEL_GENERAL, message.author, content, id=message.id)
+                events.append(lambda before=before, after=after: logs.on_message_edit(before, after))
+                before = after
+
+    # the storm arrives interleaved, not one message at a time
+    random.shuffle(events)
+    return events
+
+
+async def deletes(bot, count: int) -> list:
+    """Deletes of long messages with an attachment, whose log embeds are 600 to 700 characters each"""
+
+    logs = bot.get_cog("Logging")
+    authors = [member for member in bot.guild.members if not member.bot]
+    channel = bot.guild.get_channel(fakes.CHANNEL_GENERAL)
+    events = []
+    for _ in range(count):
+        id = fakes.snowflake()
+        url = f"https://cdn.discordapp.com/attachments/{fakes.CHANNEL_GENERAL}/{id}/screenshot_{id % 1000}.png"
+        attachment = {"id": str(id), "filename": "screenshot.png", "size": 1024, "url": url, "proxy_url": url}
+        data = fakes.message_data(fakes.CHANNEL_GENERAL, fakes.user_data(random.choice(authors).id),
+                                  sentence(random.randint(100, 150)), id=id, attachments=[attachment])
+        message = bot._connection.create_message(channel=channel, data=data)
+        await logs.on_message(message)
+        payload = discord.RawMessageDeleteEvent({"id": str(message.id), "channel_id": str(message.channel.id),
+                                                 "guild_id": str(fakes.GUILD_ID)})
+        events.append(lambda payload=payload: logs.on_raw_message_delete(payload))
+    return events
+
+
+async def bulk(bot, size: int, batches: int) -> list:
+    logs = bot.get_cog("Logging")
+    authors = [member for member in bot.guild.members if not member.bot]
+    events = []
+    for _ in range(batches):
+        messages = [make_message(bot, fakes.CHANNEL_GENERAL, random.choice(authors), sentence())
+                    for _ in range(size)]
+        events.append(lambda messages=messages: logs.on_bulk_message_delete(messages))
+    return events
+
+
+async def help(bot, count: int) -> list:
+    moderator = bot.guild.get_member(fakes.MOD_ID)
+    commands = ["!help", "!help ban", "!usage mute", "!help purge"]
+    events = []
+    for i in range(count):
+        message = make_message(bot, fakes.CHANNEL_GENERAL, moderator, commands[i % len(commands)])
+        events.append(lambda message=message: bot.process_commands(message))
+    return events
+
+
+WORKLOADS = {
+    "joins": (joins, lambda args: {"count": args.joins}),
+    "edits": (edits, lambda args: {"messages": args.edit_messages, "edits": args.edits}),
+    "deletes": (deletes, lambda args: {"count": args.deletes}),
+    "bulk": (bulk, lambda args: {"size": args.bulk_size, "batches": args.bulk_batches}),
+    "help": (help, lambda args: {"count": args.help}),
+}
+
+
+async def run(name: str, build, kwargs: dict, latency: float, alloc_sample: int) -> None:
+    bot = await fakes.make_bot(latency=latency)
+    events = await build(bot, **kwargs)
+
+    timings = []
+    start = time.perf_counter()
+    for event in events:
+        event_start = time.perf_counter()
+        await event()
+        timings.append(time.perf_counter() - event_start)
+    elapsed = time.perf_counter() - start
+    settle = await fakes.settle(bot)
+    calls = bot.fake_http.calls
+    rejected = bot.fake_http.rejected
+    failed = bot.log_dispatcher.failed_flushes
+    await fakes.close(bot)
+
+    # allocations are measured separately, tracemalloc would skew the timings
+    bot = await fakes.make_bot(latency=latency)
+    events = (await build(bot, **kwargs))[:alloc_sample]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peaks = 0
+    for event in events:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        await event()
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    await fakes.settle(bot)
+    await fakes.close(bot)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+    print(f"{name:<6} {len(timings):>7} events  {len(timings) / elapsed:>9.0f}/s  "
+          f"p50 {p50:>7.3f}ms  p99 {p99:>7.3f}ms  "
+          f"alloc {peaks / len(events) / 1024:>7.1f}KB/event  retained {retained / len(events):>7.0f}B/event  "
+          f"settle {settle:.2f}s")
+    print(f"       {sum(calls.values())} REST calls ({rejected} rejected, {failed} failed log flushes): " +
+          ", ".join(f"{route} x{count}" for route, count in calls.most_common()))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", default=",".join(WORKLOADS), help="comma separated workloads to run")
+    parser.add_argument("--joins", type=int, default=10000)
+    parser.add_argument("--edit-messages", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=25)
+    parser.add_argument("--deletes", type=int, default=2000)
+    parser.add_argument("--bulk-size", type=int, default=1000)
+    parser.add_argument("--bulk-batches", type=int, default=10)
+    parser.add_argument("--help-count", dest="help", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every fake REST request takes")
+    parser.add_argument("--alloc-sample", type=int, default=1000, help="events measured under tracemalloc")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    for name in args.only.split(","):
+        build, kwargs = WORKLOADS[name]
+        await run(name, build, kwargs(args), args.latency, args.alloc_sample)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""Compare request latency per priority class with and without the outbound scheduler.
+
+Usage: python -m benchmarks.outbound [--audit 1000] [--channels 100] [--actions 50] [--responses 30]
+
+Simulates a raid: a burst of audit log requests spread over many buckets,
+enough to hit the global rate limit, a mass ban running alongside it, and
+moderators getting replies every half second. Requests go to the fake HTTP
+client from `benchmarks.fakes`, emulating discord.py's first come first
+served rate limit handling, either directly or through `OutboundScheduler`.
+"""
+
+import argparse
+import asyncio
+
+from discord.http import Route
+
+from benchmarks.fakes import FakeHTTP
+from cogs.utils.outbound import OutboundScheduler, Priority, RequestShed, priority
+
+
+class Client():
+    def __init__(self, http: FakeHTTP):
+        self.request = http.request
+
+
+async def scenario(client, args) -> dict:
+    loop = asyncio.get_event_loop()
+    latencies = {level: [] for level in Priority}
+    shed = {level: 0 for level in Priority}
+
+    async def send(level, route):
+        with priority(level):
+            start = loop.time()
+            try:
+                await client.request(route, json={"content": "benchmark"})
+            except RequestShed:
+                shed[level] += 1
+                return
+            latencies[level].append(loop.time() - start)
+
+    tasks = [loop.create_task(send(Priority.AUDIT, Route('POST', '/channels/{channel_id}/messages',
+                                                         channel_id=20000 + i % args.channels)))
+             for i in range(args.audit)]
+
+    semaphore = asyncio.Semaphore(5)
+
+    async def ban(user_id):
+        async with semaphore:
+            await send(Priority.MOD_ACTION, Route('PUT', '/guilds/{guild_id}/bans/{user_id}',
+                                                  guild_id=1000, user_id=user_id))
+
+    tasks += [loop.create_task(ban(user_id)) for user_id in range(args.actions)]
+
+    for i in range(args.responses):
+        tasks.append(loop.create_task(send(Priority.MOD_RESPONSE, Route(
+            'POST', '/channels/{channel_id}/messages', channel_id=10000 + i % 3))))
+        await asyncio.sleep(0.5)
+
+    await asyncio.gather(*tasks)
+    return latencies, shed
+
+
+def report(name: str, latencies: dict, shed: dict) -> None:
+    print(name)
+    for level in Priority:
+        values = sorted(latencies[level])
+        if not values:
+            continue
+        p50 = values[len(values) // 2] * 1000
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))] * 1000
+        print(f"  {level.name:<13} {len(values):>5} sent  {shed[level]:>5} shed  "
+              f"p50 {p50:>8.1f}ms  p99 {p99:>8.1f}ms  max {values[-1] * 1000:>8.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--audit", type=int, default=1000, help="audit log requests in the burst")
+    parser.add_argument("--channels", type=int, default=100, help="buckets the audit requests are spread over")
+    parser.add_argument("--actions", type=int, default=50, help="bans, 5 at a time")
+    parser.add_argument("--responses", type=int, default=30, help="replies to moderators, one every 0.5s")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every fake REST request takes")
+    parser.add_argument("--max-audit", type=int, default=500, help="queued audit requests before shedding")
+    args = parser.parse_args()
+
+    client = Client(FakeHTTP(args.latency, limits=True))
+    report("discord.py only", *await scenario(client, args))
+
+    client = Client(FakeHTTP(args.latency, limits=True))
+    OutboundScheduler(client, max_audit=args.max_audit)
+    report("outbound scheduler", *await scenario(client, args))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Compare permission checks through the role scan and through the permission index.
+
+Usage: python -m benchmarks.permissions [--members 50000] [--roles 50] [--checks 100000]
+
+Builds a guild where every member has a few of `--roles` roles, then times
+what `check_permissions` used to do (look up the mod role, scan the author's
+roles, compare top roles) against `PermissionResolver`, along with the cost
+of rebuilding the index and of updating it for one member's role change.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import fakes
+from cogs.utils.permissions import Level, PermissionResolver
+
+
+def old_check(guild, role_mod, author, user) -> bool:
+    mod_role = guild.get_role(role_mod)
+    return mod_role in author.roles and user.top_role < author.top_role
+
+
+def new_check(perms, author, user) -> bool:
+    return perms.has(author, Level.MOD) and perms.outranks(author, user)
+
+
+def timed(function, args, repeat: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        function(*args[i % len(args)])
+    return (time.perf_counter() - start) / repeat
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--roles", type=int, default=50, help="extra roles in the guild")
+    parser.add_argument("--checks", type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    data = fakes.guild_data(0)
+    roles = [fakes.snowflake() for _ in range(args.roles)]
+    data["roles"] += [{"id": str(id), "name": f"role{i}", "permissions": "0", "position": i + 3, "color": 0,
+                       "hoist": False, "managed": False, "mentionable": False} for i, id in enumerate(roles)]
+    data["members"] += [fakes.member_data(fakes.snowflake(), roles=random.sample(roles, random.randint(0, 4)))
+                        for _ in range(args.members)]
+    # the moderator sits above every other role
+    data["roles"][2]["position"] = args.roles + 3
+
+    bot = await fakes.make_bot(guild=data)
+    guild = bot.guild
+    perms = PermissionResolver(bot, {bot.role_mod: Level.MOD})
+
+    rebuilds = [perms.rebuild() for _ in range(5)]
+    print(f"Index rebuild for {len(guild.members)} members: {min(rebuilds) * 1000:.1f}ms "
+          f"({len(perms.members)} indexed)")
+
+    author = guild.get_member(fakes.MOD_ID)
+    members = random.sample(guild.members, 1000)
+    old = timed(old_check, [(guild, bot.role_mod, author, member) for member in members], args.checks)
+    new = timed(new_check, [(perms, author, member) for member in members], args.checks)
+    print(f"Check: role scan {old * 1e6:.2f}us, index {new * 1e6:.2f}us ({old / new:.1f}x)")
+
+    assert all(old_check(guild, bot.role_mod, author, member) == new_check(perms, author, member)
+               for member in members)
+
+    member = members[0]
+    start = time.perf_counter()
+    for i in range(args.checks):
+        perms._update(member)
+    print(f"Incremental update for one member: {(time.perf_counter() - start) / args.checks * 1e6:.2f}us")
+    await fakes.close(bot)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+"""Replay a gateway recording through the real cogs, fully offline.
+
+Usage: python -m benchmarks.replay recording.jsonl.gz [--speed 1] [--session 0] [--latency 0]
+
+Recordings are made by the bot itself when GATEWAY_RECORD_PATH is set (see
+`cogs.utils.recorder`). `--speed 1` replays in real time, `--speed 10` ten
+times faster and `--speed 0` as fast as the bot can take it. Dispatches go
+through discord.py's own parsers, so listeners and commands run exactly as
+on a live connection, against the fake HTTP client and guild from
+`benchmarks.fakes`.
+
+Reports how late events were fed (the loop was too busy to keep up), how
+many handlers were in flight at once, handler latencies, loop stalls and
+REST calls.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+from collections import Counter
+
+from discord.client import _ClientEventTask
+
+from benchmarks import fakes
+from cogs.utils.loop_monitor import LoopMonitor
+from cogs.utils.metrics import HANDLER_LATENCY
+
+
+def read(path: str, session: int):
+    """Yield `(seconds, event, data)` for one session of a recording, starting
+    with its HEADER and GUILD_CREATE"""
+
+    current = -1
+    with gzip.open(path, "rt", encoding="UTF-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry[1] == "HEADER":
+                current += 1
+                if current > session:
+                    return
+            if current == session:
+                yield entry
+
+    if current < session:
+        raise SystemExit(f"{path} only has {current + 1} sessions")
+
+
+def in_flight() -> list:
+    return [task for task in asyncio.all_tasks() if isinstance(task, _ClientEventTask) and not task.done()]
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def replay(path: str, session: int, speed: float, latency: float, sample: int) -> None:
+    events = read(path, session)
+    _, _, config = next(events)
+    _, _, guild = next(events)
+
+    # raid summaries cover a minute of recorded time
+    raid_window = 60 / speed if speed else 1
+    bot = await fakes.make_bot(latency=latency, guild=guild, config=config, raid_window=raid_window)
+    monitor = LoopMonitor(bot, report_interval=3600)
+    monitor.start()
+
+    loop = asyncio.get_event_loop()
+    parsers = bot._connection.parsers
+    counts = Counter()
+    lateness = []
+    backlog = 0
+    recorded = 0.0
+
+    start = loop.time()
+    for i, (at, event, data) in enumerate(events):
+        recorded = at
+        # reading from a real websocket yields at least once per event, even when behind
+        if speed:
+            target = start + at / speed
+            await asyncio.sleep(max(0.0, target - loop.time()))
+            lateness.append(max(0.0, loop.time() - target))
+        else:
+            await asyncio.sleep(0)
+
+        parsers[event](data)
+        counts[event] += 1
+        if i % sample == 0:
+            backlog = max(backlog, len(in_flight()))
+
+    fed = loop.time() - start
+    await asyncio.gather(*in_flight())
+    handled = loop.time() - start
+    settle = await fakes.settle(bot)
+    monitor.stop()
+
+    total = sum(counts.values())
+    print(f"Replayed {total} events ({recorded:.0f}s recorded) in {handled:.2f}s "
+          f"({total / handled:.0f} events/s), fed in {fed:.2f}s, settled in {settle:.2f}s")
+    print("  " + ", ".join(f"{event} x{count}" for event, count in counts.most_common()))
+    if speed:
+        print(f"Feed lateness: p50 {percentile(lateness, 0.5) * 1000:.1f}ms, "
+              f"p99 {percentile(lateness, 0.99) * 1000:.1f}ms, max {max(lateness, default=0) * 1000:.1f}ms")
+    print(f"Most handlers in flight: {backlog}")
+
+    print("Handlers:")
+    for labels in sorted(HANDLER_LATENCY.values):
+        print(f"  {labels[1]:<24} {HANDLER_LATENCY.count(labels):>8}x  "
+              f"p50 {HANDLER_LATENCY.quantile(0.5, labels) * 1000:>8.3f}ms  "
+              f"p99 {HANDLER_LATENCY.quantile(0.99, labels) * 1000:>8.3f}ms")
+
+    loop_stats = monitor.stats()
+    print(f"Event loop: lag p99 {loop_stats['lag_p99'] * 1000:.1f}ms, {loop_stats['slow_callbacks']} slow callbacks")
+    for source, count in sorted(loop_stats['sources'].items(), key=lambda item: item[1], reverse=True):
+        print(f"  {source} x{count}")
+
+    calls = bot.fake_http.calls
+    print(f"{sum(calls.values())} REST calls: " +
+          ", ".join(f"{route} x{count}" for route, count in calls.most_common()))
+    await fakes.close(bot)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 for real time, 10 for ten times faster, 0 for unbounded")
+    parser.add_argument("--session", type=int, default=0, help="which recording session in the file to replay")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every fake REST request takes")
+    parser.add_argument("--sample", type=int, default=500, help="events between counts of handlers in flight")
+    args = parser.parse_args()
+
+    asyncio.run(replay(args.path, args.session, args.speed, args.latency, args.sample))
+
+
+if __name__ == "__main__":
+    main()
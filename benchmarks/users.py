@@ -0,0 +1,75 @@
+"""Compare user lookups for a raid list through fetch_user and through UserResolver.
+
+Usage: python -m benchmarks.users [--ids 500] [--unknown 0.2] [--members 0.1] [--passes 3] [--mods 2]
+
+Moderators work through the same raid list of IDs: some are members,
+some deleted accounts (the API answers 404), the rest users who aren't in
+the server. Each of `--mods` moderators goes through the list `--passes`
+times, all at once, the way duplicate `!ban`s and retries pile up during a
+raid. Lookups go to the fake HTTP client from `benchmarks.fakes`.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import discord
+
+from benchmarks import fakes
+from cogs.utils.users import UserResolver
+
+
+async def run(name: str, lookup, bot, ids: list, args) -> None:
+    bot.fake_http.calls.clear()
+    found = unknown = 0
+    semaphore = asyncio.Semaphore(10)
+
+    async def moderator():
+        nonlocal found, unknown
+        for _ in range(args.passes):
+            for id in ids:
+                async with semaphore:
+                    try:
+                        await lookup(id)
+                        found += 1
+                    except discord.NotFound:
+                        unknown += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(moderator() for _ in range(args.mods)))
+    elapsed = time.perf_counter() - start
+    api = bot.fake_http.calls["GET /users/{user_id}"]
+    print(f"{name:<14} {found + unknown} lookups ({unknown} unknown) in {elapsed:.2f}s, {api} API calls")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, default=500, help="IDs on the raid list")
+    parser.add_argument("--unknown", type=float, default=0.2, help="share of IDs that don't exist")
+    parser.add_argument("--members", type=float, default=0.1, help="share of IDs that are in the server")
+    parser.add_argument("--passes", type=int, default=3, help="times each moderator goes through the list")
+    parser.add_argument("--mods", type=int, default=2, help="moderators working through the list at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every fake REST request takes")
+    args = parser.parse_args()
+
+    random.seed(0)
+    bot = await fakes.make_bot(members=int(args.ids * args.members), latency=args.latency)
+    members = [member.id for member in bot.guild.members if not member.bot][:int(args.ids * args.members)]
+    others = [fakes.snowflake() for _ in range(args.ids - len(members))]
+    bot.fake_http.unknown_users.update(random.sample(others, int(args.ids * args.unknown)))
+    ids = members + others
+    random.shuffle(ids)
+
+    await run("fetch_user", bot.fetch_user, bot, ids, args)
+
+    resolver = UserResolver(bot)
+    await run("UserResolver", resolver.resolve, bot, ids, args)
+    stats = resolver.stats()
+    print(f"{'':<14} {stats['hit_rate']:.1%} hit rate, {stats['saved_calls']} calls saved: " +
+          ", ".join(f"{source} {count}" for source, count in stats['lookups'].items()))
+    await fakes.close(bot)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""Compare log delivery rate through the bot's own route and through a webhook pool.
+
+Usage: python -m benchmarks.webhooks [--embeds 300] [--sizes 1,2,4] [--channel-cap 0]
+
+Floods the private log channel with embeds and times how long the
+dispatcher takes to deliver them. The bot's route goes to the fake HTTP
+client from `benchmarks.fakes` with Discord's rate limits emulated. Webhook
+executions go over real HTTP to a local stand-in for Discord's webhook
+endpoint, which answers 429s the way Discord does when a webhook (or, with
+`--channel-cap`, the channel) runs out of requests.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import discord
+from aiohttp import web
+
+from benchmarks import fakes
+from cogs.utils.outbound import TokenBucket
+from cogs.utils.webhooks import WEBHOOK_LIMIT, WebhookPool
+
+
+def json_response(data: dict, status: int = 200, headers: dict = None) -> web.Response:
+    # discord.py compares the content type exactly, without a charset
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={"Content-Type": "application/json", **(headers or {})})
+
+
+class WebhookServer():
+    """Local stand-in for `POST /webhooks/{id}/{token}`"""
+
+    def __init__(self, channel_cap: int = 0):
+        self.buckets = {}
+        self.channel_bucket = TokenBucket(channel_cap, 60.0, time.monotonic()) if channel_cap else None
+        self.messages = 0
+        self.embeds = 0
+        self.limited = 0
+
+        self.app = web.Application()
+        self.app.router.add_post("/webhooks/{id}/{token}", self.execute)
+        self.runner = None
+        self.base = None
+
+    async def start(self) -> None:
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+    def _limited(self, bucket: TokenBucket, now: float):
+        bucket.refill(now)
+        if bucket.tokens >= 1:
+            return None
+        self.limited += 1
+        retry_after = bucket.ready_at(now) - now
+        # discord.py only trusts 429s that came through Discord's proxy
+        return json_response({"message": "You are being rate limited.", "retry_after": retry_after * 1000,
+                              "global": False}, status=429, headers={"Via": "1.1 google"})
+
+    async def execute(self, request: web.Request) -> web.Response:
+        now = time.monotonic()
+        bucket = self.buckets.get(request.match_info["id"])
+        if bucket is None:
+            bucket = self.buckets[request.match_info["id"]] = TokenBucket(*WEBHOOK_LIMIT, now)
+
+        for limit in (bucket, self.channel_bucket):
+            if limit is not None:
+                response = self._limited(limit, now)
+                if response is not None:
+                    return response
+        bucket.tokens -= 1
+        if self.channel_bucket is not None:
+            self.channel_bucket.tokens -= 1
+
+        if request.content_type == "application/json":
+            payload = await request.json()
+        else:
+            form = await request.post()
+            payload = json.loads(form["payload_json"])
+        self.messages += 1
+        self.embeds += len(payload.get("embeds") or ())
+        return json_response({})
+
+
+async def flood(bot, embeds: int) -> float:
+    channel = bot.get_channel(bot.channel_private)
+    start = time.perf_counter()
+    for i in range(embeds):
+        await bot.log_dispatcher.send(channel, discord.Embed(title=f"Message deleted #{i}"))
+    await bot.log_dispatcher.drain()
+    return time.perf_counter() - start
+
+
+async def run(args, size: int) -> None:
+    bot = await fakes.make_bot(members=10)
+    bot.fake_http = fakes.FakeHTTP(args.latency, limits=True)
+    bot.http.request = bot.fake_http.request
+
+    server = pool = None
+    if size:
+        server = WebhookServer(args.channel_cap)
+        await server.start()
+        channel = bot.get_channel(bot.channel_private)
+        pool = WebhookPool(bot, channel, size, base=server.base)
+        await pool.setup()
+        bot.log_dispatcher.pools[channel.id] = pool
+
+    elapsed = await flood(bot, args.embeds)
+    stats = bot.log_dispatcher.stats()
+    name = f"{size} webhooks" if size else "bot route"
+    print(f"{name:<12} {stats['flushed_embeds']:>6} embeds in {elapsed:>6.2f}s  "
+          f"{stats['flushed_embeds'] / elapsed:>7.1f} embeds/s  "
+          f"{stats['failed_flushes']} failed  {stats['shed_embeds']} shed  "
+          f"max queue wait {stats['max_queue_wait']:.2f}s")
+    if pool is not None:
+        bot_route = bot.fake_http.calls["POST /channels/{channel_id}/messages"]
+        print(f"{'':<12} per webhook {pool.stats()['per_webhook']}, {server.limited} 429s, "
+              f"{pool.retried} retried, {bot_route} fell back to the bot route")
+        await bot.log_dispatcher.close()
+        await server.stop()
+    await fakes.close(bot)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeds", type=int, default=300, help="log embeds to deliver")
+    parser.add_argument("--sizes", default="1,2,4", help="webhook pool sizes to compare with the bot route")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every fake REST request takes")
+    parser.add_argument("--channel-cap", type=int, default=0,
+                        help="webhook messages per minute the channel accepts, 0 for no cap")
+    args = parser.parse_args()
+
+    for size in [0] + [int(size) for size in args.sizes.split(",")]:
+        await run(args, size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
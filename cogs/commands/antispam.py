@@ -0,0 +1,78 @@
+import time
+import traceback
+from datetime import datetime
+
+import discord
+from cogs.utils.metrics import REGISTRY, instrument
+from cogs.utils.permissions import Level
+from cogs.utils.spam import SpamEngine
+from discord.ext import commands
+
+
+class AntiSpam(commands.Cog):
+    """Mutes members who send too many messages, the same message over and
+    over, or too many mentions or attachments in a short time. Moderators
+    are left alone.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.engine = SpamEngine()
+        # members we're muting right now, their next messages shouldn't mute them again
+        self.muting = set()
+
+        REGISTRY.gauge("cuthbert_spam_tracked_users", "Members with recent messages tracked by anti-spam",
+                       function=lambda: len(self.engine.users))
+
+    @commands.Cog.listener()
+    @instrument("listener", "antispam_message")
+    async def on_message(self, message: discord.Message) -> None:
+        if (message.guild is None or message.guild.id != self.bot.guild_id or message.author.bot
+                or not isinstance(message.author, discord.Member)):
+            return
+        member = message.author
+        if self.bot.perms.has(member, Level.MOD):
+            return
+
+        content = message.content.strip().lower()
+        reason = self.engine.check(member.id, time.monotonic(), hash(content) if content else 0,
+                                   len(message.raw_mentions) + len(message.raw_role_mentions),
+                                   len(message.attachments))
+        if reason is None:
+            return
+
+        # `_roles` holds role IDs, `Member.roles` would build and sort Role objects
+        if member.id in self.muting or member._roles.has(self.bot.role_mute):
+            return
+
+        self.muting.add(member.id)
+        try:
+            await self.bot.log_dispatcher.send(message.guild.get_channel(self.bot.channel_private),
+                                               self.prepare_spam_log(message, reason))
+            if self.bot.spam_mute:
+                await self.bot.get_cog("ModActions").mute_member(
+                    message.guild, message.guild.me, member, f"Spam: {reason}", self.bot.spam_mute)
+        except commands.BadArgument:
+            # muted by someone else in the meantime
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.muting.discard(member.id)
+
+    def prepare_spam_log(self, message: discord.Message, reason: str) -> discord.Embed:
+        embed = discord.Embed(title="Spam Detected")
+        embed.color = discord.Color.orange()
+        embed.set_author(name=message.author, icon_url=message.author.avatar_url)
+        embed.add_field(name="User", value=f'{message.author} ({message.author.mention})', inline=True)
+        embed.add_field(name="Channel", value=message.channel.mention, inline=True)
+        embed.add_field(name="Reason", value=reason, inline=True)
+        if message.content:
+            embed.add_field(name="Last message", value=discord.utils.escape_markdown(message.content)[:1024], inline=False)
+        embed.set_footer(text=f"{message.author.id}")
+        embed.timestamp = datetime.now()
+        return embed
+
+
+def setup(bot):
+    bot.add_cog(AntiSpam(bot))
@@ -0,0 +1,157 @@
+import asyncio
+import traceback
+import typing
+
+import discord
+from cogs.utils.cases import CaseStore
+from cogs.utils.metrics import instrument
+from discord.ext import commands
+
+PAGE_SIZE = 10
+# characters of a reason shown per case
+REASON_LENGTH = 200
+
+
+class Cases(commands.Cog):
+    """Look up the moderation history of users and moderators
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.guild_only()
+    @commands.command(name="cases")
+    @instrument("command")
+    async def cases(self, ctx: commands.Context, user: typing.Union[discord.Member, int]) -> None:
+        """Show a user's moderation history (mod only)
+
+        Example usage:
+        --------------
+        `!cases <@user/ID>`
+
+        Parameters
+        ----------
+        user : typing.Union[discord.Member, int]
+            User whose cases to show, doesn't have to be part of the guild
+
+        """
+
+        await self.bot.get_cog("ModActions").check_permissions(ctx)
+
+        user_id = user.id if isinstance(user, discord.Member) else user
+        await self.paginate(ctx, f"Cases for {user}", user_id, self.bot.cases.user_cases)
+
+    @commands.guild_only()
+    @commands.command(name="modcases")
+    @instrument("command")
+    async def modcases(self, ctx: commands.Context, mod: typing.Union[discord.Member, int]) -> None:
+        """Show the cases made by a moderator (mod only)
+
+        Example usage:
+        --------------
+        `!modcases <@mod/ID>`
+
+        Parameters
+        ----------
+        mod : typing.Union[discord.Member, int]
+            Moderator whose cases to show
+
+        """
+
+        await self.bot.get_cog("ModActions").check_permissions(ctx)
+
+        mod_id = mod.id if isinstance(mod, discord.Member) else mod
+        await self.paginate(ctx, f"Cases by {mod}", mod_id, self.bot.cases.moderator_cases)
+
+    async def paginate(self, ctx: commands.Context, title: str, id: int, fetch) -> None:
+        """Show cases one page at a time, using reactions to move between pages.
+        We keep the cursor of every page we've seen so we can go back. Cases
+        aren't counted up front, that would cost as much as reading all of
+        them, so pages only know whether there's another one after them.
+
+        Parameters
+        ----------
+        ctx : commands.Context
+            Context of the invoking command
+        title : str
+            Title of the embed
+        id : int
+            User or moderator ID
+        fetch : callable
+            Either `CaseStore.user_cases` or `CaseStore.moderator_cases`
+        """
+
+        cursors = [None]
+        page = 0
+
+        async def get_page():
+            # one extra case tells us whether there's a next page
+            docs = await fetch(id, after=cursors[page], limit=PAGE_SIZE + 1)
+            more = len(docs) > PAGE_SIZE
+            if more and len(cursors) == page + 1:
+                cursors.append(CaseStore.cursor(docs[PAGE_SIZE - 1]))
+            return docs[:PAGE_SIZE], more
+
+        docs, more = await get_page()
+        if not docs:
+            raise commands.BadArgument("No cases found.")
+
+        message = await ctx.send(embed=self.prepare_page(title, docs, page, more))
+        if not more:
+            return
+
+        await message.add_reaction("◀️")
+        await message.add_reaction("▶️")
+
+        def check(reaction, user):
+            return user.id == ctx.author.id and reaction.message.id == message.id and str(reaction.emoji) in ("◀️", "▶️")
+
+        while True:
+            try:
+                reaction, user = await self.bot.wait_for("reaction_add", timeout=120, check=check)
+            except asyncio.TimeoutError:
+                break
+
+            await message.remove_reaction(reaction, user)
+            if str(reaction.emoji) == "▶️" and page + 1 < len(cursors):
+                page += 1
+            elif str(reaction.emoji) == "◀️" and page > 0:
+                page -= 1
+            else:
+                continue
+            docs, more = await get_page()
+            await message.edit(embed=self.prepare_page(title, docs, page, more))
+
+        await message.clear_reactions()
+
+    def prepare_page(self, title: str, docs: list, page: int, more: bool) -> discord.Embed:
+        embed = discord.Embed(title=title)
+        embed.color = discord.Color.blurple()
+        for case in docs:
+            punishment = f" ({case['punishment']})" if case.get("punishment") else ""
+            # reasons can be up to a whole message long, a page of them has to fit in 6000 characters
+            reason = case['reason']
+            if len(reason) > REASON_LENGTH:
+                reason = reason[:REASON_LENGTH] + "..."
+            embed.add_field(
+                name=f"{case['type'].capitalize()}{punishment} — {case['timestamp'].strftime('%B %d, %Y, %I:%M %p')} UTC",
+                value=f"**User:** <@{case['user_id']}>\n**Mod:** <@{case['moderator_id']}>\n**Reason:** {reason}",
+                inline=False)
+        embed.set_footer(text=f"Page {page + 1}" + (" · more with ▶️" if more else ""))
+        return embed
+
+    @cases.error
+    @modcases.error
+    async def info_error(self, ctx, error):
+        if (isinstance(error, commands.MissingRequiredArgument)
+            or isinstance(error, commands.BadArgument)
+            or isinstance(error, commands.BadUnionArgument)
+            or isinstance(error, commands.MissingPermissions)
+                or isinstance(error, commands.NoPrivateMessage)):
+            await self.bot.send_error(ctx, error)
+        else:
+            traceback.print_exc()
+
+
+def setup(bot):
+    bot.add_cog(Cases(bot))
@@ -0,0 +1,222 @@
+import logging
+import time
+import traceback
+from datetime import datetime
+from io import BytesIO
+
+import discord
+from cogs.utils.filters import FILTER_HITS, FILTER_SCAN, KINDS, WordFilter, normalize_pattern
+from cogs.utils.metrics import instrument
+from cogs.utils.outbound import Priority, priority
+from cogs.utils.permissions import Level
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+
+class Filter(commands.Cog):
+    """Removes messages with filtered words, phrases and domains, and mutes
+    whoever sent them. Moderators aren't filtered.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.filter = WordFilter()
+        self.building = False
+        # members we're muting right now, so a burst of bad messages is one mute
+        self.muting = set()
+        self.bot.loop.create_task(self.load())
+
+    async def load(self) -> None:
+        entries = await self.bot.filters.all()
+        # the entries are swapped in here on the loop, where filteradd and filterremove change them,
+        # only building the automaton for thousands of them goes to a thread
+        self.filter.load(entries, build=False)
+        await self.rebuild(force=True)
+
+    async def rebuild(self, force: bool = False) -> None:
+        """Full build on a thread once enough entries changed since the last one, or now if `force`"""
+
+        automaton = self.filter.automaton
+        if self.building or not (force or automaton.needs_build):
+            return
+        self.building = True
+        try:
+            start = time.perf_counter()
+            patterns = frozenset(automaton.patterns)
+            automaton.install(await self.bot.loop.run_in_executor(None, automaton.build, patterns))
+            logger.info(f"Rebuilt filter with {len(automaton)} entries in {time.perf_counter() - start:.2f}s")
+        finally:
+            self.building = False
+
+    @commands.Cog.listener()
+    @instrument("listener", "filter_message")
+    async def on_message(self, message: discord.Message) -> None:
+        await self.check(message)
+
+    @commands.Cog.listener()
+    @instrument("listener", "filter_message_edit")
+    async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
+        if before.content != after.content:
+            await self.check(after)
+
+    async def check(self, message: discord.Message) -> None:
+        """Remove the message and mute its author if it matches the filter
+
+        Parameters
+        ----------
+        message : discord.Message
+            Message to check
+        """
+
+        if (message.guild is None or message.guild.id != self.bot.guild_id or message.author.bot
+                or not message.content or not isinstance(message.author, discord.Member)):
+            return
+        if self.bot.perms.has(message.author, Level.MOD):
+            return
+
+        start = time.perf_counter()
+        entry = self.filter.match(message.content)
+        FILTER_SCAN.observe(time.perf_counter() - start)
+        if entry is None:
+            return
+
+        FILTER_HITS.inc((entry["kind"],))
+        with priority(Priority.MOD_ACTION):
+            try:
+                await message.delete()
+            except discord.NotFound:
+                pass
+
+        await self.bot.log_dispatcher.send(message.guild.get_channel(self.bot.channel_private),
+                                           self.prepare_hit_log(message, entry))
+
+        member = message.author
+        if not self.bot.filter_mute or member.id in self.muting:
+            return
+        self.muting.add(member.id)
+        try:
+            await self.bot.get_cog("ModActions").mute_member(
+                message.guild, message.guild.me, member, f"Filter: {entry['kind']}", self.bot.filter_mute)
+        except commands.BadArgument:
+            # already muted
+            pass
+        finally:
+            self.muting.discard(member.id)
+
+    def prepare_hit_log(self, message: discord.Message, entry: dict) -> discord.Embed:
+        embed = discord.Embed(title="Message Filtered")
+        embed.color = discord.Color.orange()
+        embed.set_author(name=message.author, icon_url=message.author.avatar_url)
+        embed.add_field(name="User", value=f'{message.author} ({message.author.mention})', inline=True)
+        embed.add_field(name="Channel", value=message.channel.mention, inline=True)
+        embed.add_field(name="Matched", value=f"||{discord.utils.escape_markdown(entry['pattern'])}|| ({entry['kind']})", inline=True)
+        embed.add_field(name="Message", value=discord.utils.escape_markdown(message.content)[:1024], inline=False)
+        embed.set_footer(text=f"{message.author.id}")
+        embed.timestamp = datetime.now()
+        return embed
+
+    @commands.guild_only()
+    @commands.command(name="filteradd")
+    @instrument("command")
+    async def filteradd(self, ctx: commands.Context, kind: str, *, pattern: str) -> None:
+        """Add a word, phrase or domain to the filter (mod only)
+
+        Example usage:
+        --------------
+        `!filteradd <word/domain/substring> <text>`
+
+        Parameters
+        ----------
+        kind : str
+            "word" for whole words or phrases, "domain" for links to a domain and its subdomains,
+            "substring" to match even inside other words
+        pattern : str
+            What to filter
+
+        """
+
+        await self.bot.get_cog("ModActions").check_permissions(ctx)
+
+        kind = kind.lower()
+        if kind not in KINDS:
+            raise commands.BadArgument(f"Kind must be one of {', '.join(KINDS)}.")
+        entry = self.bot.filters.make_entry(kind, pattern, ctx.author.id)
+        if not entry["_id"]:
+            raise commands.BadArgument("There's nothing left to filter after normalizing that.")
+
+        await self.bot.filters.add(entry)
+        self.filter.add(entry)
+        await ctx.message.delete()
+        await ctx.send(f"Added a {kind} to the filter ({len(self.filter)} entries).", delete_after=5)
+        await self.rebuild()
+
+    @commands.guild_only()
+    @commands.command(name="filterremove")
+    @instrument("command")
+    async def filterremove(self, ctx: commands.Context, kind: str, *, pattern: str) -> None:
+        """Remove a word, phrase or domain from the filter (mod only)
+
+        Example usage:
+        --------------
+        `!filterremove <word/domain/substring> <text>`
+
+        Parameters
+        ----------
+        kind : str
+            Kind the entry was added as
+        pattern : str
+            What to stop filtering
+
+        """
+
+        await self.bot.get_cog("ModActions").check_permissions(ctx)
+
+        normalized = normalize_pattern(kind.lower(), pattern)
+        if not await self.bot.filters.remove(normalized):
+            raise commands.BadArgument("That isn't in the filter.")
+        self.filter.remove(normalized)
+        await ctx.message.delete()
+        await ctx.send(f"Removed it from the filter ({len(self.filter)} entries).", delete_after=5)
+        await self.rebuild()
+
+    @commands.guild_only()
+    @commands.command(name="filterlist")
+    @instrument("command")
+    async def filterlist(self, ctx: commands.Context) -> None:
+        """Get every filter entry as a file (mod only)
+
+        Example usage:
+        --------------
+        `!filterlist`
+
+        """
+
+        await self.bot.get_cog("ModActions").check_permissions(ctx)
+
+        entries = sorted(self.filter.automaton.patterns.values(), key=lambda entry: (entry["kind"], entry["_id"]))
+        output = BytesIO()
+        output.write(b"kind,pattern,added_by\n")
+        for entry in entries:
+            pattern = entry["pattern"].replace('"', "'")
+            output.write(f'{entry["kind"]},"{pattern}",{entry["added_by"]}\n'.encode("UTF-8"))
+        output.seek(0)
+
+        counts = ", ".join(f"{sum(entry['kind'] == kind for entry in entries)} {kind}s" for kind in KINDS)
+        await ctx.send(f"{len(entries)} filter entries ({counts}).", file=discord.File(output, "filter.csv"))
+
+    @filteradd.error
+    @filterremove.error
+    @filterlist.error
+    async def info_error(self, ctx, error):
+        if (isinstance(error, commands.MissingRequiredArgument)
+            or isinstance(error, commands.BadArgument)
+            or isinstance(error, commands.MissingPermissions)
+                or isinstance(error, commands.NoPrivateMessage)):
+            await self.bot.send_error(ctx, error)
+        else:
+            traceback.print_exc()
+
+
+def setup(bot):
+    bot.add_cog(Filter(bot))
@@ -1,6 +1,7 @@
 import traceback
 
 import discord
+from cogs.utils.metrics import instrument
 from discord.ext import commands
 
 
@@ -10,68 +11,104 @@ class Utilities(commands.Cog):
         self.left_col_length = 17
         self.right_col_length = 80
 
+        # the help text and usage embeds only change when cogs do, so they're built once
+        # and rebuilt on next use after the bot adds or removes a cog (load, unload, reload)
+        self.index_stale = True
+        self.help_messages = []
+        self.usage_embeds = {}
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.get_index()
+
+    def invalidate_index(self) -> None:
+        self.index_stale = True
+
+    def get_index(self) -> None:
+        if self.index_stale:
+            self.build_index()
+            self.index_stale = False
+
+    def get_usage(self, command: commands.Command) -> discord.Embed:
+        """Get a command's usage embed, rebuilding the index if the command isn't in it yet"""
+
+        embed = self.usage_embeds.get(command.qualified_name)
+        if embed is None:
+            self.build_index()
+            self.index_stale = False
+            embed = self.usage_embeds.get(command.qualified_name) or self.get_usage_embed(command)
+        return embed
+
+    def build_index(self) -> None:
+        header = "Get a detailed description for a specific command with `!help <command name>`\n"
+        lines = []
+        for cog_name in self.bot.cogs:
+            cog = self.bot.cogs[cog_name]
+            lines.append(f"== {cog_name} ==")
+
+            for command in cog.get_commands():
+                spaces_left = ' ' * (self.left_col_length - len(command.name))
+                lines.append(f"\t* {command.name}{spaces_left} :: {self.get_brief(command)}")
+
+                if isinstance(command, commands.core.Group):
+                    for c in command.commands:
+                        spaces_left = ' ' * (self.left_col_length - len(c.name)-4)
+                        lines.append(f"\t\t* {c.name}{spaces_left} :: {self.get_brief(c)}")
+
+            lines.append("")
+
+        self.help_messages = self.pack_messages(header, lines)
+        self.usage_embeds = {command.qualified_name: self.get_usage_embed(command)
+                             for command in self.bot.walk_commands()}
+
+    def get_brief(self, command: commands.Command) -> str:
+        brief = command.help.split("\n")[0] if command.help is not None else "No description."
+        return brief[0:self.right_col_length] + "..." if len(brief) > self.right_col_length else brief
+
+    def pack_messages(self, header: str, lines: list) -> list:
+        """Pack help lines into as few code block messages as fit in Discord's 2000 character limit"""
+
+        messages = []
+        prefix = header + "\n```asciidoc\n"
+        suffix = "```"
+        current = []
+        length = len(prefix) + len(suffix)
+        for line in lines:
+            if current and length + len(line) + 1 > 2000:
+                messages.append(prefix + "\n".join(current) + suffix)
+                prefix = "```asciidoc\n"
+                current = []
+                length = len(prefix) + len(suffix)
+            current.append(line)
+            length += len(line) + 1
+
+        if current:
+            messages.append(prefix + "\n".join(current) + suffix)
+        return messages
+
     @commands.command(name="help", hidden=True)
     @commands.guild_only()
     @commands.has_permissions(add_reactions=True, embed_links=True)
+    @instrument("command", "help")
     async def help_comm(self, ctx: commands.Context, *, command_arg: str = None):
         """Gets all cogs and commands of mine."""
 
         await ctx.message.delete(delay=5)
+        self.get_index()
 
         if not command_arg:
             await ctx.message.add_reaction("📬")
-            header = "Get a detailed description for a specific command with `!help <command name>`\n"
-            string = ""
-            for cog_name in self.bot.cogs:
-                cog = self.bot.cogs[cog_name]                
-                string += f"== {cog_name} ==\n"
-
-                for command in cog.get_commands():
-                    # print(type(command), command)
-                    spaces_left = ' ' * (self.left_col_length - len(command.name))
-                    if command.help is not None:
-                        command.brief = command.help.split("\n")[0]
-                    else:
-                        command.brief = "No description."
-                    cmd_desc = command.brief[0:self.right_col_length] + "..." if len(command.brief) > self.right_col_length else command.brief
-
-                    if isinstance(command, commands.core.Group):
-                        string += f"\t* {command.name}{spaces_left} :: {cmd_desc}\n"
-                        for c in command.commands:
-                            spaces_left = ' ' * (self.left_col_length - len(c.name)-4)
-                            if c.help is not None:
-                                c.brief = c.help.split("\n")[0]
-                            else:
-                                c.brief = "No description."
-                            cmd_desc = c.brief[0:self.right_col_length] + "..." if len(c.brief) > self.right_col_length else c.brief
-                            string += f"\t\t* {c.name}{spaces_left} :: {cmd_desc}\n"
-                    else:
-                        string += f"\t* {command.name}{spaces_left} :: {cmd_desc}\n"
-
-                string += "\n"
-
             try:
-                parts = string.split("\n")
-                group_size = 25
-                if len(parts) <= group_size:
-                    await ctx.author.send(header + "\n```asciidoc\n" + "\n".join(parts[0:group_size]) + "```")
-                else:
-                    seen = 0
-                    await ctx.author.send(header + "\n```asciidoc\n" + "\n".join(parts[seen:seen+group_size]) + "```")
-                    seen += group_size
-                    while seen < len(parts):
-                        await ctx.author.send("```asciidoc\n" + "\n".join(parts[seen:seen+group_size]) + "```")
-                        seen += group_size
-                        
+                for message in self.help_messages:
+                    await ctx.author.send(message)
             except Exception:
                 await ctx.send("I tried to DM you but couldn't. Make sure your DMs are enabled.")
 
         else:
             command = self.bot.get_command(command_arg.lower())
             if command:
-                # print(str(command.cog))
                 await ctx.message.add_reaction("📬")
-                embed = await self.get_usage_embed(ctx, command)
+                embed = self.get_usage(command)
                 try:
                     await ctx.author.send(embed=embed)
                 except Exception:
@@ -82,6 +119,7 @@ class Utilities(commands.Cog):
     @commands.command(name="usage", hidden=True)
     @commands.guild_only()
     @commands.has_permissions(add_reactions=True, embed_links=True)
+    @instrument("command")
     async def usage(self, ctx: commands.Context, *, command_arg: str):
         """Show usage of one command
 
@@ -92,14 +130,15 @@ class Utilities(commands.Cog):
         """
 
         await ctx.message.delete(delay=5)
+        self.get_index()
         command = self.bot.get_command(command_arg.lower())
         if command:
-            embed = await self.get_usage_embed(ctx, command)
+            embed = self.get_usage(command)
             await ctx.send(embed=embed)
         else:
             await ctx.send("Command not found.", delete_after=5)
 
-    async def get_usage_embed(self, ctx, command):
+    def get_usage_embed(self, command: commands.Command) -> discord.Embed:
         args = ""
         for thing in command.clean_params:
             args += f"<{str(thing)}> "
@@ -108,7 +147,7 @@ class Utilities(commands.Cog):
             embed = discord.Embed(title=f"!{command.full_parent_name} {command.name} {args}")
         else:
             embed = discord.Embed(title=f"!{command.name} {args}")
-        parts = command.help.split("\n\n")
+        parts = (command.help or "No description.").split("\n\n")
         embed.description = parts[0] + '\n\n'
         for part in parts[1:len(parts)]:
             embed.description += "```\n"
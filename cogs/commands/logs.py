@@ -1,8 +1,16 @@
+import asyncio
 import traceback
 from datetime import datetime
 from io import BytesIO
 
 import discord
+from cogs.utils.debounce import Debouncer
+from cogs.utils.diff import inline_diff
+from cogs.utils.dispatcher import truncate
+from cogs.utils.message_cache import MessageSnapshot
+from cogs.utils.metrics import instrument
+from cogs.utils.transcript import TranscriptWriter, summarize_members
+from cogs.utils.window import SlidingWindow
 from discord.ext import commands
 from typing import List
 
@@ -10,7 +18,117 @@ class Logging(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+        # raid detection for join/leave logs: once more than `raid_threshold`
+        # members join (or leave) within `raid_window` seconds, we stop logging
+        # them one by one and post one summary per window instead. 0 turns it off
+        self.rate_windows = {
+            "join": SlidingWindow(bot.raid_threshold, bot.raid_window),
+            "leave": SlidingWindow(bot.raid_threshold, bot.raid_window),
+        } if bot.raid_threshold > 0 else {}
+        self.summary_pending = {"join": [], "leave": []}
+        self.summary_tasks = {}
+
+        self.member_updates = Debouncer(self.log_member_update, delay=3.0, max_delay=15.0)
+        self.message_edits = Debouncer(self.flush_message_edits, delay=10.0, max_delay=30.0)
+
+    def cog_unload(self):
+        for task in self.summary_tasks.values():
+            task.cancel()
+        # don't lose what's waiting in the debouncers on a reload
+        self.bot.loop.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """Send every debounced log right away, i.e before shutting down"""
+
+        await self.member_updates.flush_all()
+        await self.message_edits.flush_all()
+
+    def aggregate(self, kind: str, member: discord.Member) -> bool:
+        """Track the join/leave rate and collect members while in summary mode
+
+        Parameters
+        ----------
+        kind : str
+            "join" or "leave"
+        member : discord.Member
+            Member that joined or left
+
+        Returns
+        -------
+        bool
+            True if the member was added to a summary and shouldn't be logged by itself
+        """
+
+        if not self.rate_windows:
+            return False
+
+        over_threshold = self.rate_windows[kind].hit()
+        if kind not in self.summary_tasks:
+            if not over_threshold:
+                return False
+            self.summary_tasks[kind] = self.bot.loop.create_task(self.summarize(kind, member.guild))
+
+        self.summary_pending[kind].append((member, datetime.utcnow()))
+        return True
+
+    async def summarize(self, kind: str, guild: discord.Guild) -> None:
+        """Post one summary per window for as long as the rate stays over the threshold
+
+        Parameters
+        ----------
+        kind : str
+            "join" or "leave"
+        guild : discord.Guild
+            Guild the members joined or left
+        """
+
+        try:
+            while True:
+                await asyncio.sleep(self.bot.raid_window)
+                batch = self.summary_pending[kind]
+                self.summary_pending[kind] = []
+                if batch:
+                    await self.send_summary(kind, guild, batch)
+                if len(batch) <= self.bot.raid_threshold:
+                    break
+        finally:
+            self.summary_tasks.pop(kind, None)
+
+    async def send_summary(self, kind: str, guild: discord.Guild, batch: list) -> None:
+        channel = guild.get_channel(self.bot.channel_private)
+        if channel is None:
+            return
+
+        now = datetime.utcnow()
+        output = BytesIO()
+        output.write(b"id,user,created_at,account_age_days,joined_at,event_at\n")
+        new_accounts = 0
+        for member, seen_at in batch:
+            age = (now - member.created_at).days
+            if age < 7:
+                new_accounts += 1
+            joined_at = member.joined_at.isoformat() if member.joined_at else ""
+            output.write(
+                f'{member.id},"{member}",{member.created_at.isoformat()},{age},{joined_at},{seen_at.isoformat()}\n'.encode('UTF-8'))
+        output.seek(0)
+
+        verb = "joined" if kind == "join" else "left"
+        embed = discord.Embed(title=f"Members {verb} (raid summary)")
+        embed.color = discord.Color.green() if kind == "join" else discord.Color.purple()
+        embed.add_field(
+            name="Members", value=f'{len(batch)} members {verb} in the last {self.bot.raid_window} seconds', inline=False)
+        embed.add_field(
+            name="New accounts", value=f'{new_accounts} created less than 7 days ago', inline=True)
+        embed.add_field(name="First", value=batch[0][1].strftime(
+            "%B %d, %Y, %I:%M:%S %p") + " UTC", inline=True)
+        embed.add_field(name="Last", value=batch[-1][1].strftime(
+            "%B %d, %Y, %I:%M:%S %p") + " UTC", inline=True)
+        embed.timestamp = datetime.now()
+
+        await self.bot.log_dispatcher.send_files(channel, embed=embed, files=[discord.File(output, f'{kind}s.csv')])
+
     @commands.Cog.listener()
+    @instrument("listener")
     async def on_member_join(self, member: discord.Member) -> None:
         """Log member join messages, send log to #server-logs
 
@@ -22,6 +140,9 @@ class Logging(commands.Cog):
 
         if member.guild.id != self.bot.guild_id:
             return
+        self.bot.audit.record("member_join", user_id=member.id, created_at=member.created_at)
+        if self.aggregate("join", member):
+            return
 
         channel = member.guild.get_channel(self.bot.channel_private)
 
@@ -37,9 +158,10 @@ class Logging(commands.Cog):
         embed.timestamp = datetime.now()
         embed.set_footer(text=member.id)
 
-        await channel.send(embed=embed)
+        await self.bot.log_dispatcher.send(channel, embed)
 
     @commands.Cog.listener()
+    @instrument("listener")
     async def on_member_remove(self, member: discord.Member) -> None:
         """Log member leaves in #server-logs
 
@@ -51,6 +173,9 @@ class Logging(commands.Cog):
 
         if member.guild.id != self.bot.guild_id:
             return
+        self.bot.audit.record("member_leave", user_id=member.id, joined_at=member.joined_at)
+        if self.aggregate("leave", member):
+            return
 
         channel = member.guild.get_channel(self.bot.channel_private)
 
@@ -61,9 +186,30 @@ class Logging(commands.Cog):
             name="User", value=f'{member} ({member.mention})', inline=True)
         embed.timestamp = datetime.now()
         embed.set_footer(text=member.id)
-        await channel.send(embed=embed)
+        await self.bot.log_dispatcher.send(channel, embed)
+
+    @commands.Cog.listener()
+    @instrument("listener")
+    async def on_message(self, message: discord.Message) -> None:
+        """Keep a snapshot of every message so we can log edits and deletes later
+
+        Parameters
+        ----------
+        message : discord.Message
+            Message that was sent
+        """
+
+        if not message.guild or message.guild.id != self.bot.guild_id:
+            return
+        if message.author.bot:
+            return
+        if not message.content and not message.attachments:
+            return
+
+        self.bot.message_cache.add(MessageSnapshot.from_message(message))
 
     @commands.Cog.listener()
+    @instrument("listener")
     async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
         """Log message edits with before and after content
 
@@ -82,64 +228,133 @@ class Logging(commands.Cog):
         if not before.content or not after.content or before.content == after.content:
             return
 
-        channel = before.guild.get_channel(self.bot.channel_private)
+        snapshot = self.bot.message_cache.update(before.id, after.content)
+        if snapshot is None:
+            snapshot = MessageSnapshot.from_message(before)
+        await self.log_message_edit(before.guild, snapshot, after.content)
+
+    @commands.Cog.listener()
+    @instrument("listener")
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        """Log edits of messages that fell out of discord.py's message cache,
+        using our own message cache instead
+
+        Parameters
+        ----------
+        payload : discord.RawMessageUpdateEvent
+            Raw edit event data
+        """
+
+        # cached messages are handled by on_message_edit
+        if payload.cached_message is not None:
+            return
+
+        content = payload.data.get("content")
+        if not content:
+            return
+
+        snapshot = self.bot.message_cache.update(payload.message_id, content)
+        if snapshot is None or not snapshot.content or snapshot.content == content:
+            return
+
+        guild = self.bot.get_guild(snapshot.guild_id)
+        if guild is None or guild.id != self.bot.guild_id:
+            return
+
+        await self.log_message_edit(guild, snapshot, content)
+
+    async def log_message_edit(self, guild: discord.Guild, before: MessageSnapshot, after_content: str) -> None:
+        self.bot.audit.record("message_edit", message_id=before.id, channel_id=before.channel_id,
+                              user_id=before.author_id, before=before.content, after=after_content)
+
+        # edits to the same message in quick succession end up in a single log
+        edits = self.message_edits.update(before.id, lambda: MessageEdits(guild, before))
+        edits.final = after_content
+
+    async def flush_message_edits(self, message_id: int, edits: 'MessageEdits', events: int) -> None:
+        original = edits.original
+        if original.content == edits.final:
+            return
+
+        guild = edits.guild
+        channel = guild.get_channel(self.bot.channel_private)
 
         embed = discord.Embed(title="Message Updated")
         embed.color = discord.Color.orange()
-        embed.set_thumbnail(url=before.author.avatar_url)
+        author = guild.get_member(original.author_id)
+        if author is not None:
+            embed.set_thumbnail(url=author.avatar_url)
         embed.add_field(
-            name="User", value=f'{before.author} ({before.author.mention})', inline=False)
-        before_content = before.content
-        if len(before.content) > 400:
-            before_content = before_content[0:400] + "..."
-        after_content = after.content
-        if len(after.content) > 400:
-            after_content = after_content[0:400] + "..."
-        embed.add_field(name="Old message", value=before_content, inline=False)
-        embed.add_field(name="New message", value=after_content, inline=False)
+            name="User", value=f'{original.author_name} (<@{original.author_id}>)', inline=False)
+
+        # short messages are easier to read in full, long ones only show what changed
+        if len(original.content) <= 200 and len(edits.final) <= 200:
+            embed.add_field(name="Old message", value=original.content, inline=False)
+            embed.add_field(name="New message", value=edits.final, inline=False)
+        # a merged edit log shares its message with up to nine others, keep it to about 1000 characters
+        embed.add_field(name="Changes", value=inline_diff(original.content, edits.final, limit=600), inline=False)
+
         embed.add_field(
-            name="Channel", value=before.channel.mention + f"\n\n[Link to message]({before.jump_url})", inline=False)
+            name="Channel", value=f"<#{original.channel_id}>\n\n[Link to message]({original.jump_url})", inline=False)
         embed.timestamp = datetime.now()
-        embed.set_footer(text=before.author.id)
-        await channel.send(embed=embed)
+        if events > 1:
+            embed.set_footer(text=f"{original.author_id} · {events} edits merged")
+        else:
+            embed.set_footer(text=original.author_id)
+        await self.bot.log_dispatcher.send(channel, embed)
 
     @commands.Cog.listener()
+    @instrument("listener")
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
-        """Log message deletes
+        """Log message deletes. Falls back to our own message cache if the message
+        isn't in discord.py's cache anymore.
 
         Parameters
         ----------
-        message : discord.Message
-            Message that was deleted
+        payload : discord.RawMessageDeleteEvent
+            Raw delete event data
         """
 
-        message = payload.cached_message
+        message = self.bot.message_cache.pop(payload.message_id)
+        if message is None and payload.cached_message is not None:
+            if payload.cached_message.guild is None or payload.cached_message.author.bot:
+                return
+            message = MessageSnapshot.from_message(payload.cached_message)
 
-        if not message or not message.guild:
+        if message is None:
             return
-        if message.guild.id != self.bot.guild_id:
-            return
-        if message.author.bot:
+        if message.guild_id != self.bot.guild_id:
             return
-        if message.content == "" or not message.content:
+        if not message.content and not message.attachments:
             return
 
-        channel = message.guild.get_channel(self.bot.channel_private)
+        guild = self.bot.get_guild(message.guild_id)
+        if guild is None:
+            return
+        self.bot.audit.record("message_delete", message_id=message.id, channel_id=message.channel_id,
+                              user_id=message.author_id, content=message.content, attachments=list(message.attachments))
+        channel = guild.get_channel(self.bot.channel_private)
 
         embed = discord.Embed(title="Message Deleted")
         embed.color = discord.Color.red()
-        embed.set_thumbnail(url=message.author.avatar_url)
+        author = guild.get_member(message.author_id)
+        if author is not None:
+            embed.set_thumbnail(url=author.avatar_url)
         embed.add_field(
-            name="User", value=f'{message.author} ({message.author.mention})', inline=True)
+            name="User", value=f'{message.author_name} (<@{message.author_id}>)', inline=True)
         embed.add_field(
-            name="Channel", value=message.channel.mention, inline=True)
+            name="Channel", value=f"<#{message.channel_id}>", inline=True)
         content = message.content
         if len(message.content) > 400:
             content = content[0:400] + "..."
-        embed.add_field(name="Message", value=content + f"\n\n[Link to message]({message.jump_url})", inline=False)
-        embed.set_footer(text=message.author.id)
+        for url in message.attachments:
+            content += f"\n{url}"
+        # attachment URLs can run past the field limit, the link always fits
+        link = f"\n\n[Link to message]({message.jump_url})"
+        embed.add_field(name="Message", value=truncate(content, 1024 - len(link)) + link, inline=False)
+        embed.set_footer(text=message.author_id)
         embed.timestamp = datetime.now()
-        await channel.send(embed=embed)
+        await self.bot.log_dispatcher.send(channel, embed)
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx: commands.Context, error):
@@ -147,6 +362,7 @@ class Logging(commands.Cog):
             return
 
     @commands.Cog.listener()
+    @instrument("listener")
     async def on_bulk_message_delete(self, messages: List[discord.Message]):
         """Log bulk message deletes. Messages are outputted to file and sent to #server-logs
 
@@ -161,97 +377,148 @@ class Logging(commands.Cog):
         if messages[0].guild.id != self.bot.guild_id:
             return
 
-        members = set()
-        channel = messages[0].guild.get_channel(self.bot.channel_private)
-        output = BytesIO()
-        for message in messages:
-            members.add(message.author)
+        # purged content shouldn't stay on disk for the whole retention period
+        self.bot.message_cache.discard(message.id for message in messages)
 
-            string = f'{message.author} ({message.author.id}) [{message.created_at.strftime("%B %d, %Y, %I:%M %p")}]) UTC\n'
-            string += message.content
-            for attachment in message.attachments:
-                string += f'\n{attachment.url}'
+        self.bot.audit.record("bulk_message_delete", channel_id=messages[0].channel.id,
+                              message_ids=[message.id for message in messages],
+                              user_ids=list({message.author.id for message in messages}))
 
-            string += "\n\n"
-            output.write(string.encode('UTF-8'))
-        output.seek(0)
+        guild = messages[0].guild
+        channel = guild.get_channel(self.bot.channel_private)
+        if channel is None:
+            return
 
-        member_string = ""
-        for i, member in enumerate(members):
-            if i == len(members) - 1 and i == 0:
-                member_string += f"{member.mention}"
-            elif i == len(members) - 1 and i != 0:
-                member_string += f"and {member.mention}"
-            else:
-                member_string += f"{member.mention}, "
+        # dict keeps the order authors first appear in
+        members = {}
+        transcript = TranscriptWriter("messages", self.bot.transcript_format, guild.filesize_limit)
+        for message in messages:
+            members.setdefault(message.author.id, message.author)
+            transcript.write(message)
 
         embed = discord.Embed(title="Bulk Message Deleted")
         embed.color = discord.Color.red()
+        member_string = summarize_members(list(members.values()), 1024 - 60)
         embed.add_field(
             name="Users", value=f'This batch included {len(messages)} messages from {member_string}', inline=True)
         embed.add_field(
-            name="Channel", value=message.channel.mention, inline=True)
+            name="Channel", value=messages[0].channel.mention, inline=True)
         embed.timestamp = datetime.now()
-        await channel.send(embed=embed)
-        await channel.send(file=discord.File(output, 'message.txt'))
+        await self.bot.log_dispatcher.send_files(channel, embed=embed)
+        for file in transcript.files():
+            await self.bot.log_dispatcher.send_files(channel, files=[file])
 
     @commands.Cog.listener()
-    async def on_member_update(self, before: discord.Message, after: discord.Message):
+    @instrument("listener")
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """Collect nickname and role changes. Changes to the same member within a few
+        seconds of each other are merged into a single log.
+
+        Parameters
+        ----------
+        before : discord.Member
+            Member before the update
+        after : discord.Member
+            Member after the update
+        """
+
         if not after.guild.id == self.bot.guild_id:
             return
         if not before or not after:
             return
-        if before.display_name != after.display_name:
-            await self.member_nick_update(before, after)
-            return
 
-        new_roles = [str(role) for role in after.roles if role not in before.roles]
-        if new_roles:
-            await self.member_roles_update(before, after, new_roles, added=True)
+        renamed = before.display_name != after.display_name
+        before_roles = set(before.roles)
+        after_roles = set(after.roles)
+        added = after_roles - before_roles
+        removed = before_roles - after_roles
+        if not renamed and not added and not removed:
             return
 
-        removed_roles = [str(role) for role in before.roles if role not in after.roles]
-        if removed_roles:
-            await self.member_roles_update(before, after, removed_roles, added=False)
-            return
+        changes = self.member_updates.update(after.id, lambda: MemberChanges(before))
+        changes.merge(after, added, removed)
 
-    async def member_nick_update(self, before, after):
-        embed = discord.Embed(title="Member Renamed")
-        embed.color = discord.Color.orange()
-        embed.set_thumbnail(url=after.avatar_url)
-        embed.add_field(
-            name="Member", value=f'{after} ({after.mention})', inline=False)
-        embed.add_field(
-            name="Old nickname", value=f'{before.display_name}', inline=True)
-        embed.add_field(
-            name="New nickname", value=f'{after.display_name}', inline=True)
-        embed.timestamp = datetime.now()
-        embed.set_footer(text=after.id)
+    async def log_member_update(self, member_id: int, changes: 'MemberChanges', events: int) -> None:
+        after = changes.member
+        renamed = changes.old_nick != after.display_name
+        # roles that were added then removed again (or the reverse) cancel out
+        if not renamed and not changes.added and not changes.removed:
+            return
 
-        private = after.guild.get_channel(self.bot.channel_private)
-        if private:
-            await private.send(embed=embed)
+        self.bot.audit.record("member_update", user_id=member_id,
+                              old_nick=changes.old_nick if renamed else None,
+                              new_nick=after.display_name if renamed else None,
+                              roles_added=[str(role) for role in changes.added],
+                              roles_removed=[str(role) for role in changes.removed],
+                              events=events)
 
-    async def member_roles_update(self, before, after, roles, added):
         embed = discord.Embed()
-        if added:
+        if renamed and not changes.added and not changes.removed:
+            embed.title = "Member Renamed"
+            embed.color = discord.Color.orange()
+        elif not renamed and not changes.removed:
             embed.title = "Member Role Added"
             embed.color = discord.Color.blue()
-        else:
+        elif not renamed and not changes.added:
             embed.title = "Member Role Removed"
             embed.color = discord.Color.red()
+        else:
+            embed.title = "Member Updated"
+            embed.color = discord.Color.orange()
 
         embed.set_thumbnail(url=after.avatar_url)
         embed.add_field(
             name="Member", value=f'{after} ({after.mention})', inline=False)
-        embed.add_field(
-            name="Role difference", value=', '.join(roles), inline=False)
+        if renamed:
+            embed.add_field(
+                name="Old nickname", value=f'{changes.old_nick}', inline=True)
+            embed.add_field(
+                name="New nickname", value=f'{after.display_name}', inline=True)
+        if changes.added:
+            embed.add_field(
+                name="Roles added", value=truncate(', '.join(str(role) for role in changes.added)), inline=False)
+        if changes.removed:
+            embed.add_field(
+                name="Roles removed", value=truncate(', '.join(str(role) for role in changes.removed)), inline=False)
         embed.timestamp = datetime.now()
-        embed.set_footer(text=after.id)
+        if events > 1:
+            embed.set_footer(text=f"{after.id} · {events} updates merged")
+        else:
+            embed.set_footer(text=after.id)
 
         private = after.guild.get_channel(self.bot.channel_private)
-        if private:
-            await private.send(embed=embed)
+        await self.bot.log_dispatcher.send(private, embed)
+
+
+class MemberChanges():
+    """Net nickname and role changes of a member over a debounce window
+    """
+
+    __slots__ = ('member', 'old_nick', 'added', 'removed')
+
+    def __init__(self, before: discord.Member):
+        self.member = before
+        self.old_nick = before.display_name
+        self.added = set()
+        self.removed = set()
+
+    def merge(self, after: discord.Member, added: set, removed: set) -> None:
+        self.member = after
+        old_added, old_removed = self.added, self.removed
+        self.added = (old_added - removed) | (added - old_removed)
+        self.removed = (old_removed - added) | (removed - old_added)
+
+
+class MessageEdits():
+    """First and latest version of a message over a debounce window
+    """
+
+    __slots__ = ('guild', 'original', 'final')
+
+    def __init__(self, guild: discord.Guild, original: MessageSnapshot):
+        self.guild = guild
+        self.original = original
+        self.final = original.content
 
 
 def setup(bot):
@@ -1,13 +1,43 @@
+import asyncio
 import datetime
+import re
+import shlex
+import time
 import traceback
 import typing
+from io import BytesIO
 
 import cogs.utils.logging as logging
 import discord
 import humanize
 import pytimeparse
+from cogs.utils.metrics import instrument
+from cogs.utils.outbound import Priority, priority
+from cogs.utils.permissions import Level
+from cogs.utils.pipeline import ActionPipeline
+from cogs.utils.purge import PurgeEngine
 from discord.ext import commands
 
+MAX_MASS_TARGETS = 1000
+MASS_CONCURRENCY = 5
+MAX_PURGE = 5000
+PURGE_SCAN_LIMIT = 10000
+PURGEUSER_SCAN_BUDGET = 500
+PURGEUSER_CONCURRENCY = 5
+
+
+class Duration(commands.Converter):
+    """Mute duration in seconds, i.e from "1h" or "10m", or 0 for "perm".
+    Bare numbers aren't durations here, they're user IDs."""
+
+    async def convert(self, ctx: commands.Context, argument: str) -> int:
+        if argument.lower() in ("perm", "permanent"):
+            return 0
+        delta = None if argument.isdigit() else pytimeparse.parse(argument)
+        if delta is None:
+            raise commands.BadArgument(f"{argument} isn't a duration.")
+        return delta
+
 
 class ModActions(commands.Cog):
     """This cog handles all the possible moderator actions.
@@ -17,6 +47,7 @@ class ModActions(commands.Cog):
     - Mute
     - Unmute
     - Purge
+    - Mass ban, kick and mute
     """
 
     def __init__(self, bot):
@@ -38,18 +69,33 @@ class ModActions(commands.Cog):
         mod_role = ctx.guild.get_role(self.bot.role_mod)
         if mod_role is None:
             raise commands.BadArgument("Moderator role not found.")
-        if mod_role not in ctx.author.roles:
+        if not self.bot.perms.has(ctx.author, Level.MOD):
             raise commands.BadArgument(
                 "You do not have permission to use this command.")
         if user:
             if isinstance(user, discord.Member):
-                if user.top_role >= ctx.author.top_role:
+                if not self.bot.perms.outranks(ctx.author, user):
                     raise commands.BadArgument(
                         message=f"{user.mention}'s top role is the same or higher than yours!")
-            
+
+    def prepare_public_log(self, log: discord.Embed, user: discord.abc.User) -> discord.Embed:
+        """Copy of a mod log for the public log channel, with the user's avatar as thumbnail instead of author"""
+
+        public_log = log.copy()
+        public_log.remove_author()
+        public_log.set_thumbnail(url=user.avatar_url)
+        return public_log
+
+    async def send_public_log(self, guild: discord.Guild, log: discord.Embed, content: str = "") -> None:
+        public_chan = guild.get_channel(self.bot.channel_public)
+        if public_chan:
+            with priority(Priority.MOD_ACTION):
+                await public_chan.send(content, embed=log)
+
     @commands.guild_only()
     @commands.bot_has_guild_permissions(kick_members=True)
     @commands.command(name="kick")
+    @instrument("command")
     async def kick(self, ctx: commands.Context, user: discord.Member, *, reason: str = "No reason.") -> None:
         """Kick a user (mod only)
 
@@ -72,27 +118,23 @@ class ModActions(commands.Cog):
         reason = discord.utils.escape_mentions(reason)
 
         log = await logging.prepare_kick_log(ctx.author, user, reason)
-
-        try:
-            await user.send(f"You were kicked from {ctx.guild.name}", embed=log)
-        except Exception:
-            pass
-
-        await user.kick(reason=reason)
-
-        await ctx.message.reply(embed=log, delete_after=10)
-        await ctx.message.delete(delay=10)
-
-        public_chan = ctx.guild.get_channel(
-            self.bot.channel_public)
-        if public_chan:
-            log.remove_author()
-            log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+        public_log = self.prepare_public_log(log, user)
+
+        # the DM has to go out before the kick, the user can't receive it afterwards
+        pipeline = ActionPipeline("kick")
+        pipeline.add("dm", lambda: user.send(f"You were kicked from {ctx.guild.name}", embed=log), timeout=5, priority=Priority.MOD_ACTION)
+        pipeline.add("kick", lambda: user.kick(reason=reason), after=["dm"], timeout=None, required=True,
+                     priority=Priority.MOD_ACTION)
+        pipeline.add("reply", lambda: ctx.message.reply(embed=log, delete_after=10), after=["kick"])
+        pipeline.add("delete", lambda: ctx.message.delete(delay=10), after=["kick"])
+        pipeline.add("public", lambda: self.send_public_log(ctx.guild, public_log), after=["kick"])
+        pipeline.add("case", lambda: self.bot.cases.add("kick", user.id, ctx.author.id, reason), after=["kick"])
+        await pipeline.run()
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(ban_members=True)
     @commands.command(name="ban")
+    @instrument("command")
     async def ban(self, ctx: commands.Context, user: typing.Union[discord.Member, int], *, reason: str = "No reason."):
         """Ban a user (mod only)
 
@@ -117,37 +159,34 @@ class ModActions(commands.Cog):
         # if the ID given is of a user who isn't in the guild, try to fetch the profile
         if isinstance(user, int):
             try:
-                user = await self.bot.fetch_user(user)
+                user = await self.bot.user_resolver.resolve(user)
             except discord.NotFound:
                 raise commands.BadArgument(
                     f"Couldn't find user with ID {user}")
 
         log = await logging.prepare_ban_log(ctx.author, user, reason)
-
-        try:
-            await user.send(f"You were banned from {ctx.guild.name}", embed=log)
-        except Exception:
-            pass
+        public_log = self.prepare_public_log(log, user)
 
         if isinstance(user, discord.Member):
-            await user.ban(reason=reason)
+            def action(): return user.ban(reason=reason)
         else:
             # hackban for user not currently in guild
-            await ctx.guild.ban(discord.Object(id=user.id))
-
-        await ctx.message.reply(embed=log, delete_after=10)
-        await ctx.message.delete(delay=10)
-
-        public_chan = ctx.guild.get_channel(
-            self.bot.channel_public)
-        if public_chan:
-            log.remove_author()
-            log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+            def action(): return ctx.guild.ban(discord.Object(id=user.id))
+
+        # the DM has to go out before the ban, the user can't receive it afterwards
+        pipeline = ActionPipeline("ban")
+        pipeline.add("dm", lambda: user.send(f"You were banned from {ctx.guild.name}", embed=log), timeout=5, priority=Priority.MOD_ACTION)
+        pipeline.add("ban", action, after=["dm"], timeout=None, required=True, priority=Priority.MOD_ACTION)
+        pipeline.add("reply", lambda: ctx.message.reply(embed=log, delete_after=10), after=["ban"])
+        pipeline.add("delete", lambda: ctx.message.delete(delay=10), after=["ban"])
+        pipeline.add("public", lambda: self.send_public_log(ctx.guild, public_log), after=["ban"])
+        pipeline.add("case", lambda: self.bot.cases.add("ban", user.id, ctx.author.id, reason), after=["ban"])
+        await pipeline.run()
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(ban_members=True)
     @commands.command(name="unban")
+    @instrument("command")
     async def unban(self, ctx: commands.Context, user: int, *, reason: str = "No reason.") -> None:
         """Unban a user (must use ID) (mod only)
 
@@ -170,40 +209,87 @@ class ModActions(commands.Cog):
         reason = discord.utils.escape_mentions(reason)
 
         try:
-            user = await self.bot.fetch_user(user)
+            user = await self.bot.user_resolver.resolve(user)
         except discord.NotFound:
             raise commands.BadArgument(f"Couldn't find user with ID {user}")
 
-        try:
-            await ctx.guild.unban(discord.Object(id=user.id), reason=reason)
-        except discord.NotFound:
-            raise commands.BadArgument(f"{user} is not banned.")
+        async def unban():
+            try:
+                await ctx.guild.unban(discord.Object(id=user.id), reason=reason)
+            except discord.NotFound:
+                raise commands.BadArgument(f"{user} is not banned.")
 
         log = await logging.prepare_unban_log(ctx.author, user, reason)
-        await ctx.message.reply(embed=log, delete_after=10)
-        await ctx.message.delete(delay=10)
+        public_log = self.prepare_public_log(log, user)
 
-        public_chan = ctx.guild.get_channel(
-            self.bot.channel_public)
-        if public_chan:
-            log.remove_author()
-            log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(embed=log)
+        pipeline = ActionPipeline("unban")
+        pipeline.add("unban", unban, timeout=None, required=True, priority=Priority.MOD_ACTION)
+        pipeline.add("reply", lambda: ctx.message.reply(embed=log, delete_after=10), after=["unban"])
+        pipeline.add("delete", lambda: ctx.message.delete(delay=10), after=["unban"])
+        pipeline.add("public", lambda: self.send_public_log(ctx.guild, public_log), after=["unban"])
+        pipeline.add("case", lambda: self.bot.cases.add("unban", user.id, ctx.author.id, reason), after=["unban"])
+        await pipeline.run()
+
+    def parse_purge_filters(self, filters: str):
+        """Turn purge filters into a predicate on messages
+
+        Parameters
+        ----------
+        filters : str
+            Space separated filters: `user:<@user/ID>`, `contains:<text>` (quote text with spaces),
+            `attachments` and `bots`
+
+        Returns
+        -------
+        callable
+            Predicate, or None if no filters were given
+        """
+
+        checks = []
+        try:
+            tokens = shlex.split(filters)
+        except ValueError:
+            raise commands.BadArgument("Couldn't parse those filters, check your quotes.")
+
+        for token in tokens:
+            key, _, value = token.partition(":")
+            key = key.lower()
+            if key == "user" and re.fullmatch(r"<@!?\d+>|\d+", value):
+                author_id = int(re.sub(r"\D", "", value))
+                checks.append(lambda m, author_id=author_id: m.author.id == author_id)
+            elif key == "contains" and value:
+                text = value.lower()
+                checks.append(lambda m, text=text: text in m.content.lower())
+            elif key == "attachments":
+                checks.append(lambda m: bool(m.attachments))
+            elif key == "bots":
+                checks.append(lambda m: m.author.bot)
+            else:
+                raise commands.BadArgument(f"Unknown purge filter `{token}`.")
+
+        if not checks:
+            return None
+        return lambda m: all(check(m) for check in checks)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_messages=True)
     @commands.command(name="purge")
-    async def purge(self, ctx: commands.Context, limit: int = 0) -> None:
+    @instrument("command")
+    async def purge(self, ctx: commands.Context, limit: int = 0, *, filters: str = "") -> None:
         """Purge messages from current channel (mod only)
 
         Example usage:
         --------------
-        `!purge <number of messages>`
+        `!purge <number of messages> <filters (optional)>`
+
+        Filters: user:<@user/ID>, contains:<text>, attachments, bots
 
         Parameters
         ----------
         limit : int, optional
             Number of messages to purge, must be > 0, by default 0 for error handling
+        filters : str, optional
+            Only purge messages matching all of these filters, by default none
 
         """
 
@@ -212,30 +298,46 @@ class ModActions(commands.Cog):
         if limit <= 0:
             raise commands.BadArgument(
                 "Number of messages to purge must be greater than 0")
-        if limit > 100:
-            limit = 100
+        if limit > MAX_PURGE:
+            limit = MAX_PURGE
+
+        check = self.parse_purge_filters(filters)
+        # with filters we may have to look further back than `limit` messages
+        scan_limit = limit if check is None else max(limit, PURGE_SCAN_LIMIT)
+
+        await ctx.message.delete()
+        status = await ctx.send(f"Purging up to {limit} messages...")
 
-        msgs = await ctx.channel.history(limit=limit+1).flatten()
+        async def report_progress(engine):
+            await status.edit(content=f"Purging... {engine.deleted}/{limit} deleted, "
+                                      f"{engine.scanned} scanned ({engine.rate:.1f}/s)")
 
-        await ctx.channel.purge(limit=limit+1)
-        await ctx.send(f'Purged {len(msgs)} messages.', delete_after=10)
+        engine = PurgeEngine(ctx.channel, progress=report_progress)
+        with priority(Priority.MOD_ACTION):
+            await engine.scan(ctx.channel.history(limit=scan_limit, before=ctx.message), limit, check)
+            await engine.finish()
+
+        await status.edit(content=f'Purged {engine.deleted} messages ({engine.rate:.1f}/s).', delete_after=10)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_messages=True)
     @commands.command(name="purgeuser")
-    async def purgeuser(self, ctx: commands.Context, user: discord.Member, limit: int = 0) -> None:
-        """Purge a specific user's messages from current channel (mod only)
+    @instrument("command")
+    async def purgeuser(self, ctx: commands.Context, user: typing.Union[discord.Member, int], limit: int = 0, scope: str = "here") -> None:
+        """Purge a specific user's messages from current channel, or from every channel (mod only)
 
         Example usage:
         --------------
-        `!purgeuser @user <number of messages>`
+        `!purgeuser <@user/ID> <number of messages per channel> <here/all (optional)>`
 
         Parameters
         ----------
-        user : discord.Member        
-            user to purge messages of
+        user : typing.Union[discord.Member, int]
+            user to purge messages of, doesn't have to be part of the guild
         limit : int, optional
-            Number of messages to purge, must be > 0, by default 0 for error handling
+            Number of messages to purge per channel, must be > 0, by default 0 for error handling
+        scope : str, optional
+            "here" for the current channel, "all" for every text channel, by default "here"
 
         """
 
@@ -244,17 +346,59 @@ class ModActions(commands.Cog):
         if limit <= 0:
             raise commands.BadArgument(
                 "Number of messages to purge must be greater than 0")
-        if limit > 100:
-            limit = 100
+        if limit > MAX_PURGE:
+            limit = MAX_PURGE
+
+        scope = scope.lower()
+        if scope == "here":
+            channels = [ctx.channel]
+        elif scope == "all":
+            channels = [channel for channel in ctx.guild.text_channels
+                        if channel.permissions_for(ctx.guild.me).manage_messages
+                        and channel.permissions_for(ctx.guild.me).read_message_history]
+        else:
+            raise commands.BadArgument("Scope must be either `here` or `all`.")
 
-        msgs = await user.history(limit=limit+1).flatten()
-        await ctx.channel.delete_messages(messages=msgs)
+        author_id = user.id if isinstance(user, discord.Member) else user
         await ctx.message.delete()
-        await ctx.send(f'Purged {len(msgs)} messages.', delete_after=10)
+        start = time.perf_counter()
+
+        # find candidates in what we already have cached before asking the API.
+        # deleted messages leave the message cache, so they aren't purged twice
+        candidates = {channel.id: {} for channel in channels}
+        for snapshot in self.bot.message_cache.by_author_id(author_id):
+            if snapshot.channel_id in candidates:
+                channel = ctx.guild.get_channel(snapshot.channel_id)
+                candidates[snapshot.channel_id][snapshot.id] = channel.get_partial_message(snapshot.id)
+
+        semaphore = asyncio.Semaphore(PURGEUSER_CONCURRENCY)
+
+        async def purge_channel(channel):
+            async with semaphore:
+                engine = PurgeEngine(channel)
+                cached = candidates[channel.id]
+                for id in sorted(cached, reverse=True)[:limit]:
+                    await engine.add(cached[id])
+
+                # then look through recent history for anything the cache missed
+                if engine.matched < limit:
+                    await engine.scan(channel.history(limit=PURGEUSER_SCAN_BUDGET),
+                                      limit, lambda m: m.author.id == author_id and m.id not in cached)
+                await engine.finish()
+                return engine
+
+        with priority(Priority.MOD_ACTION):
+            engines = await asyncio.gather(*(purge_channel(channel) for channel in channels))
+        deleted = sum(engine.deleted for engine in engines)
+        elapsed = time.perf_counter() - start
+        channel_count = sum(1 for engine in engines if engine.deleted)
+
+        await ctx.send(f'Purged {deleted} messages from {channel_count} channels in {elapsed:.1f}s.', delete_after=10)
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_roles=True)
     @commands.command(name="mute")
+    @instrument("command")
     async def mute(self, ctx: commands.Context, user: discord.Member, dur: str = "", *, reason: str = "No reason.") -> None:
         """Mute a user (mod only)
 
@@ -277,7 +421,6 @@ class ModActions(commands.Cog):
         reason = discord.utils.escape_markdown(reason)
         reason = discord.utils.escape_mentions(reason)
 
-        now = datetime.datetime.now()
         delta = pytimeparse.parse(dur)
 
         if delta is None:
@@ -288,50 +431,69 @@ class ModActions(commands.Cog):
             else:
                 reason = f"{dur} {reason}"
 
+        await self.mute_member(ctx.guild, ctx.author, user, reason, delta, ctx=ctx)
+
+    async def mute_member(self, guild: discord.Guild, moderator: discord.Member, user: discord.Member,
+                          reason: str, delta: int = None, ctx: commands.Context = None) -> None:
+        """Mute a member, schedule their unmute and log it, for `!mute` and automod alike
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            Guild to mute in
+        moderator : discord.Member
+            Who's muting, the bot itself for automod
+        user : discord.Member
+            Member to mute
+        reason : str
+            Reason for mute, already escaped
+        delta : int, optional
+            Duration in seconds, by default None for a permanent mute
+        ctx : commands.Context, optional
+            Context of the invoking command, to reply to, by default None
+        """
+
+        now = datetime.datetime.now()
         mute_role = self.bot.role_mute
-        mute_role = ctx.guild.get_role(mute_role)
+        mute_role = guild.get_role(mute_role)
 
         if mute_role in user.roles:
             raise commands.BadArgument("This user is already muted.")
         
         punishment = None
-        # until = None
         if delta:
             try:
-                time = now + datetime.timedelta(seconds=delta)
-                # until = time
+                until = now + datetime.timedelta(seconds=delta)
                 punishment = humanize.naturaldelta(
-                    time - now, minimum_unit="seconds")
-                self.bot.tasks.schedule_unmute(user.id, time)
+                    until - now, minimum_unit="seconds")
+                self.bot.tasks.schedule_unmute(user.id, until)
             except Exception:
                 raise commands.BadArgument(
                     "An error occured, this user is probably already muted")
         else:
             punishment = "PERMANENT"
 
-        await user.add_roles(mute_role)
-
-        log = await logging.prepare_mute_log(ctx.author, user, reason, punishment)
-        await ctx.message.reply(embed=log, delete_after=10)
-        await ctx.message.delete(delay=10)
-
-        log.remove_author()
-        log.set_thumbnail(url=user.avatar_url)
-        dmed = True
-        try:
-            await user.send(f"You have been muted in {ctx.guild.name}", embed=log)
-        except Exception:
-            dmed = False
-
-        public_chan = ctx.guild.get_channel(
-            self.bot.channel_public)
-        if public_chan:
-            await public_chan.send(user.mention if not dmed else "", embed=log)
-
+        log = await logging.prepare_mute_log(moderator, user, reason, punishment)
+        public_log = self.prepare_public_log(log, user)
+
+        # ping the user in the public log if we couldn't DM them
+        pipeline = ActionPipeline("mute")
+        pipeline.add("mute", lambda: user.add_roles(mute_role), timeout=None, required=True, priority=Priority.MOD_ACTION)
+        if ctx is not None:
+            pipeline.add("reply", lambda: ctx.message.reply(embed=log, delete_after=10), after=["mute"])
+            pipeline.add("delete", lambda: ctx.message.delete(delay=10), after=["mute"])
+        pipeline.add("dm", lambda: user.send(f"You have been muted in {guild.name}", embed=public_log),
+                     after=["mute"], timeout=5, priority=Priority.MOD_ACTION)
+        pipeline.add("public", lambda: self.send_public_log(
+            guild, public_log, "" if pipeline.ok("dm") else user.mention), after=["dm"])
+        pipeline.add("case", lambda: self.bot.cases.add(
+            "mute", user.id, moderator.id, reason, punishment), after=["mute"])
+        await pipeline.run()
 
     @commands.guild_only()
     @commands.bot_has_guild_permissions(manage_roles=True)
     @commands.command(name="unmute")
+    @instrument("command")
     async def unmute(self, ctx: commands.Context, user: discord.Member, *, reason: str = "No reason.") -> None:
         """Unmute a user (mod only)
 
@@ -352,31 +514,246 @@ class ModActions(commands.Cog):
 
         mute_role = self.bot.role_mute
         mute_role = ctx.guild.get_role(mute_role)
-        await user.remove_roles(mute_role)
 
-        try:
-            self.bot.tasks.cancel_unmute(user.id)
-        except Exception:
-            pass
+        async def cancel_unmute():
+            try:
+                self.bot.tasks.cancel_unmute(user.id)
+            except Exception:
+                # permanent mute, nothing scheduled
+                pass
 
         log = await logging.prepare_unmute_log(ctx.author, user, reason)
+        public_log = self.prepare_public_log(log, user)
+
+        # ping the user in the public log if we couldn't DM them
+        pipeline = ActionPipeline("unmute")
+        pipeline.add("unmute", lambda: user.remove_roles(mute_role), timeout=None, required=True,
+                     priority=Priority.MOD_ACTION)
+        # only once the role is gone, a failed unmute should keep its scheduled unmute
+        pipeline.add("cancel", cancel_unmute, after=["unmute"])
+        pipeline.add("reply", lambda: ctx.message.reply(embed=log, delete_after=10), after=["unmute"])
+        pipeline.add("delete", lambda: ctx.message.delete(delay=10), after=["unmute"])
+        pipeline.add("dm", lambda: user.send(f"You have been unmuted in {ctx.guild.name}", embed=log),
+                     after=["unmute"], timeout=5, priority=Priority.MOD_ACTION)
+        pipeline.add("public", lambda: self.send_public_log(
+            ctx.guild, public_log, "" if pipeline.ok("dm") else user.mention), after=["dm"])
+        pipeline.add("case", lambda: self.bot.cases.add("unmute", user.id, ctx.author.id, reason), after=["unmute"])
+        await pipeline.run()
+
+    async def gather_ids(self, ctx: commands.Context, ids: typing.List[int]) -> typing.List[int]:
+        """Combine IDs given as arguments with IDs from an attached text file, without duplicates"""
+
+        ids = list(ids)
+        for attachment in ctx.message.attachments:
+            text = (await attachment.read()).decode("UTF-8", errors="ignore")
+            ids.extend(int(id) for id in re.findall(r"\d{15,20}", text))
+
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise commands.BadArgument("You need to give me some user IDs, or attach a file with IDs.")
+        if len(ids) > MAX_MASS_TARGETS:
+            raise commands.BadArgument(f"You can only target {MAX_MASS_TARGETS} users at once.")
+        return ids
+
+    async def mass_action(self, ctx: commands.Context, name: str, ids: typing.List[int], reason: str, action) -> None:
+        """Run `action` on every ID with bounded concurrency, reporting progress as we go,
+        then post a single summary with a results file.
 
-        await ctx.message.reply(embed=log, delete_after=10)
-        await ctx.message.delete(delay=10)
+        Parameters
+        ----------
+        ctx : commands.Context
+            Context of the invoking command
+        name : str
+            Name of the action (i.e "ban")
+        ids : typing.List[int]
+            Users to target
+        reason : str
+            Reason for the action
+        action : callable
+            Coroutine function called with a user ID and the member (or None if not in the guild),
+            returns a short description of what was done
+        """
 
-        dmed = True
+        results = []
+        start = time.perf_counter()
+        status = await ctx.send(f"Running {name} on {len(ids)} users...")
+
+        # discord.py queues requests per rate limit bucket, we just keep it from
+        # piling up hundreds of requests behind a single bucket at once
+        semaphore = asyncio.Semaphore(MASS_CONCURRENCY)
+
+        async def run(id):
+            async with semaphore:
+                member = ctx.guild.get_member(id)
+                try:
+                    await self.check_permissions(ctx, member or id)
+                    with priority(Priority.MOD_ACTION):
+                        results.append((id, "ok", await action(id, member)))
+                except commands.BadArgument as e:
+                    results.append((id, "skipped", str(e)))
+                except Exception as e:
+                    results.append((id, "failed", str(e)))
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(3)
+                rate = len(results) / (time.perf_counter() - start)
+                await status.edit(content=f"Running {name} on {len(ids)} users... {len(results)}/{len(ids)} done ({rate:.1f}/s)")
+
+        progress = self.bot.loop.create_task(report_progress())
         try:
-            await user.send(f"You have been unmuted in {ctx.guild.name}", embed=log)
-        except Exception:
-            dmed = False
-
-        public_chan = ctx.guild.get_channel(
-            self.bot.channel_public)
+            await asyncio.gather(*(run(id) for id in ids))
+        finally:
+            progress.cancel()
+
+        elapsed = time.perf_counter() - start
+        await self.bot.cases.add_many([self.bot.cases.make_case(name, id, ctx.author.id, reason)
+                                       for id, outcome, _ in results if outcome == "ok"])
+
+        counts = {outcome: 0 for outcome in ("ok", "skipped", "failed")}
+        output = BytesIO()
+        output.write(b"id,outcome,detail\n")
+        for id, outcome, detail in results:
+            counts[outcome] += 1
+            detail = detail.replace('"', "'")
+            output.write(f'{id},{outcome},"{detail}"\n'.encode("UTF-8"))
+
+        embed = discord.Embed(title=f"Mass {name}")
+        embed.color = discord.Color.dark_red()
+        embed.add_field(name="Mod", value=f'{ctx.author} ({ctx.author.mention})', inline=True)
+        embed.add_field(name="Reason", value=reason, inline=True)
+        embed.add_field(
+            name="Results", value=f"{counts['ok']} done, {counts['skipped']} skipped, {counts['failed']} failed", inline=False)
+        embed.add_field(
+            name="Throughput", value=f"{len(results) / elapsed:.1f} actions/s over {elapsed:.1f}s", inline=False)
+        embed.timestamp = datetime.datetime.now()
+
+        await status.edit(content=None, embed=embed)
+        public_chan = ctx.guild.get_channel(self.bot.channel_public)
         if public_chan:
-            log.remove_author()
-            log.set_thumbnail(url=user.avatar_url)
-            await public_chan.send(user.mention if not dmed else "", embed=log)
+            output.seek(0)
+            with priority(Priority.MOD_ACTION):
+                await public_chan.send(embed=embed, file=discord.File(output, f"mass{name}.csv"))
+
+    @commands.guild_only()
+    @commands.bot_has_guild_permissions(ban_members=True)
+    @commands.command(name="massban")
+    @instrument("command")
+    async def massban(self, ctx: commands.Context, ids: commands.Greedy[int], *, reason: str = "No reason.") -> None:
+        """Ban many users at once, by ID or from an attached file of IDs (mod only)
+
+        Example usage:
+        --------------
+        `!massban <IDs> <reason (optional)>`
+
+        Parameters
+        ----------
+        ids : typing.List[int]
+            IDs of the users to ban, don't have to be part of the guild
+        reason : str, optional
+            Reason for ban, by default "No reason."
+
+        """
+
+        await self.check_permissions(ctx)
+
+        reason = discord.utils.escape_markdown(reason)
+        reason = discord.utils.escape_mentions(reason)
+        ids = await self.gather_ids(ctx, ids)
+
+        async def ban(id, member):
+            await ctx.guild.ban(discord.Object(id=id), reason=reason, delete_message_days=0)
+            return "banned" if member else "banned (not in server)"
+
+        await self.mass_action(ctx, "ban", ids, reason, ban)
+
+    @commands.guild_only()
+    @commands.bot_has_guild_permissions(kick_members=True)
+    @commands.command(name="masskick")
+    @instrument("command")
+    async def masskick(self, ctx: commands.Context, ids: commands.Greedy[int], *, reason: str = "No reason.") -> None:
+        """Kick many users at once, by ID or from an attached file of IDs (mod only)
+
+        Example usage:
+        --------------
+        `!masskick <IDs> <reason (optional)>`
 
+        Parameters
+        ----------
+        ids : typing.List[int]
+            IDs of the users to kick
+        reason : str, optional
+            Reason for kick, by default "No reason."
+
+        """
+
+        await self.check_permissions(ctx)
+
+        reason = discord.utils.escape_markdown(reason)
+        reason = discord.utils.escape_mentions(reason)
+        ids = await self.gather_ids(ctx, ids)
+
+        async def kick(id, member):
+            if member is None:
+                raise commands.BadArgument("Not in server.")
+            await member.kick(reason=reason)
+            return "kicked"
+
+        await self.mass_action(ctx, "kick", ids, reason, kick)
+
+    @commands.guild_only()
+    @commands.bot_has_guild_permissions(manage_roles=True)
+    @commands.command(name="massmute")
+    @instrument("command")
+    async def massmute(self, ctx: commands.Context, dur: typing.Optional[Duration], ids: commands.Greedy[int], *, reason: str = "No reason.") -> None:
+        """Mute many users at once, by ID or from an attached file of IDs (mod only)
+
+        Example usage:
+        --------------
+        `!massmute <duration (optional)> <IDs> <reason (optional)>`
+
+        Parameters
+        ----------
+        dur : int, optional
+            Duration of mute (i.e 1h, 10m, 1d), permanent if left out or "perm"
+        ids : typing.List[int]
+            IDs of the users to mute
+        reason : str, optional
+            Reason for mute, by default "No reason."
+
+        """
+
+        await self.check_permissions(ctx)
+
+        reason = discord.utils.escape_markdown(reason)
+        reason = discord.utils.escape_mentions(reason)
+        ids = await self.gather_ids(ctx, ids)
+
+        mute_role = ctx.guild.get_role(self.bot.role_mute)
+        if mute_role is None:
+            raise commands.BadArgument("Mute role not found.")
+
+        until = datetime.datetime.now() + datetime.timedelta(seconds=dur) if dur else None
+
+        async def mute(id, member):
+            if member is None:
+                raise commands.BadArgument("Not in server.")
+            if mute_role in member.roles:
+                raise commands.BadArgument("Already muted.")
+            await member.add_roles(mute_role, reason=reason)
+            # only once the role is on, so a failed mute doesn't leave an unmute behind
+            if until:
+                try:
+                    self.bot.tasks.schedule_unmute(member.id, until)
+                except Exception:
+                    raise commands.BadArgument("Muted, but an unmute was already scheduled.")
+            return f"muted until {until:%B %d, %Y, %I:%M %p}" if until else "muted permanently"
+
+        await self.mass_action(ctx, "mute", ids, reason, mute)
+
+    @massmute.error
+    @masskick.error
+    @massban.error
     @unmute.error
     @mute.error
     @unban.error
@@ -0,0 +1,173 @@
+import traceback
+
+import discord
+from cogs.utils.filters import FILTER_HITS, FILTER_SCAN
+from cogs.utils.metrics import (HANDLER_ERRORS, HANDLER_LATENCY, RATE_LIMITS,
+                                REGISTRY, REST_ERRORS, REST_LATENCY,
+                                MetricsServer, instrument)
+from discord.ext import commands
+
+
+class Stats(commands.Cog):
+    """Runtime metrics of the bot, served to Prometheus and through `!stats`
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.server = MetricsServer(REGISTRY, port=bot.metrics_port)
+        self.bot.loop.create_task(self.start_server())
+
+        REGISTRY.gauge("cuthbert_gateway_latency_seconds", "Gateway heartbeat latency",
+                       function=lambda: self.bot.latency)
+        REGISTRY.gauge("cuthbert_scheduled_jobs", "Unmute jobs waiting in the scheduler",
+                       function=lambda: len(self.bot.tasks.tasks.get_jobs()))
+        REGISTRY.gauge("cuthbert_log_queue_depth", "Log embeds waiting to be sent, per channel", ("channel",),
+                       function=lambda: {(channel_id,): depth for channel_id, depth in self.bot.log_dispatcher.stats()['queue_depth'].items()})
+        REGISTRY.gauge("cuthbert_log_flush_seconds", "Average time to send a batch of log embeds",
+                       function=lambda: self.bot.log_dispatcher.stats()['avg_flush_latency'])
+        REGISTRY.gauge("cuthbert_audit_buffered", "Audit records waiting to be written",
+                       function=lambda: self.bot.audit.stats()['buffered'])
+        REGISTRY.gauge("cuthbert_message_cache_size", "Messages in the message cache, per tier", ("tier",),
+                       function=self.message_cache_size)
+        REGISTRY.gauge("cuthbert_message_cache_hit_ratio", "Message cache lookups that found the message",
+                       function=self.message_cache_hit_ratio)
+        REGISTRY.gauge("cuthbert_permission_index_size", "Members in the permission index",
+                       function=lambda: self.bot.perms.stats()['members'])
+        REGISTRY.gauge("cuthbert_debounced_pending", "Log events waiting to be merged, per kind", ("kind",),
+                       function=self.debounced_pending)
+
+    async def start_server(self) -> None:
+        try:
+            await self.server.start()
+        except OSError:
+            # port taken, i.e a second instance; still collect for `!stats`
+            traceback.print_exc()
+
+    def cog_unload(self):
+        self.bot.loop.create_task(self.server.close())
+
+    # scraped every few seconds, so these read the cache's counters directly instead of building its stats
+    def message_cache_size(self) -> dict:
+        cache = self.bot.message_cache
+        return {("hot",): len(cache.hot), ("pending",): len(cache.pending), ("cold",): cache.cold_size}
+
+    def message_cache_hit_ratio(self) -> float:
+        cache = self.bot.message_cache
+        hits = cache.hot_hits + cache.cold_hits
+        lookups = hits + cache.misses
+        return hits / lookups if lookups else 0.0
+
+    def debounced_pending(self) -> dict:
+        logs = self.bot.get_cog("Logging")
+        if logs is None:
+            return {}
+        return {("member_updates",): logs.member_updates.stats()['pending'],
+                ("message_edits",): logs.message_edits.stats()['pending']}
+
+    @commands.guild_only()
+    @commands.command(name="stats")
+    @instrument("command")
+    async def stats(self, ctx: commands.Context) -> None:
+        """Show runtime metrics of the bot (mod only)
+
+        Example usage:
+        --------------
+        `!stats`
+
+        """
+
+        await self.bot.get_cog("ModActions").check_permissions(ctx)
+        await ctx.send(embed=self.prepare_stats())
+
+    def prepare_stats(self) -> discord.Embed:
+        embed = discord.Embed(title="Stats")
+        embed.color = discord.Color.blurple()
+
+        commands_ = []
+        listeners = []
+        for labels in sorted(HANDLER_LATENCY.values):
+            kind, name = labels
+            line = (f"`{name}` {HANDLER_LATENCY.count(labels)}x · "
+                    f"p50 {HANDLER_LATENCY.quantile(0.5, labels) * 1000:.1f}ms · "
+                    f"p99 {HANDLER_LATENCY.quantile(0.99, labels) * 1000:.1f}ms")
+            if HANDLER_ERRORS.get(labels):
+                line += f" · {int(HANDLER_ERRORS.get(labels))} errors"
+            (commands_ if kind == "command" else listeners).append(line)
+
+        embed.add_field(name="Commands", value="\n".join(commands_)[:1024] or "None yet", inline=False)
+        embed.add_field(name="Listeners", value="\n".join(listeners)[:1024] or "None yet", inline=False)
+
+        rest_calls = sum(state[2] for state in REST_LATENCY.values.values())
+        rest_errors = sum(REST_ERRORS.values.values())
+        rate_limits = RATE_LIMITS.get(("route",))
+        embed.add_field(name="REST", value=f"{rest_calls} calls\n{int(rest_errors)} errors\n"
+                                           f"{int(rate_limits)} 429s ({int(RATE_LIMITS.get(('global',)))} global)", inline=True)
+
+        dispatcher = self.bot.log_dispatcher.stats()
+        audit = self.bot.audit.stats()
+        embed.add_field(name="Queues",
+                        value=f"Log embeds: {sum(dispatcher['queue_depth'].values())} "
+                              f"({dispatcher['shed_batches']} batches shed, {dispatcher['dropped_embeds']} dropped)\n"
+                              f"Audit records: {audit['buffered']}\n"
+                              f"Unmute jobs: {len(self.bot.tasks.tasks.get_jobs())}", inline=True)
+
+        for channel_id, pool in dispatcher['webhooks'].items():
+            embed.add_field(name="Log webhooks",
+                            value=f"<#{channel_id}>: {pool['webhooks']} webhooks\n"
+                                  f"{pool['sent']} sent · {pool['retried']} retried", inline=True)
+
+        outbound = self.bot.outbound.stats()
+        embed.add_field(name="Outbound",
+                        value="\n".join(f"{name.replace('_', ' ').capitalize()}: {level['queued']} queued · "
+                                        f"p99 wait {level['wait_p99'] * 1000:.0f}ms · {level['shed']} shed"
+                                        for name, level in outbound.items()), inline=False)
+
+        cache = self.bot.message_cache.stats()
+        embed.add_field(name="Message cache",
+                        value=f"{cache['hot_size']} hot · {cache['cold_size']} on disk\n"
+                              f"{cache['hit_rate']:.1%} hit rate", inline=True)
+
+        loop = self.bot.loop_monitor.stats()
+        embed.add_field(name="Event loop",
+                        value=f"Lag p50 {loop['lag_p50'] * 1000:.1f}ms · p99 {loop['lag_p99'] * 1000:.1f}ms\n"
+                              f"{loop['slow_callbacks']} slow callbacks", inline=True)
+
+        perms = self.bot.perms.stats()
+        embed.add_field(name="Permission index",
+                        value=f"{perms['members']} members · {perms['updates']} updates\n"
+                              f"{perms['rebuilds']} rebuilds, last {perms['last_rebuild'] * 1000:.1f}ms", inline=True)
+
+        filter_cog = self.bot.get_cog("Filter")
+        if filter_cog is not None:
+            embed.add_field(name="Filter",
+                            value=f"{len(filter_cog.filter)} entries · {int(sum(FILTER_HITS.values.values()))} hits\n"
+                                  f"Scan p99 {FILTER_SCAN.quantile(0.99) * 1e6:.0f}µs", inline=True)
+
+        antispam = self.bot.get_cog("AntiSpam")
+        if antispam is not None:
+            spam = antispam.engine.stats()
+            embed.add_field(name="Anti-spam",
+                            value=f"{spam['users']} members tracked\n"
+                                  + " · ".join(f"{rule} {count}" for rule, count in spam['tripped'].items()), inline=True)
+
+        users = self.bot.user_resolver.stats()
+        embed.add_field(name="User lookups",
+                        value=f"{users['size']} cached · {users['hit_rate']:.1%} hit rate\n"
+                              f"{users['saved_calls']} API calls saved", inline=True)
+
+        embed.set_footer(text=f"Gateway latency {self.bot.latency * 1000:.0f}ms")
+        return embed
+
+    @stats.error
+    async def info_error(self, ctx, error):
+        if (isinstance(error, commands.MissingRequiredArgument)
+            or isinstance(error, commands.BadArgument)
+            or isinstance(error, commands.MissingPermissions)
+                or isinstance(error, commands.NoPrivateMessage)):
+            await self.bot.send_error(ctx, error)
+        else:
+            traceback.print_exc()
+
+
+def setup(bot):
+    bot.add_cog(Stats(bot))
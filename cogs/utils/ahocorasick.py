@@ -0,0 +1,169 @@
+from typing import Iterable, Iterator, Tuple
+
+
+class Automaton():
+    """Aho-Corasick automaton: finds every occurrence of any of a fixed set
+    of patterns in one pass over the text, so scanning costs the same
+    whether there are ten patterns or ten thousand.
+    """
+
+    __slots__ = ('goto', 'fail', 'out')
+
+    def __init__(self, patterns: Iterable[str]):
+        """Build the automaton
+
+        Parameters
+        ----------
+        patterns : Iterable[str]
+            Patterns to look for, empty ones are ignored
+        """
+
+        # state -> {character: next state}, state 0 is the root
+        self.goto = [{}]
+        # state -> patterns that end in this state, including through fail links
+        self.out = [()]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for character in pattern:
+                next_state = self.goto[state].get(character)
+                if next_state is None:
+                    next_state = self.goto[state][character] = len(self.goto)
+                    self.goto.append({})
+                    self.out.append(())
+                state = next_state
+            if pattern not in self.out[state]:
+                self.out[state] += (pattern,)
+
+        # fail links point to the longest proper suffix that is also in the trie,
+        # found breadth first so shorter suffixes are always done already
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for character, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(character, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.out[next_state] += self.out[self.fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def search(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield `(end, pattern)` for every match, `end` being the index right
+        after the match, in the order matches end"""
+
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        state = 0
+        for i, character in enumerate(text):
+            next_state = goto[state].get(character)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(character)
+            state = next_state or 0
+            if out[state]:
+                for pattern in out[state]:
+                    yield i + 1, pattern
+
+
+class IncrementalAutomaton():
+    """Pattern set backed by Aho-Corasick automatons that can change without
+    rebuilding everything.
+
+    Patterns added since the last full build go into a second, small
+    automaton, rebuilt on every add; once it holds `merge_at` patterns, it's
+    time for a full build. Removed patterns are skipped at search time
+    until the next full build drops them. Full builds can run on another
+    thread: `build` only reads a snapshot, `install` swaps the result in.
+    """
+
+    def __init__(self, merge_at: int = 256):
+        """Initialize an empty pattern set
+
+        Parameters
+        ----------
+        merge_at : int, optional
+            Patterns added since the last full build before another one is due, by default 256
+        """
+
+        self.merge_at = merge_at
+        # pattern -> value returned for its matches
+        self.patterns = {}
+        self.base = Automaton(())
+        self.built = frozenset()
+        self.recent = Automaton(())
+        self.pending = set()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    @property
+    def needs_build(self) -> bool:
+        return len(self.pending) >= self.merge_at or len(self.built) - len(self.patterns) + len(self.pending) >= self.merge_at
+
+    def reset(self, patterns: dict, build: bool = True) -> None:
+        """Replace every pattern (pattern -> value) and do a full build
+
+        With `build` False the build is left to the caller, for running it
+        on another thread; until then only patterns from the last full build
+        or added since the reset match.
+        """
+
+        self.patterns = dict(patterns)
+        self.pending = set()
+        self.recent = Automaton(())
+        if build:
+            self.rebuild()
+
+    def add(self, pattern: str, value=None) -> None:
+        known = pattern in self.patterns
+        self.patterns[pattern] = value
+        if not known and pattern not in self.built:
+            self.pending.add(pattern)
+            self.recent = Automaton(self.pending)
+
+    def remove(self, pattern: str) -> bool:
+        if pattern not in self.patterns:
+            return False
+        del self.patterns[pattern]
+        if pattern in self.pending:
+            self.pending.discard(pattern)
+            self.recent = Automaton(self.pending)
+        return True
+
+    def build(self, patterns: frozenset = None) -> Tuple[Automaton, frozenset]:
+        """Build an automaton for `install`
+
+        Parameters
+        ----------
+        patterns : frozenset, optional
+            Snapshot of the patterns to build, taken on the thread that changes them; by default every current pattern
+        """
+
+        if patterns is None:
+            patterns = frozenset(self.patterns)
+        return Automaton(patterns), patterns
+
+    def install(self, built: Tuple[Automaton, frozenset]) -> None:
+        self.base, self.built = built
+        self.pending = {pattern for pattern in self.patterns if pattern not in self.built}
+        self.recent = Automaton(self.pending)
+
+    def rebuild(self) -> None:
+        self.install(self.build())
+
+    def search(self, text: str) -> Iterator[Tuple[int, str, object]]:
+        """Yield `(end, pattern, value)` for every match of a current pattern"""
+
+        patterns = self.patterns
+        for automaton in (self.base, self.recent) if self.pending else (self.base,):
+            for end, pattern in automaton.search(text):
+                if pattern in patterns:
+                    yield end, pattern, patterns[pattern]
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import discord
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class AuditSink():
+    """Write-behind buffer for audit records.
+
+    `record` only appends to an in-memory buffer, so logging an event never
+    waits on the database. The buffer is written with a single `insert_many`
+    once it reaches `flush_size` records or every `flush_interval` seconds,
+    whichever comes first, from a background thread.
+
+    Records that couldn't be written go back in front of the buffer with the
+    `_id` `insert_many` gave them, so retrying a batch that was partly
+    written only skips the duplicates instead of failing forever.
+    """
+
+    def __init__(self, bot: discord.Client, database: str = "cuthbert", collection: str = "audit", client: MongoClient = None,
+                 flush_size: int = 500, flush_interval: float = 5.0, max_buffer: int = 50000, **connect_args):
+        """Initialize audit sink
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        database : str, optional
+            Database to store records in, by default "cuthbert"
+        collection : str, optional
+            Collection to store records in, by default "audit"
+        client : MongoClient, optional
+            Client to use, by default one is created from `connect_args`
+        flush_size : int, optional
+            Buffered records that trigger a flush, by default 500
+        flush_interval : float, optional
+            Seconds between periodic flushes, by default 5.0
+        max_buffer : int, optional
+            Most records kept while the database is unreachable, oldest are dropped first, by default 50000
+        """
+
+        client = client or MongoClient(**connect_args)
+        self.collection = client[database][collection]
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self.buffer = deque(maxlen=max_buffer)
+        self.lock = asyncio.Lock()
+        self.flusher = None
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="audit")
+        self.timer = bot.loop.create_task(self._flush_periodically())
+
+        self.flushes = 0
+        self.flushed_records = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_size = 0
+        self.last_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def record(self, event: str, **fields) -> None:
+        """Buffer an audit record
+
+        Parameters
+        ----------
+        event : str
+            Kind of event, i.e "message_delete"
+        **fields
+            Anything else to store with the record
+        """
+
+        fields["event"] = event
+        fields["timestamp"] = datetime.utcnow()
+        # a full deque drops its oldest record
+        if len(self.buffer) == self.max_buffer:
+            self.dropped += 1
+        self.buffer.append(fields)
+
+        if len(self.buffer) >= self.flush_size and (self.flusher is None or self.flusher.done()):
+            self.flusher = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        """Write everything buffered so far"""
+
+        async with self.lock:
+            batch, self.buffer = list(self.buffer), deque(maxlen=self.max_buffer)
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(self.writer, lambda: self.collection.insert_many(batch, ordered=False))
+            except BulkWriteError as e:
+                # unordered, so everything without a write error went in. Duplicates
+                # were written by an earlier attempt, retry the rest
+                errors = e.details.get("writeErrors", [])
+                failed = [batch[error["index"]] for error in errors if error.get("code") != DUPLICATE_KEY]
+                self.flushed_records += len(batch) - len(failed)
+                if failed:
+                    self.failed_flushes += 1
+                    logger.error(f"Failed to write {len(failed)} of {len(batch)} audit records: {errors[0].get('errmsg')}")
+                    self._requeue(failed)
+                return
+            except Exception:
+                self.failed_flushes += 1
+                logger.exception(f"Failed to write {len(batch)} audit records")
+                self._requeue(batch)
+                return
+
+            latency = time.perf_counter() - start
+            self.flushes += 1
+            self.flushed_records += len(batch)
+            self.last_flush_size = len(batch)
+            self.last_flush_latency = latency
+            self.total_flush_latency += latency
+
+    def _requeue(self, batch: list) -> None:
+        # back in front of whatever came in meanwhile, for the next flush. Past
+        # `max_buffer`, extending drops the oldest ones
+        buffer = deque(batch, maxlen=self.max_buffer)
+        overflow = len(batch) + len(self.buffer) - self.max_buffer
+        buffer.extend(self.buffer)
+        self.buffer = buffer
+        if overflow > 0:
+            self.dropped += overflow
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def drain(self) -> None:
+        """Stop periodic flushes and write out everything that's left, for a clean shutdown"""
+
+        self.timer.cancel()
+        await self.flush()
+        self.writer.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """Snapshot of sink metrics
+
+        Returns
+        -------
+        dict
+            Buffer fill, flush sizes and latencies (seconds)
+        """
+
+        return {
+            'buffered': len(self.buffer),
+            'buffer_fill': len(self.buffer) / self.max_buffer,
+            'flushes': self.flushes,
+            'flushed_records': self.flushed_records,
+            'failed_flushes': self.failed_flushes,
+            'dropped': self.dropped,
+            'last_flush_size': self.last_flush_size,
+            'avg_flush_size': self.flushed_records / self.flushes if self.flushes else 0.0,
+            'last_flush_latency': self.last_flush_latency,
+            'avg_flush_latency': self.total_flush_latency / self.flushes if self.flushes else 0.0,
+        }
@@ -0,0 +1,134 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+
+
+class CaseStore():
+    """Moderation cases (kicks, bans, mutes...) stored in MongoDB.
+
+    Cases are read newest first per user or per moderator, so both orders
+    have a compound index ending in `_id` to break ties between cases with
+    the same timestamp. Pages are fetched with keyset pagination: the next
+    page starts after the (timestamp, _id) of the last case seen, so deep
+    pages cost the same as the first one.
+
+    pymongo is synchronous, so queries run on a small thread pool to keep
+    them off the event loop.
+    """
+
+    def __init__(self, database: str = "cuthbert", collection: str = "cases", client: MongoClient = None, **connect_args):
+        """Initialize case store, creating indexes if needed
+
+        Parameters
+        ----------
+        database : str, optional
+            Database to store cases in, by default "cuthbert"
+        collection : str, optional
+            Collection to store cases in, by default "cases"
+        client : MongoClient, optional
+            Client to use, by default one is created from `connect_args`
+        """
+
+        client = client or MongoClient(**connect_args)
+        self.collection = client[database][collection]
+        self.collection.create_index(
+            [("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="user_timeline")
+        self.collection.create_index(
+            [("moderator_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="moderator_timeline")
+
+        self._executor = ThreadPoolExecutor(4, thread_name_prefix="cases")
+
+    @staticmethod
+    def make_case(type: str, user_id: int, moderator_id: int, reason: str, punishment: str = None) -> dict:
+        return {
+            "_id": ObjectId(),
+            "type": type,
+            "user_id": user_id,
+            "moderator_id": moderator_id,
+            "reason": reason,
+            "punishment": punishment,
+            "timestamp": datetime.utcnow(),
+        }
+
+    async def add(self, type: str, user_id: int, moderator_id: int, reason: str, punishment: str = None) -> dict:
+        """Record a case
+
+        Parameters
+        ----------
+        type : str
+            Kind of action, i.e "ban"
+        user_id : int
+            User the action was taken against
+        moderator_id : int
+            Moderator who took the action
+        reason : str
+            Reason for the action
+        punishment : str, optional
+            Duration or other details, by default None
+
+        Returns
+        -------
+        dict
+            The case document
+        """
+
+        case = self.make_case(type, user_id, moderator_id, reason, punishment)
+        await self._run(self.collection.insert_one, case)
+        return case
+
+    async def add_many(self, cases: list) -> None:
+        """Record many cases made with `make_case` in one round trip"""
+
+        if cases:
+            await self._run(self.collection.insert_many, cases, ordered=False)
+
+    async def user_cases(self, user_id: int, after: tuple = None, limit: int = 10) -> list:
+        """Cases against a user, newest first
+
+        Parameters
+        ----------
+        user_id : int
+            User whose cases to get
+        after : tuple, optional
+            Cursor of the last case of the previous page, see `cursor`, by default None
+        limit : int, optional
+            Page size, by default 10
+
+        Returns
+        -------
+        list
+            Case documents
+        """
+
+        return await self._run(self.page, "user_id", user_id, after, limit)
+
+    async def moderator_cases(self, moderator_id: int, after: tuple = None, limit: int = 10) -> list:
+        """Cases made by a moderator, newest first. Same as `user_cases` otherwise."""
+
+        return await self._run(self.page, "moderator_id", moderator_id, after, limit)
+
+    def page(self, field: str, id: int, after: tuple = None, limit: int = 10) -> list:
+        query = {field: id}
+        if after is not None:
+            timestamp, case_id = after
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": case_id}},
+            ]
+
+        cursor = self.collection.find(query).sort(
+            [("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit)
+        return list(cursor)
+
+    @staticmethod
+    def cursor(case: dict) -> tuple:
+        """Keyset cursor to fetch the page after `case`"""
+
+        return case["timestamp"], case["_id"]
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
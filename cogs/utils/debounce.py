@@ -0,0 +1,101 @@
+import asyncio
+
+
+class _Pending():
+    __slots__ = ('state', 'events', 'first', 'handle')
+
+    def __init__(self, state, first):
+        self.state = state
+        self.events = 0
+        self.first = first
+        self.handle = None
+
+
+class Debouncer():
+    """Coalesces bursts of updates per key.
+
+    Every update to a key pushes its flush back by `delay` seconds, up to
+    `max_delay` seconds after the first update, so a steady stream of
+    updates still gets flushed eventually. When the timer fires, `callback`
+    is called with the key, the accumulated state and the number of events
+    that were merged into it.
+    """
+
+    def __init__(self, callback, delay: float = 3.0, max_delay: float = 15.0):
+        """Initialize debouncer
+
+        Parameters
+        ----------
+        callback : callable
+            Coroutine function called as `callback(key, state, events)`
+        delay : float, optional
+            Seconds of quiet before a key is flushed, by default 3.0
+        max_delay : float, optional
+            Most seconds a key waits after its first update, by default 15.0
+        """
+
+        self.callback = callback
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = {}
+        # callbacks started by timers that haven't finished yet
+        self.running = set()
+
+        self.events = 0
+        self.flushes = 0
+
+    def update(self, key, factory):
+        """Register an update for `key`
+
+        Parameters
+        ----------
+        key : hashable
+            What the update is about, i.e a member ID
+        factory : callable
+            Creates the initial state if `key` has nothing pending
+
+        Returns
+        -------
+        object
+            The pending state for `key`, for the caller to merge the update into
+        """
+
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.pending[key] = _Pending(factory(), now)
+        else:
+            entry.handle.cancel()
+
+        entry.events += 1
+        self.events += 1
+        entry.handle = loop.call_at(min(now + self.delay, entry.first + self.max_delay), self._fire, key)
+        return entry.state
+
+    def _fire(self, key) -> None:
+        entry = self.pending.pop(key)
+        self.flushes += 1
+        task = asyncio.ensure_future(self.callback(key, entry.state, entry.events))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def flush_all(self) -> None:
+        """Flush everything pending right away, and wait for flushes that
+        already started"""
+
+        for key in list(self.pending):
+            entry = self.pending.pop(key)
+            entry.handle.cancel()
+            self.flushes += 1
+            await self.callback(key, entry.state, entry.events)
+        await asyncio.gather(*self.running, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self.pending),
+            'events': self.events,
+            'flushes': self.flushes,
+            'merged': self.events - self.flushes - len(self.pending),
+        }
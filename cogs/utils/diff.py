@@ -0,0 +1,73 @@
+import re
+from difflib import SequenceMatcher
+
+TOKEN = re.compile(r"\s+|\w+|[^\w\s]")
+MARKDOWN = re.compile(r"([*_~`|>\\])")
+
+
+def escape(text: str) -> str:
+    return MARKDOWN.sub(r"\\\1", text)
+
+
+def inline_diff(before: str, after: str, context: int = 40, limit: int = 1024) -> str:
+    """Word level diff of two strings as Discord markdown. Removed text is
+    ~~struck through~~, added text is **bold**, and long unchanged stretches
+    are cut down to `context` characters on each side of a change.
+
+    Parameters
+    ----------
+    before : str
+        Old text
+    after : str
+        New text
+    context : int, optional
+        Unchanged characters to keep around each change, by default 40
+    limit : int, optional
+        Most characters to return, by default 1024 (embed field limit)
+
+    Returns
+    -------
+    str
+        The diff
+    """
+
+    a = TOKEN.findall(before)
+    b = TOKEN.findall(after)
+    opcodes = SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+    parts = []
+    for i, (tag, a1, a2, b1, b2) in enumerate(opcodes):
+        if tag == "equal":
+            text = "".join(a[a1:a2])
+            first, last = i == 0, i == len(opcodes) - 1
+            keep_head = 0 if first else context
+            keep_tail = 0 if last else context
+            if len(text) > keep_head + keep_tail + 5:
+                head, tail = text[:keep_head].rstrip(" "), text[len(text) - keep_tail:].lstrip(" ")
+                text = head + " … " + tail if keep_head or keep_tail else "…"
+                text = text.lstrip(" ") if first else text
+                text = text.rstrip(" ") if last else text
+            parts.append(escape(text))
+            continue
+
+        removed = "".join(a[a1:a2])
+        added = "".join(b[b1:b2])
+        if removed.strip():
+            parts.append(f"~~{escape(removed.strip())}~~")
+            if not added.strip() and removed[-1].isspace():
+                parts.append(" ")
+        if added.strip():
+            # keep the whitespace around added text outside of the markers
+            core = added.strip()
+            start = added.index(core)
+            lead, trail = added[:start], added[start + len(core):]
+            if removed.strip() and not lead:
+                lead = " "
+            parts.append(f"{lead}**{escape(core)}**{trail}")
+        elif not removed.strip():
+            parts.append(added)
+
+    diff = "".join(parts)
+    if len(diff) > limit:
+        diff = diff[:limit - 3] + "..."
+    return diff
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import time
+
+import discord
+from cogs.utils.outbound import PRIORITY, Priority, RequestShed, priority
+from cogs.utils.webhooks import WebhookPool
+from discord.http import Route
+
+logger = logging.getLogger(__name__)
+
+# Discord accepts at most 10 embeds in a single message, with at most
+# 6000 characters between all of them
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+# and at most 1024 characters in a field's value
+MAX_FIELD_CHARS = 1024
+
+
+def truncate(text: str, limit: int = MAX_FIELD_CHARS) -> str:
+    """Cut `text` down to `limit` characters, ending in "..." if anything was cut"""
+
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class LogDispatcher():
+    """Queues outgoing log embeds per destination channel and flushes them
+    as multi-embed messages, so a burst of events costs one REST call per
+    10 embeds (or 6000 characters of them) instead of one per event.
+
+    Channels can also be given a pool of webhooks with `use_webhooks`, in
+    which case batches go out through the webhooks, one in flight per
+    webhook, and only fall back to the bot's own route if the pool fails.
+    """
+
+    def __init__(self, bot: discord.Client, flush_interval: float = 1.0, max_queue: int = 500, shed_retries: int = 5):
+        """Initialize dispatcher
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        flush_interval : float, optional
+            Longest time (seconds) an embed waits for a batch to fill up, by default 1.0
+        max_queue : int, optional
+            Queue size per channel before `send` starts blocking, by default 500
+        shed_retries : int, optional
+            Times a batch the outbound scheduler shed is sent again, backing off from `flush_interval`, by default 5
+        """
+
+        self.bot = bot
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.shed_retries = shed_retries
+
+        self.queues = {}
+        self.workers = {}
+        self.pools = {}
+
+        self.flushes = 0
+        self.flushed_embeds = 0
+        self.failed_flushes = 0
+        self.rejected_embeds = 0
+        self.shed_batches = 0
+        self.shed_embeds = 0
+        self.dropped_embeds = 0
+        self.last_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+        self.max_queue_wait = 0.0
+
+    async def send(self, channel: discord.TextChannel, embed: discord.Embed) -> None:
+        """Queue an embed to be sent to `channel`. If the channel's queue is full,
+        this waits until the worker catches up (backpressure).
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            Destination channel, ignored if None
+        embed : discord.Embed
+            Embed to send
+        """
+
+        if channel is None:
+            return
+
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = asyncio.Queue(maxsize=self.max_queue)
+            self.workers[channel.id] = self.bot.loop.create_task(
+                self._worker(channel.id, queue))
+
+        await queue.put((time.perf_counter(), embed))
+
+    async def use_webhooks(self, channel: discord.TextChannel, size: int) -> None:
+        """Deliver logs for `channel` through a pool of `size` webhooks. Does
+        nothing if the channel already has one, and keeps using the bot's own
+        route if the webhooks can't be set up.
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            Destination channel, ignored if None
+        size : int
+            Number of webhooks
+        """
+
+        if channel is None or channel.id in self.pools:
+            return
+
+        pool = WebhookPool(self.bot, channel, size)
+        try:
+            await pool.setup()
+        except discord.HTTPException:
+            logger.exception(f"Couldn't set up log webhooks in {channel.id}, sending logs as the bot")
+        if not pool.ready:
+            await pool.close()
+            return
+
+        self.pools[channel.id] = pool
+        logger.info(f"Sending logs to {channel.id} through {len(pool.lanes)} webhooks")
+
+    async def send_files(self, channel: discord.TextChannel, embed: discord.Embed = None, files: list = ()) -> None:
+        """Send an embed and attachments to `channel` right away, bypassing the
+        batching queue. Dropped if we're short on rate limit.
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            Destination channel, ignored if None
+        embed : discord.Embed, optional
+            Embed to send
+        files : list, optional
+            discord.File attachments
+        """
+
+        if channel is None:
+            return
+
+        pool = self.pools.get(channel.id)
+        if pool is not None and pool.ready:
+            try:
+                await pool.send(embeds=[embed] if embed else None, files=list(files))
+                return
+            except Exception:
+                logger.exception(f"Webhook delivery to {channel.id} failed, sending as the bot")
+                for file in files:
+                    file.reset()
+
+        with priority(Priority.AUDIT):
+            try:
+                await channel.send(embed=embed, files=list(files) or None)
+            except RequestShed:
+                self.shed_batches += 1
+                self.dropped_embeds += 1
+                logger.warning(f"Dropped a log message with {len(files)} files to {channel.id}, too many requests queued")
+
+    async def _worker(self, channel_id: int, queue: asyncio.Queue) -> None:
+        # logs give way to moderator responses and actions when we're short on rate limit
+        PRIORITY.set(Priority.AUDIT)
+        loop = asyncio.get_event_loop()
+        # an embed that didn't fit in the last batch starts the next one
+        overflow = None
+        while True:
+            if overflow is None:
+                batch = [await queue.get()]
+            else:
+                batch, overflow = [overflow], None
+            size = len(batch[0][1])
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < MAX_EMBEDS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[1]) > MAX_EMBED_CHARS:
+                    overflow = item
+                    break
+                batch.append(item)
+                size += len(item[1])
+
+            pool = self.pools.get(channel_id)
+            if pool is None:
+                await self._flush(channel_id, batch)
+                self._done(queue, batch)
+                continue
+
+            # webhooks have a rate limit each, so keep one batch in flight per webhook
+            await pool.slots.acquire()
+            task = loop.create_task(self._flush(channel_id, batch))
+            task.add_done_callback(lambda _, batch=batch: (pool.slots.release(), self._done(queue, batch)))
+
+    def _done(self, queue: asyncio.Queue, batch: list) -> None:
+        for _ in batch:
+            queue.task_done()
+
+    async def _flush(self, channel_id: int, batch: list) -> None:
+        start = time.perf_counter()
+        self.max_queue_wait = max(self.max_queue_wait, start - batch[0][0])
+        rejected = self.rejected_embeds
+
+        # sending one embed at a time takes them off the front, so a retry only sends what's left
+        pending = list(batch)
+        attempt = 0
+        try:
+            while True:
+                try:
+                    await self._deliver(channel_id, pending)
+                    break
+                except RequestShed:
+                    # shed because other requests come first right now, not because the batch is bad
+                    self.shed_batches += 1
+                    self.shed_embeds += len(pending)
+                    if attempt >= self.shed_retries:
+                        self.dropped_embeds += len(pending)
+                        logger.error(f"Dropped {len(pending)} log embeds to {channel_id}, shed {attempt + 1} times")
+                        return
+                    delay = self.flush_interval * 2 ** attempt
+                    attempt += 1
+                    logger.warning(f"{len(pending)} log embeds to {channel_id} were shed, retrying in {delay:g}s")
+                    await asyncio.sleep(delay)
+        except Exception:
+            self.failed_flushes += 1
+            logger.exception(f"Failed to flush {len(batch)} log embeds to {channel_id}")
+            return
+
+        latency = time.perf_counter() - start
+        self.flushes += 1
+        self.flushed_embeds += len(batch) - (self.rejected_embeds - rejected)
+        self.last_flush_latency = latency
+        self.total_flush_latency += latency
+
+    async def _deliver(self, channel_id: int, batch: list) -> None:
+        pool = self.pools.get(channel_id)
+        if pool is not None and pool.ready:
+            try:
+                await pool.send(embeds=[embed for _, embed in batch])
+                return
+            except Exception:
+                logger.exception(f"Webhook delivery to {channel_id} failed, sending as the bot")
+        await self._send_as_bot(channel_id, batch)
+
+    async def _send_as_bot(self, channel_id: int, batch: list) -> None:
+        try:
+            await self._post(channel_id, [embed for _, embed in batch])
+        except discord.HTTPException as e:
+            if e.status != 400 or len(batch) == 1:
+                raise
+            # one invalid embed gets the whole message rejected, send them one by one so only it's lost
+            logger.warning(f"Discord rejected a batch of {len(batch)} log embeds to {channel_id}, sending them one at a time")
+            while batch:
+                try:
+                    await self._post(channel_id, [batch[0][1]])
+                except discord.HTTPException as e:
+                    if e.status != 400:
+                        raise
+                    self.rejected_embeds += 1
+                    logger.error(f"Discord rejected a log embed to {channel_id}: {e.text}")
+                del batch[0]
+
+    async def _post(self, channel_id: int, embeds: list) -> None:
+        # discord.py 1.x only exposes `embed=` on Messageable.send, so we hit
+        # the create message route directly to send the whole batch at once
+        route = Route('POST', '/channels/{channel_id}/messages', channel_id=channel_id)
+        payload = {
+            'embeds': [embed.to_dict() for embed in embeds],
+            'allowed_mentions': {'parse': []},
+        }
+        await self.bot.http.request(route, json=payload)
+
+    async def drain(self) -> None:
+        """Wait until every queued embed has been flushed."""
+
+        await asyncio.gather(*(queue.join() for queue in self.queues.values()))
+
+    async def close(self) -> None:
+        """Close the webhook pools' HTTP sessions"""
+
+        for pool in self.pools.values():
+            await pool.close()
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self.queues.values())
+
+    def stats(self) -> dict:
+        """Snapshot of dispatcher metrics
+
+        Returns
+        -------
+        dict
+            Queue depth per channel, flush counts and latencies (seconds)
+        """
+
+        return {
+            'queue_depth': {channel_id: queue.qsize() for channel_id, queue in self.queues.items()},
+            'flushes': self.flushes,
+            'flushed_embeds': self.flushed_embeds,
+            'failed_flushes': self.failed_flushes,
+            'rejected_embeds': self.rejected_embeds,
+            'shed_batches': self.shed_batches,
+            'shed_embeds': self.shed_embeds,
+            'dropped_embeds': self.dropped_embeds,
+            'last_flush_latency': self.last_flush_latency,
+            'avg_flush_latency': self.total_flush_latency / self.flushes if self.flushes else 0.0,
+            'max_queue_wait': self.max_queue_wait,
+            'webhooks': {channel_id: pool.stats() for channel_id, pool in self.pools.items()},
+        }
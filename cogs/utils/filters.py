@@ -0,0 +1,153 @@
+import asyncio
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from cogs.utils.ahocorasick import IncrementalAutomaton
+from cogs.utils.metrics import REGISTRY
+from pymongo import MongoClient
+
+# word: whole words or phrases, domain: a link's host (subdomains included),
+# substring: anywhere, even inside other words
+KINDS = ("word", "domain", "substring")
+
+FILTER_SCAN = REGISTRY.histogram(
+    "cuthbert_filter_scan_seconds", "Time to check a message against the filter",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01))
+FILTER_HITS = REGISTRY.counter("cuthbert_filter_hits_total", "Messages removed by the filter", ("kind",))
+
+# letters from other scripts that look like latin ones, after case folding.
+# NFKD already takes care of accents, fullwidth and "fancy font" letters
+CONFUSABLES = str.maketrans({
+    # cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "і": "i", "ї": "i", "ј": "j", "к": "k", "м": "m",
+    "н": "h", "о": "o", "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "ѕ": "s", "ԁ": "d", "ԛ": "q",
+    "ԝ": "w", "һ": "h", "ӏ": "l",
+    # greek
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x", "ω": "w",
+    # latin lookalikes NFKD leaves alone
+    "ı": "i", "ȷ": "j", "ł": "l", "ø": "o", "đ": "d", "ħ": "h", "ŧ": "t", "ɡ": "g", "ɑ": "a", "ʋ": "u",
+})
+
+
+def normalize(text: str) -> str:
+    """Fold `text` to what it looks like: lowercase latin letters without
+    accents, zero width characters or lookalikes from other scripts"""
+
+    if text.isascii():
+        return text.lower()
+
+    text = unicodedata.normalize("NFKD", text)
+    # drop accents (combining marks) and invisible formatting characters like zero width spaces
+    text = "".join(character for character in text
+                   if not unicodedata.combining(character) and unicodedata.category(character) != "Cf")
+    return text.casefold().translate(CONFUSABLES)
+
+
+def normalize_pattern(kind: str, pattern: str) -> str:
+    pattern = normalize(pattern.strip())
+    if kind == "domain":
+        pattern = pattern.split("://", 1)[-1].split("/", 1)[0]
+        if pattern.startswith("www."):
+            pattern = pattern[4:]
+    return pattern
+
+
+class WordFilter():
+    """Matches messages against every filter entry in a single pass.
+
+    Entries are normalized the same way as messages and go into an
+    `IncrementalAutomaton`. Word and domain matches only count if they don't
+    continue into letters or digits on either side, so "ass" doesn't match
+    "class" and "example.com" doesn't match "myexample.com".
+    """
+
+    def __init__(self, merge_at: int = 256):
+        self.automaton = IncrementalAutomaton(merge_at)
+
+    def __len__(self) -> int:
+        return len(self.automaton)
+
+    def load(self, entries: list, build: bool = True) -> None:
+        """Replace every entry and build from scratch, or leave the build to the caller if `build` is False"""
+
+        self.automaton.reset({entry["_id"]: entry for entry in entries}, build)
+
+    def add(self, entry: dict) -> None:
+        self.automaton.add(entry["_id"], entry)
+
+    def remove(self, pattern: str) -> bool:
+        return self.automaton.remove(pattern)
+
+    def match(self, text: str) -> dict:
+        """First entry `text` matches
+
+        Parameters
+        ----------
+        text : str
+            Message content
+
+        Returns
+        -------
+        dict
+            The entry, or None if nothing matched
+        """
+
+        text = normalize(text)
+        for end, pattern, entry in self.automaton.search(text):
+            if entry["kind"] == "substring":
+                return entry
+            start = end - len(pattern)
+            if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                return entry
+        return None
+
+
+class FilterStore():
+    """Filter entries stored in MongoDB, keyed by their normalized pattern.
+
+    pymongo is synchronous, so queries run on a thread to keep them off the
+    event loop.
+    """
+
+    def __init__(self, database: str = "cuthbert", collection: str = "filter", client: MongoClient = None, **connect_args):
+        """Initialize filter store
+
+        Parameters
+        ----------
+        database : str, optional
+            Database to store entries in, by default "cuthbert"
+        collection : str, optional
+            Collection to store entries in, by default "filter"
+        client : MongoClient, optional
+            Client to use, by default one is created from `connect_args`
+        """
+
+        client = client or MongoClient(**connect_args)
+        self.collection = client[database][collection]
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="filter")
+
+    @staticmethod
+    def make_entry(kind: str, pattern: str, added_by: int) -> dict:
+        return {
+            "_id": normalize_pattern(kind, pattern),
+            "kind": kind,
+            "pattern": pattern,
+            "added_by": added_by,
+            "added_at": datetime.utcnow(),
+        }
+
+    async def all(self) -> list:
+        return await self._run(lambda: list(self.collection.find({})))
+
+    async def add(self, entry: dict) -> None:
+        await self._run(self.collection.replace_one, {"_id": entry["_id"]}, entry, upsert=True)
+
+    async def remove(self, pattern: str) -> bool:
+        result = await self._run(self.collection.delete_one, {"_id": pattern})
+        return result.deleted_count > 0
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import logging
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from bson.binary import Binary
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMongoJobStore(BaseJobStore):
+    """APScheduler job store that keeps every pending job in memory and
+    persists changes to MongoDB from a background thread.
+
+    The scheduler runs on the bot's event loop, so none of its lookups may
+    block on a database round trip. Jobs are indexed in a heap ordered by
+    next run time; MongoDB is only read once, when the store starts, and
+    writes are queued to a single worker thread so they're applied in order.
+
+    Documents use the same layout as APScheduler's `MongoDBJobStore`, so
+    existing job collections keep working.
+    """
+
+    def __init__(self, database: str = "apscheduler", collection: str = "jobs", client: MongoClient = None,
+                 pickle_protocol: int = pickle.HIGHEST_PROTOCOL, **connect_args):
+        """Initialize job store
+
+        Parameters
+        ----------
+        database : str, optional
+            Database to store jobs in, by default "apscheduler"
+        collection : str, optional
+            Collection to store jobs in, by default "jobs". Can also be
+            a collection object, for example an in-memory stand-in for tests.
+        client : MongoClient, optional
+            Client to use, by default one is created from `connect_args`
+        pickle_protocol : int, optional
+            Pickle protocol for job state, by default pickle.HIGHEST_PROTOCOL
+        """
+
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+        if isinstance(collection, str):
+            client = client or MongoClient(**connect_args)
+            collection = client[database][collection]
+        self.collection = collection
+
+        self._jobs = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="jobstore")
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+
+        # the only read we ever do, before the scheduler starts processing jobs
+        for document in self.collection.find(projection=['job_state']):
+            try:
+                job = self._reconstitute_job(document['job_state'])
+            except Exception:
+                self._logger.exception(f"Unable to restore job {document['_id']}, removing it")
+                self._write(self.collection.delete_one, {'_id': document['_id']})
+                continue
+            self._jobs[job.id] = job
+            self._push(job)
+
+    def lookup_job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def get_due_jobs(self, now):
+        timestamp = datetime_to_utc_timestamp(now)
+        due = []
+        seen = set()
+        while self._heap and self._heap[0][0] <= timestamp:
+            entry = heapq.heappop(self._heap)
+            if entry[2] not in seen and self._is_current(entry):
+                seen.add(entry[2])
+                due.append(entry)
+
+        # the scheduler updates or removes due jobs itself, so put them back for now
+        for entry in due:
+            heapq.heappush(self._heap, entry)
+        return [self._jobs[entry[2]] for entry in due]
+
+    def get_next_run_time(self):
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return utc_timestamp_to_datetime(self._heap[0][0]) if self._heap else None
+
+    def get_all_jobs(self):
+        jobs = sorted(self._jobs.values(), key=lambda job: (
+            job.next_run_time is None, datetime_to_utc_timestamp(job.next_run_time) or 0))
+        return jobs
+
+    def add_job(self, job):
+        if job.id in self._jobs:
+            raise ConflictingIdError(job.id)
+
+        self._jobs[job.id] = job
+        self._push(job)
+        self._write(self.collection.insert_one, self._document(job))
+
+    def update_job(self, job):
+        if job.id not in self._jobs:
+            raise JobLookupError(job.id)
+
+        self._jobs[job.id] = job
+        self._push(job)
+        self._write(self.collection.replace_one, {'_id': job.id}, self._document(job))
+
+    def remove_job(self, job_id):
+        if self._jobs.pop(job_id, None) is None:
+            raise JobLookupError(job_id)
+
+        # the heap entry is dropped lazily
+        self._write(self.collection.delete_one, {'_id': job_id})
+
+    def remove_all_jobs(self):
+        self._jobs.clear()
+        self._heap.clear()
+        self._write(self.collection.delete_many, {})
+
+    def shutdown(self):
+        # wait for queued writes to land
+        self._writer.shutdown(wait=True)
+
+    def _push(self, job: Job) -> None:
+        if job.next_run_time is not None:
+            heapq.heappush(self._heap, (datetime_to_utc_timestamp(job.next_run_time), next(self._counter), job.id))
+
+        # updates leave stale entries behind, rebuild once they outnumber live jobs
+        if len(self._heap) > 2 * len(self._jobs) + 64:
+            self._heap = [entry for entry in self._heap if self._is_current(entry)]
+            heapq.heapify(self._heap)
+
+    def _is_current(self, entry: tuple) -> bool:
+        job = self._jobs.get(entry[2])
+        return job is not None and job.next_run_time is not None and \
+            datetime_to_utc_timestamp(job.next_run_time) == entry[0]
+
+    def _document(self, job: Job) -> dict:
+        return {
+            '_id': job.id,
+            'next_run_time': datetime_to_utc_timestamp(job.next_run_time),
+            'job_state': Binary(pickle.dumps(job.__getstate__(), self.pickle_protocol)),
+        }
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        job_state = pickle.loads(job_state)
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _write(self, method, *args) -> None:
+        future = self._writer.submit(method, *args)
+        future.add_done_callback(self._check_write)
+
+    def _check_write(self, future) -> None:
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Job store write failed: {error!r}")
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (collection={self.collection!r}, jobs={len(self._jobs)})>"
@@ -25,7 +25,7 @@ async def prepare_unban_log(author, user, reason):
     return embed
 
 
-async def prepare_kick_log(author, user, reason, date):
+async def prepare_kick_log(author, user, reason):
     embed = discord.Embed(title="Member Kicked")
     embed.color = discord.Color.green()
     embed.set_author(name=user, icon_url=user.avatar_url)
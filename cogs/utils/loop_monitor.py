@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+import discord
+from cogs.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = REGISTRY.histogram(
+    "cuthbert_loop_lag_seconds", "How late the event loop woke up a sleeping probe")
+SLOW_CALLBACKS = REGISTRY.counter(
+    "cuthbert_slow_callbacks_total", "Event loop steps that ran over the threshold", ("source",))
+
+# frames in these modules wrap handlers, they are never the ones to blame
+IGNORED_MODULES = (__name__, "cogs.utils.metrics")
+
+
+class LoopMonitor():
+    """Watches the event loop for stalls.
+
+    A probe coroutine measures how late the loop wakes it up (scheduling lag),
+    and every callback the loop runs is timed, coroutine steps included. While
+    a callback runs over the threshold, a watchdog thread samples the loop
+    thread's stack, so we know what it was blocked on and which cog started it.
+    Stalls are grouped by source and summarized to the private log channel.
+    """
+
+    def __init__(self, bot: discord.Client, threshold: float = 0.1, probe_interval: float = 0.5,
+                 report_interval: float = 300.0):
+        """Initialize monitor
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        threshold : float, optional
+            Seconds a single callback may run before it's flagged, by default 0.1
+        probe_interval : float, optional
+            Seconds between lag probes, by default 0.5
+        report_interval : float, optional
+            Seconds between summaries to the private log channel, by default 300.0
+        """
+
+        self.bot = bot
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.report_interval = report_interval
+
+        self.running = None
+        self.samples = {}
+        self.window = {}
+        self.original = None
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.tasks = []
+
+        self.slow_callbacks = 0
+        self.max_lag = 0.0
+
+    def start(self) -> None:
+        """Start timing callbacks, sampling stacks and probing lag. Call this from
+        the thread that runs the bot's loop.
+        """
+
+        if self.original is not None:
+            return
+
+        monitor = self
+        original = self.original = asyncio.events.Handle._run
+
+        def _run(handle):
+            start = time.perf_counter()
+            monitor.running = start
+            try:
+                original(handle)
+            finally:
+                monitor.running = None
+                duration = time.perf_counter() - start
+                if duration > monitor.threshold:
+                    monitor.record(handle, start, duration)
+                elif monitor.samples:
+                    monitor.samples.pop(start, None)
+
+        asyncio.events.Handle._run = _run
+
+        self.thread_id = threading.get_ident()
+        self.stopped.clear()
+        threading.Thread(target=self._watch, name="loop-monitor", daemon=True).start()
+        self.tasks = [self.bot.loop.create_task(self._probe()),
+                      self.bot.loop.create_task(self._report())]
+
+    def stop(self) -> None:
+        if self.original is None:
+            return
+
+        asyncio.events.Handle._run = self.original
+        self.original = None
+        self.stopped.set()
+        for task in self.tasks:
+            task.cancel()
+
+    def _watch(self) -> None:
+        # runs in its own thread, so it still gets to run while the loop is stuck
+        interval = self.threshold / 2
+        while not self.stopped.wait(interval):
+            start = self.running
+            if start is None or time.perf_counter() - start < interval:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                # keep overwriting, the last sample is the closest to where it blocked
+                self.samples[start] = (culprit(frame), "".join(traceback.format_stack(frame, limit=12)))
+
+    def record(self, handle: asyncio.Handle, start: float, duration: float) -> None:
+        source, stack = self.samples.pop(start, None) or (describe(handle), None)
+
+        self.slow_callbacks += 1
+        SLOW_CALLBACKS.inc((source,))
+        logger.warning("Event loop blocked for %.0fms by %s", duration * 1000, source)
+
+        entry = self.window.get(source)
+        if entry is None:
+            entry = self.window[source] = {'count': 0, 'total': 0.0, 'max': 0.0, 'stack': None}
+        entry['count'] += 1
+        entry['total'] += duration
+        if duration >= entry['max']:
+            entry['max'] = duration
+            entry['stack'] = stack or entry['stack']
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            expected = loop.time() + self.probe_interval
+            await asyncio.sleep(self.probe_interval)
+            lag = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    async def _report(self) -> None:
+        await self.bot.wait_until_ready()
+        while True:
+            await asyncio.sleep(self.report_interval)
+
+            # samples the watchdog took just as a callback finished are never popped
+            cutoff = time.perf_counter() - 60
+            for start in [start for start in self.samples if start < cutoff]:
+                self.samples.pop(start, None)
+
+            window, self.window = self.window, {}
+            max_lag, self.max_lag = self.max_lag, 0.0
+            if not window:
+                continue
+
+            channel = self.bot.get_channel(self.bot.channel_private)
+            await self.bot.log_dispatcher.send(channel, self.prepare_report(window, max_lag))
+
+    def prepare_report(self, window: dict, max_lag: float) -> discord.Embed:
+        embed = discord.Embed(title="Event loop stalls")
+        embed.color = discord.Color.orange()
+        embed.description = (f"{sum(entry['count'] for entry in window.values())} callbacks ran over "
+                             f"{self.threshold * 1000:.0f}ms in the last {self.report_interval / 60:.0f} minutes. "
+                             f"Worst scheduling lag: {max_lag * 1000:.0f}ms")
+
+        worst = sorted(window.items(), key=lambda item: item[1]['total'], reverse=True)
+        for source, entry in worst[:5]:
+            value = f"{entry['count']}x · max {entry['max'] * 1000:.0f}ms · total {entry['total'] * 1000:.0f}ms"
+            if entry['stack']:
+                stack = entry['stack'][-(1000 - len(value)):]
+                value += f"\n```{stack}```"
+            embed.add_field(name=source[:256], value=value[:1024], inline=False)
+        if len(worst) > 5:
+            embed.set_footer(text=f"and {len(worst) - 5} more sources")
+        return embed
+
+    def stats(self) -> dict:
+        """Snapshot of loop health
+
+        Returns
+        -------
+        dict
+            Slow callbacks seen, lag quantiles (seconds) and the sources in the current window
+        """
+
+        return {
+            'slow_callbacks': self.slow_callbacks,
+            'lag_p50': LOOP_LAG.quantile(0.5),
+            'lag_p99': LOOP_LAG.quantile(0.99),
+            'max_lag': self.max_lag,
+            'sources': {source: entry['count'] for source, entry in self.window.items()},
+        }
+
+
+def culprit(frame) -> str:
+    """Name of the outermost frame from our cogs in a stack, which is the command
+    or listener that started the work, falling back to the innermost frame.
+    """
+
+    found = None
+    innermost = frame
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("cogs.") and module not in IGNORED_MODULES:
+            found = frame
+        frame = frame.f_back
+
+    frame = found or innermost
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+def describe(handle: asyncio.Handle) -> str:
+    """Best guess at what a handle ran when we have no stack sample for it.
+    For a task step, follow the chain of awaited coroutines into our cogs.
+    """
+
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if not isinstance(task, asyncio.Task):
+        return getattr(callback, "__qualname__", repr(callback))
+
+    coro = task.get_coro()
+    name = getattr(coro, "__qualname__", repr(coro))
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None)
+        if frame is not None:
+            module = frame.f_globals.get("__name__", "")
+            if module.startswith("cogs.") and module not in IGNORED_MODULES:
+                return f"{module}.{frame.f_code.co_name}"
+        coro = getattr(coro, "cr_await", None)
+    return name
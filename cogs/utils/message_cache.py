@@ -0,0 +1,323 @@
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+import discord
+
+
+class MessageSnapshot():
+    """Compact copy of the parts of a message we need to log edits and deletes
+    """
+
+    __slots__ = ('id', 'guild_id', 'channel_id', 'author_id', 'author_name',
+                 'content', 'attachments', 'created_at', 'edited_at')
+
+    def __init__(self, id, guild_id, channel_id, author_id, author_name, content, attachments, created_at, edited_at=None):
+        self.id = id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.content = content
+        self.attachments = attachments
+        self.created_at = created_at
+        self.edited_at = edited_at
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> 'MessageSnapshot':
+        return cls(
+            message.id,
+            message.guild.id,
+            message.channel.id,
+            message.author.id,
+            str(message.author),
+            message.content,
+            tuple(attachment.url for attachment in message.attachments),
+            message.created_at.replace(tzinfo=timezone.utc).timestamp(),
+        )
+
+    @property
+    def jump_url(self) -> str:
+        return f"https://discord.com/channels/{self.guild_id}/{self.channel_id}/{self.id}"
+
+    def to_row(self) -> tuple:
+        return (self.id, self.guild_id, self.channel_id, self.author_id, self.author_name,
+                self.content, "\n".join(self.attachments), self.created_at, self.edited_at)
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'MessageSnapshot':
+        id, guild_id, channel_id, author_id, author_name, content, attachments, created_at, edited_at = row
+        attachments = tuple(attachments.split("\n")) if attachments else ()
+        return cls(id, guild_id, channel_id, author_id, author_name, content, attachments, created_at, edited_at)
+
+
+class MessageCache():
+    """Two-tier message cache. Recent messages are kept in memory as
+    `MessageSnapshot`s, in LRU order (lookups and edits count as use). When the hot tier is full, the oldest
+    snapshots are demoted to a SQLite database on disk, where they are kept
+    for `retention` seconds.
+
+    Snapshots in memory are also indexed by author, for `!purgeuser`.
+
+    Writes to disk are batched: demoted snapshots and deleted message IDs
+    wait in memory and go out together once `flush_size` of either piled up.
+    """
+
+    def __init__(self, path: str, hot_size: int = 50000, retention: int = 7 * 86400, flush_size: int = 250):
+        """Initialize cache
+
+        Parameters
+        ----------
+        path : str
+            Path of the SQLite database for the cold tier
+        hot_size : int, optional
+            Most snapshots kept in memory, by default 50000
+        retention : int, optional
+            How long (seconds) snapshots are kept on disk, by default 7 days
+        flush_size : int, optional
+            Number of evicted snapshots (or deleted IDs) written to disk at once, by default 250
+        """
+
+        self.hot_size = hot_size
+        self.retention = retention
+        self.flush_size = flush_size
+
+        self.hot = OrderedDict()
+        # author ID -> {message ID: None} of their snapshots in the hot tier
+        self.by_author = {}
+        # evicted from the hot tier but not written to disk yet
+        self.pending = {}
+        # deleted messages that may still have a row on disk
+        self.deleted = set()
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER,
+            channel_id INTEGER,
+            author_id INTEGER,
+            author_name TEXT,
+            content TEXT,
+            attachments TEXT,
+            created_at REAL,
+            edited_at REAL
+        )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at)")
+        self.db.commit()
+        # counted once here, then kept up to date by `flush` so stats never scan the table
+        self.cold_size = self.db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pruned = 0
+        self.last_prune = time.time()
+
+    def add(self, snapshot: MessageSnapshot) -> None:
+        """Add or replace a snapshot in the hot tier, demoting the least recently used one if full
+
+        Parameters
+        ----------
+        snapshot : MessageSnapshot
+            Snapshot to cache
+        """
+
+        self.hot[snapshot.id] = snapshot
+        self.hot.move_to_end(snapshot.id)
+        self.by_author.setdefault(snapshot.author_id, {})[snapshot.id] = None
+
+        if len(self.hot) > self.hot_size:
+            _, evicted = self.hot.popitem(last=False)
+            self._unindex(evicted)
+            self.pending[evicted.id] = evicted
+            self.evictions += 1
+            if len(self.pending) >= self.flush_size:
+                self.flush()
+
+    def get(self, id: int) -> MessageSnapshot:
+        """Look up a snapshot, first in memory then on disk. The disk lookup is
+        a primary key query on the event loop, cheap but not free, so it only
+        happens for messages that aren't in memory anymore.
+
+        Parameters
+        ----------
+        id : int
+            ID of the message
+
+        Returns
+        -------
+        MessageSnapshot
+            The snapshot, or None if we never saw this message (or it expired)
+        """
+
+        snapshot = self.hot.get(id)
+        if snapshot is not None:
+            self.hot.move_to_end(id)
+            self.hot_hits += 1
+            return snapshot
+        snapshot = self.pending.get(id)
+        if snapshot is not None:
+            self.hot_hits += 1
+            return snapshot
+
+        if id in self.deleted:
+            self.misses += 1
+            return None
+        row = self.db.execute("SELECT * FROM messages WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.cold_hits += 1
+        return MessageSnapshot.from_row(row)
+
+    def update(self, id: int, content: str) -> MessageSnapshot:
+        """Record an edit. The edited message is promoted back to the hot tier.
+
+        Parameters
+        ----------
+        id : int
+            ID of the message
+        content : str
+            New content
+
+        Returns
+        -------
+        MessageSnapshot
+            The snapshot as it was before the edit, or None if not cached
+        """
+
+        old = self.get(id)
+        if old is None:
+            return None
+
+        new = MessageSnapshot.from_row(old.to_row())
+        new.content = content
+        new.edited_at = time.time()
+        self.add(new)
+        return old
+
+    def pop(self, id: int) -> MessageSnapshot:
+        """Remove a deleted message from both tiers. Its row on disk, if any,
+        is deleted with the next flush.
+
+        Parameters
+        ----------
+        id : int
+            ID of the message
+
+        Returns
+        -------
+        MessageSnapshot
+            The snapshot, or None if not cached
+        """
+
+        snapshot = self.get(id)
+        if snapshot is None:
+            return None
+
+        self.discard((id,))
+        return snapshot
+
+    def discard(self, ids) -> None:
+        """Remove deleted messages from both tiers without looking them up,
+        i.e after a bulk delete
+
+        Parameters
+        ----------
+        ids : iterable
+            IDs of the messages
+        """
+
+        for id in ids:
+            snapshot = self.hot.pop(id, None)
+            if snapshot is not None:
+                self._unindex(snapshot)
+            self.pending.pop(id, None)
+            self.deleted.add(id)
+        if len(self.deleted) >= self.flush_size:
+            self.flush()
+
+    def by_author_id(self, author_id: int) -> list:
+        """Snapshots of an author's messages in the hot tier
+
+        Parameters
+        ----------
+        author_id : int
+            ID of the author
+
+        Returns
+        -------
+        list
+            MessageSnapshots, oldest first
+        """
+
+        return [self.hot[id] for id in self.by_author.get(author_id, ())]
+
+    def _unindex(self, snapshot: MessageSnapshot) -> None:
+        ids = self.by_author.get(snapshot.author_id)
+        if ids is not None:
+            ids.pop(snapshot.id, None)
+            if not ids:
+                del self.by_author[snapshot.author_id]
+
+    def flush(self) -> None:
+        """Write pending evicted snapshots to disk, delete the rows of deleted
+        messages, and drop expired ones now and then"""
+
+        if self.deleted:
+            cursor = self.db.executemany("DELETE FROM messages WHERE id = ?", [(id,) for id in self.deleted])
+            self.cold_size -= cursor.rowcount
+            self.deleted.clear()
+        if self.pending:
+            # edited messages come back to the hot tier and may already have a row to replace
+            ids = list(self.pending)
+            existing = 0
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                existing += self.db.execute(f"SELECT COUNT(*) FROM messages WHERE id IN ({','.join('?' * len(chunk))})",
+                                            chunk).fetchone()[0]
+            self.db.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [snapshot.to_row() for snapshot in self.pending.values()])
+            self.cold_size += len(ids) - existing
+            self.pending.clear()
+
+        now = time.time()
+        if now - self.last_prune > 3600:
+            cursor = self.db.execute("DELETE FROM messages WHERE created_at < ?", (now - self.retention,))
+            self.pruned += cursor.rowcount
+            self.cold_size -= cursor.rowcount
+            self.last_prune = now
+
+        self.db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+    def stats(self) -> dict:
+        """Snapshot of cache metrics
+
+        Returns
+        -------
+        dict
+            Tier sizes, hit/miss counters and eviction stats
+        """
+
+        lookups = self.hot_hits + self.cold_hits + self.misses
+        return {
+            'hot_size': len(self.hot),
+            'pending': len(self.pending),
+            'pending_deletes': len(self.deleted),
+            'cold_size': self.cold_size,
+            'hot_hits': self.hot_hits,
+            'cold_hits': self.cold_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hot_hits + self.cold_hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'pruned': self.pruned,
+        }
@@ -0,0 +1,273 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+# latency buckets in seconds, from 100µs to 10s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric():
+    type = None
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.values = {}
+
+    def format_labels(self, labels: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{self.format_labels(labels)} {value}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Value that only goes up, i.e number of requests"""
+
+    type = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, labels: tuple = ()) -> float:
+        return self.values.get(labels, 0)
+
+
+class Gauge(Metric):
+    """Value that can go up and down. Instead of being set, it can also be read
+    from a function at scrape time, returning either a number or a dict of
+    label tuples to numbers.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value: float, labels: tuple = ()) -> None:
+        self.values[labels] = value
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return
+            self.values = value if isinstance(value, dict) else {(): value}
+        yield from super().samples()
+
+
+class Histogram(Metric):
+    """Distribution of values (usually latencies) in fixed buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        state = self.values.get(labels)
+        if state is None:
+            # one count per bucket plus +Inf, then sum and count
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, labels: tuple = ()) -> int:
+        state = self.values.get(labels)
+        return state[2] if state else 0
+
+    def quantile(self, q: float, labels: tuple = ()) -> float:
+        """Estimate a quantile by interpolating inside the bucket it falls in"""
+
+        state = self.values.get(labels)
+        if not state or not state[2]:
+            return 0.0
+
+        rank = q * state[2]
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(state[0]):
+            if seen + count >= rank and count:
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = self.buckets[i] if i < len(self.buckets) else lower
+        return self.buckets[-1]
+
+    def samples(self):
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{self.format_labels(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{self.format_labels(labels)} {total}"
+            yield f"{self.name}_count{self.format_labels(labels)} {count}"
+
+
+class Registry():
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # modules can be reloaded, keep the metric that already collected data
+        existing = self.metrics.get(metric.name)
+        if existing is not None and type(existing) is type(metric):
+            if isinstance(metric, Gauge):
+                existing.function = metric.function
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple = (), function=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, function))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "cuthbert_handler_seconds", "Time spent in commands and listeners", ("kind", "name"))
+HANDLER_ERRORS = REGISTRY.counter(
+    "cuthbert_handler_errors_total", "Commands and listeners that raised", ("kind", "name"))
+REST_LATENCY = REGISTRY.histogram(
+    "cuthbert_rest_seconds", "Discord REST request latency, including rate limit waits", ("method", "route"))
+REST_ERRORS = REGISTRY.counter(
+    "cuthbert_rest_errors_total", "Discord REST requests that failed", ("method", "route", "status"))
+RATE_LIMITS = REGISTRY.counter(
+    "cuthbert_rate_limits_total", "429 responses from Discord, scope=route counts all of them", ("scope",))
+
+
+def instrument(kind: str, name: str = None):
+    """Decorator timing a coroutine function, i.e a command or a listener.
+    Put it below `commands.command` or `commands.Cog.listener`.
+
+    Parameters
+    ----------
+    kind : str
+        "command" or "listener"
+    name : str, optional
+        Name to report, by default the function name
+    """
+
+    def decorator(func):
+        labels = (kind, name or func.__name__)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(labels)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - start, labels)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_http(http) -> None:
+    """Time every REST request made through discord.py's HTTP client, and count
+    the 429s it handles internally (it only tells us about those in its logs).
+
+    Parameters
+    ----------
+    http : discord.http.HTTPClient
+        The bot's HTTP client
+    """
+
+    request = http.request
+
+    @functools.wraps(request)
+    async def timed_request(route, **kwargs):
+        labels = (route.method, route.path)
+        start = time.perf_counter()
+        try:
+            return await request(route, **kwargs)
+        except Exception as e:
+            REST_ERRORS.inc(labels + (str(getattr(e, "status", "error")),))
+            raise
+        finally:
+            REST_LATENCY.observe(time.perf_counter() - start, labels)
+
+    http.request = timed_request
+    logging.getLogger("discord.http").addHandler(RateLimitCounter())
+
+
+class RateLimitCounter(logging.Handler):
+    """Counts 429s from discord.py's warnings. Every 429 is logged as "We are
+    being rate limited", and global ones get a second "Global rate limit has
+    been hit" warning right after, so those are counted under both scopes.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+
+    def emit(self, record):
+        message = str(record.msg)
+        if message.startswith("We are being rate limited"):
+            RATE_LIMITS.inc(("route",))
+        elif message.startswith("Global rate limit has been hit"):
+            RATE_LIMITS.inc(("global",))
+
+
+class MetricsServer():
+    """Serves the registry over HTTP for Prometheus to scrape. Every path returns the metrics."""
+
+    def __init__(self, registry: Registry = REGISTRY, host: str = "127.0.0.1", port: int = 9090):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # we don't care about the request, just read past its headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = self.registry.render().encode("UTF-8")
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                         b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        finally:
+            writer.close()
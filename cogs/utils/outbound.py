@@ -0,0 +1,239 @@
+import asyncio
+import contextlib
+import contextvars
+import enum
+import logging
+from collections import OrderedDict, deque
+
+from cogs.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    MOD_RESPONSE = 0
+    MOD_ACTION = 1
+    AUDIT = 2
+
+
+# priority of requests made by the current task; tasks inherit it from whoever created them
+PRIORITY = contextvars.ContextVar("outbound_priority", default=Priority.MOD_ACTION)
+
+OUTBOUND_WAIT = REGISTRY.histogram(
+    "cuthbert_outbound_wait_seconds", "Time REST requests waited in the outbound scheduler", ("priority",))
+OUTBOUND_SHED = REGISTRY.counter(
+    "cuthbert_outbound_shed_total", "REST requests dropped because their queue overflowed", ("priority",))
+
+# requests per seconds for each bucket, on top of the global limit. discord.py 1.x
+# doesn't tell us the rate limit headers it sees, so these are Discord's documented
+# or commonly observed limits; discord.py still handles any 429 we run into
+ROUTE_LIMITS = {
+    ("POST", "/channels/{channel_id}/messages"): (5, 5.0),
+    ("PATCH", "/channels/{channel_id}/messages/{message_id}"): (5, 5.0),
+    ("DELETE", "/channels/{channel_id}/messages/{message_id}"): (5, 1.0),
+    ("POST", "/channels/{channel_id}/messages/bulk_delete"): (1, 1.0),
+    ("PUT", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me"): (1, 0.25),
+    ("DELETE", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/{member_id}"): (1, 0.25),
+    ("DELETE", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me"): (1, 0.25),
+}
+DEFAULT_LIMIT = (5, 1.0)
+
+
+@contextlib.contextmanager
+def priority(level: Priority):
+    """Send requests made inside the block (and tasks created in it) with `level`"""
+
+    token = PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        PRIORITY.reset(token)
+
+
+async def respond_first(ctx) -> None:
+    """Before invoke hook, whatever a command sends back is a moderator response
+    unless it says otherwise"""
+
+    PRIORITY.set(Priority.MOD_RESPONSE)
+
+
+class RequestShed(Exception):
+    """A low priority request was dropped because too many were queued"""
+
+
+class TokenBucket():
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, limit: int, per: float, now: float):
+        self.capacity = limit
+        self.rate = limit / per
+        self.tokens = float(limit)
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float, tokens: float = 1) -> float:
+        return now + max(0.0, tokens - self.tokens) / self.rate
+
+
+class OutboundScheduler():
+    """Puts every REST request the bot makes through per-priority queues.
+
+    Requests take a token from their route's bucket and from the global
+    bucket before they're sent, so we slow down before Discord makes us.
+    When tokens are short, moderator responses go first, then moderation
+    actions, then audit logs. Audit logs also leave part of the global
+    budget untouched, and the oldest are dropped when too many pile up.
+
+    The priority comes from `PRIORITY`, set with `priority(...)`.
+    """
+
+    def __init__(self, http, global_limit: int = 50, global_per: float = 1.0,
+                 max_audit: int = 500, audit_reserve: int = 10):
+        """Initialize scheduler and install it on `http`
+
+        Parameters
+        ----------
+        http : discord.http.HTTPClient
+            The bot's HTTP client
+        global_limit : int, optional
+            Requests per `global_per` seconds across all routes, by default 50
+        global_per : float, optional
+            Global limit period in seconds, by default 1.0
+        max_audit : int, optional
+            Queued audit requests before the oldest are dropped, by default 500
+        audit_reserve : int, optional
+            Global tokens audit requests leave for higher priorities, by default 10
+        """
+
+        self.loop = asyncio.get_event_loop()
+        self.request = http.request
+        http.request = self.send
+
+        self.global_bucket = TokenBucket(global_limit, global_per, self.loop.time())
+        self.buckets = {}
+        self.max_audit = max_audit
+        self.audit_reserve = audit_reserve
+
+        # per priority, bucket key -> waiting (future, enqueued at)
+        self.queues = [OrderedDict() for _ in Priority]
+        self.queued = [0] * len(Priority)
+        self.timer = None
+
+        self.sent = [0] * len(Priority)
+        self.shed = [0] * len(Priority)
+
+        REGISTRY.gauge("cuthbert_outbound_queued", "REST requests waiting in the outbound scheduler", ("priority",),
+                       function=lambda: {(level.name,): self.queued[level] for level in Priority})
+
+    async def send(self, route, **kwargs):
+        level = PRIORITY.get()
+        key = (route.method, route.bucket)
+        now = self.loop.time()
+
+        if not any(self.queued) and self._take(level, key, now):
+            waited = 0.0
+        else:
+            future = self.loop.create_future()
+            self.queues[level].setdefault(key, deque()).append((future, now))
+            self.queued[level] += 1
+            if level == Priority.AUDIT and self.queued[level] > self.max_audit:
+                self._shed(level)
+            self._pump()
+            waited = await future
+
+        self.sent[level] += 1
+        OUTBOUND_WAIT.observe(waited, (level.name,))
+        return await self.request(route, **kwargs)
+
+    def _bucket(self, key: tuple, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) > 5000:
+                # forget buckets that are full again, they'd be recreated the same
+                for old_key, old in list(self.buckets.items()):
+                    old.refill(now)
+                    if old.tokens >= old.capacity:
+                        del self.buckets[old_key]
+            limit, per = ROUTE_LIMITS.get((key[0], key[1].split(":", 2)[2]), DEFAULT_LIMIT)
+            bucket = self.buckets[key] = TokenBucket(limit, per, now)
+        bucket.refill(now)
+        return bucket
+
+    def _take(self, level: Priority, key: tuple, now: float) -> bool:
+        """Take a token from the route's bucket and the global one, if both have one"""
+
+        self.global_bucket.refill(now)
+        reserve = self.audit_reserve if level == Priority.AUDIT else 0
+        bucket = self._bucket(key, now)
+        if self.global_bucket.tokens < 1 + reserve or bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        self.global_bucket.tokens -= 1
+        return True
+
+    def _pump(self) -> None:
+        """Let through as many queued requests as the buckets allow, highest
+        priority first, and come back when the next token frees up"""
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        now = self.loop.time()
+        next_at = None
+        for level in Priority:
+            queues = self.queues[level]
+            for key in list(queues):
+                waiters = queues[key]
+                while waiters:
+                    future, enqueued = waiters[0]
+                    if future.done():
+                        # the caller was cancelled while waiting
+                        waiters.popleft()
+                        self.queued[level] -= 1
+                        continue
+                    if not self._take(level, key, now):
+                        reserve = self.audit_reserve if level == Priority.AUDIT else 0
+                        ready_at = max(self.global_bucket.ready_at(now, 1 + reserve), self.buckets[key].ready_at(now))
+                        next_at = ready_at if next_at is None else min(next_at, ready_at)
+                        break
+                    waiters.popleft()
+                    self.queued[level] -= 1
+                    future.set_result(now - enqueued)
+                if not waiters:
+                    del queues[key]
+
+        if next_at is not None:
+            self.timer = self.loop.call_at(next_at, self._pump)
+
+    def _shed(self, level: Priority) -> None:
+        queues = self.queues[level]
+        key = next(iter(queues))
+        future, _ = queues[key].popleft()
+        if not queues[key]:
+            del queues[key]
+        self.queued[level] -= 1
+        if not future.done():
+            self.shed[level] += 1
+            OUTBOUND_SHED.inc((level.name,))
+            future.set_exception(RequestShed(f"Dropped {level.name} request to {key[1]}, too many queued"))
+
+    def stats(self) -> dict:
+        """Snapshot of scheduler metrics
+
+        Returns
+        -------
+        dict
+            Per priority queued, sent and shed requests, and p50/p99 queue wait (seconds)
+        """
+
+        return {level.name: {
+            'queued': self.queued[level],
+            'sent': self.sent[level],
+            'shed': self.shed[level],
+            'wait_p50': OUTBOUND_WAIT.quantile(0.5, (level.name,)),
+            'wait_p99': OUTBOUND_WAIT.quantile(0.99, (level.name,)),
+        } for level in Priority}
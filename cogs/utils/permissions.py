@@ -0,0 +1,173 @@
+import enum
+import logging
+import time
+
+import discord
+from cogs.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# @everyone is below every other role, whatever its position
+EVERYONE_RANK = (-1, 0)
+
+PERMISSION_REBUILD = REGISTRY.histogram(
+    "cuthbert_permission_rebuild_seconds", "Time to rebuild the member permission index",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+class Level(enum.IntEnum):
+    EVERYONE = 0
+    MOD = 1
+
+
+class PermissionResolver():
+    """Index of member ID -> (permission level, rank of their top role) for our guild.
+
+    Levels come from `tiers`, a role ID -> `Level` mapping; a member gets
+    the highest level of any role they have. Ranks are `(position, -id)`:
+    like `discord.Role.__lt__`, roles at the same position rank the newer
+    (larger ID) one lower, and @everyone is below everything. Comparing two
+    members' top roles is then a tuple comparison.
+
+    Role changes on a member update their entry as they happen. Role
+    hierarchy changes (created, moved or deleted roles) can shift any
+    member's top role, so they mark the index dirty and it's rebuilt on the
+    next check, once for the whole burst of role updates Discord sends for a
+    reorder.
+    """
+
+    def __init__(self, bot: discord.Client, tiers: dict):
+        """Initialize resolver and start listening for member and role changes
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        tiers : dict
+            Role ID -> `Level` the role grants
+        """
+
+        self.bot = bot
+        # plain ints, comparing IntEnums is slower
+        self.tiers = {role_id: int(level) for role_id, level in tiers.items()}
+
+        self.ranks = {}
+        self.members = {}
+        self.default = (0, EVERYONE_RANK)
+        self.dirty = True
+
+        self.rebuilds = 0
+        self.updates = 0
+        self.last_rebuild = 0.0
+
+        for listener in (self.on_ready, self.on_member_join, self.on_member_remove, self.on_member_update,
+                         self.on_guild_role_create, self.on_guild_role_update, self.on_guild_role_delete):
+            bot.add_listener(listener)
+
+    def _entry(self, role_ids) -> tuple:
+        level = 0
+        top = self.default[1]
+        tiers = self.tiers
+        ranks = self.ranks
+        for role_id in role_ids:
+            if role_id in tiers and tiers[role_id] > level:
+                level = tiers[role_id]
+            rank = ranks.get(role_id)
+            if rank is not None and rank > top:
+                top = rank
+        return (level, top)
+
+    def rebuild(self) -> float:
+        """Rebuild the whole index from the guild
+
+        Returns
+        -------
+        float
+            Seconds it took
+        """
+
+        start = time.perf_counter()
+        guild = self.bot.get_guild(self.bot.guild_id)
+        self.ranks = {}
+        self.members = {}
+        if guild is not None:
+            self.ranks = {role.id: (role.position, -role.id) for role in guild.roles}
+            self.ranks[guild.id] = EVERYONE_RANK
+            # `_roles` holds the member's role IDs; `Member.roles` would look up and sort Role objects
+            for member in guild.members:
+                if member._roles:
+                    self.members[member.id] = self._entry(member._roles)
+        # not connected yet, try again on the next check
+        self.dirty = guild is None
+
+        elapsed = time.perf_counter() - start
+        self.rebuilds += 1
+        self.last_rebuild = elapsed
+        PERMISSION_REBUILD.observe(elapsed)
+        logger.info(f"Rebuilt permission index for {len(self.members)} members in {elapsed * 1000:.1f}ms")
+        return elapsed
+
+    def _lookup(self, member: discord.abc.Snowflake) -> tuple:
+        if self.dirty:
+            self.rebuild()
+        return self.members.get(member.id, self.default)
+
+    def level(self, member: discord.abc.Snowflake) -> Level:
+        """Permission level of a member (or anything with an ID), EVERYONE if we don't know them"""
+
+        return Level(self._lookup(member)[0])
+
+    def has(self, member: discord.abc.Snowflake, level: Level) -> bool:
+        return self._lookup(member)[0] >= level
+
+    def outranks(self, member: discord.abc.Snowflake, other: discord.abc.Snowflake) -> bool:
+        """Whether `member`'s top role is strictly higher than `other`'s"""
+
+        return self._lookup(member)[1] > self._lookup(other)[1]
+
+    def _update(self, member: discord.Member) -> None:
+        if member.guild.id != self.bot.guild_id or self.dirty:
+            return
+        self.updates += 1
+        if member._roles:
+            self.members[member.id] = self._entry(member._roles)
+        else:
+            self.members.pop(member.id, None)
+
+    def _invalidate(self, guild: discord.Guild) -> None:
+        if guild.id == self.bot.guild_id:
+            self.dirty = True
+
+    async def on_ready(self) -> None:
+        self.rebuild()
+
+    async def on_member_join(self, member: discord.Member) -> None:
+        self._update(member)
+
+    async def on_member_remove(self, member: discord.Member) -> None:
+        if member.guild.id == self.bot.guild_id:
+            self.members.pop(member.id, None)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        # also fires for every presence change, which we don't care about
+        if before._roles != after._roles:
+            self._update(after)
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        self._invalidate(role.guild)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        if before.position != after.position:
+            self._invalidate(after.guild)
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        self._invalidate(role.guild)
+
+    def stats(self) -> dict:
+        return {
+            'members': len(self.members),
+            'rebuilds': self.rebuilds,
+            'updates': self.updates,
+            'last_rebuild': self.last_rebuild,
+            'rebuild_p99': PERMISSION_REBUILD.quantile(0.99),
+        }
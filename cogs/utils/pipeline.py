@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+
+from cogs.utils.outbound import priority as outbound_priority
+
+logger = logging.getLogger(__name__)
+
+
+class StepTimeout(Exception):
+    """A pipeline step took longer than its timeout"""
+
+
+class ActionPipeline():
+    """Runs the side effects of a moderation action (DM, the action itself,
+    replies, logs) as a small dependency graph. Steps without a dependency
+    between them run concurrently, each one bounded by its own timeout
+    (the action itself usually has none, it may wait behind a rate limit).
+
+    A step that fails or times out is recorded and doesn't stop the others,
+    except for required steps: anything depending on a failed required step
+    is skipped, and the required step's error is raised from `run`.
+    """
+
+    def __init__(self, name: str):
+        """Initialize pipeline
+
+        Parameters
+        ----------
+        name : str
+            Name of the action, used when logging timings
+        """
+
+        self.name = name
+        self.steps = {}
+        self.timings = {}
+        self.errors = {}
+        self.skipped = set()
+        self.elapsed = 0.0
+
+    def add(self, name: str, func, after: tuple = (), timeout: float = 10.0, required: bool = False,
+            priority=None) -> 'ActionPipeline':
+        """Add a step
+
+        Parameters
+        ----------
+        name : str
+            Name of the step
+        func : callable
+            Called with no arguments, must return an awaitable
+        after : tuple, optional
+            Names of steps that must finish first, by default ()
+        timeout : float, optional
+            Seconds before the step is abandoned, None to wait as long as it takes, by default 10.0
+        required : bool, optional
+            Whether the action fails if this step fails, by default False
+        priority : cogs.utils.outbound.Priority, optional
+            Outbound priority of the step's requests, by default the caller's
+
+        Returns
+        -------
+        ActionPipeline
+            The pipeline, for chaining
+        """
+
+        for dependency in after:
+            if dependency not in self.steps:
+                raise ValueError(f"Step {name} depends on unknown step {dependency}")
+        self.steps[name] = (func, tuple(after), timeout, required, priority)
+        return self
+
+    def ok(self, name: str) -> bool:
+        """Whether the step `name` has run and succeeded"""
+
+        return name in self.timings and name not in self.errors
+
+    async def run(self) -> 'ActionPipeline':
+        """Run every step, respecting dependencies
+
+        Returns
+        -------
+        ActionPipeline
+            The pipeline, with timings and errors filled in
+
+        Raises
+        ------
+        Exception
+            The error of the first required step that failed
+        """
+
+        start = time.perf_counter()
+        tasks = {}
+        for name, step in self.steps.items():
+            tasks[name] = asyncio.ensure_future(self._run_step(name, step, tasks))
+        await asyncio.gather(*tasks.values())
+        self.elapsed = time.perf_counter() - start
+
+        logger.debug(f"{self.name} finished in {self.elapsed * 1000:.1f}ms: " + ", ".join(
+            f"{name}={timing * 1000:.1f}ms" for name, timing in self.timings.items()))
+
+        for name, (_, _, _, required, _) in self.steps.items():
+            if required and name in self.errors:
+                raise self.errors[name]
+        return self
+
+    async def _run_step(self, name: str, step: tuple, tasks: dict) -> None:
+        func, after, timeout, _, priority = step
+
+        for dependency in after:
+            await tasks[dependency]
+            if dependency in self.skipped or (self.steps[dependency][3] and dependency in self.errors):
+                self.skipped.add(name)
+                return
+
+        start = time.perf_counter()
+        try:
+            if priority is None:
+                await asyncio.wait_for(func(), timeout)
+            else:
+                with outbound_priority(priority):
+                    await asyncio.wait_for(func(), timeout)
+        except asyncio.TimeoutError:
+            self.errors[name] = StepTimeout(f"Couldn't {name} within {timeout:g} seconds, Discord may be slow right now.")
+        except Exception as e:
+            self.errors[name] = e
+        finally:
+            self.timings[name] = time.perf_counter() - start
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import discord
+
+# Discord refuses to bulk delete messages older than 14 days, keep a little margin
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+BULK_DELETE_SIZE = 100
+
+
+class PurgeEngine():
+    """Deletes messages from a channel while walking its history.
+
+    Matching messages are bulk deleted in chunks of 100 as soon as a chunk
+    fills up, so we never hold more than one chunk in memory. Messages too
+    old to be bulk deleted go to a separate lane that deletes them one at a
+    time in the background. That lane's queue holds at most one chunk too,
+    once it's full the scan waits for it.
+    """
+
+    def __init__(self, channel: discord.TextChannel, progress=None, progress_interval: float = 3.0):
+        """Initialize engine
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            Channel to delete messages from
+        progress : callable, optional
+            Coroutine function called with the engine every `progress_interval` seconds while scanning
+        progress_interval : float, optional
+            Seconds between progress reports, by default 3.0
+        """
+
+        self.channel = channel
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+        self.chunk = []
+        self.old_queue = asyncio.Queue(maxsize=BULK_DELETE_SIZE)
+        self.old_worker = None
+        self.cutoff = datetime.utcnow() - BULK_DELETE_MAX_AGE
+
+        self.scanned = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    @property
+    def rate(self) -> float:
+        """Messages deleted per second so far"""
+
+        return self.deleted / max(time.perf_counter() - self.start, 1e-9)
+
+    async def scan(self, history, limit: int, check=None) -> None:
+        """Delete up to `limit` messages matching `check` from a history iterator, in a single pass
+
+        Parameters
+        ----------
+        history : discord.iterators.HistoryIterator
+            Messages to go through, newest first
+        limit : int
+            Most messages to delete
+        check : callable, optional
+            Predicate deciding which messages to delete, by default all of them
+        """
+
+        async for message in history:
+            self.scanned += 1
+            if check is None or check(message):
+                await self.add(message)
+                if self.matched >= limit:
+                    break
+
+            if self.progress and time.perf_counter() - self.last_report >= self.progress_interval:
+                self.last_report = time.perf_counter()
+                await self.progress(self)
+
+    async def add(self, message: discord.Message) -> None:
+        """Queue a message for deletion, flushing a bulk delete when the chunk is full
+
+        Parameters
+        ----------
+        message : discord.Message
+            Message to delete
+        """
+
+        self.matched += 1
+        if message.created_at < self.cutoff:
+            if self.old_worker is None:
+                self.old_worker = asyncio.ensure_future(self._delete_old())
+            await self.old_queue.put(message)
+            return
+
+        self.chunk.append(message)
+        if len(self.chunk) >= BULK_DELETE_SIZE:
+            await self._flush()
+
+    async def finish(self) -> None:
+        """Delete whatever is left, and wait for the single delete lane to finish"""
+
+        await self._flush()
+        if self.old_worker is not None:
+            await self.old_queue.put(None)
+            await self.old_worker
+
+    async def _flush(self) -> None:
+        chunk, self.chunk = self.chunk, []
+        if not chunk:
+            return
+
+        try:
+            await self.channel.delete_messages(chunk)
+            self.deleted += len(chunk)
+        except discord.HTTPException:
+            self.failed += len(chunk)
+
+    async def _delete_old(self) -> None:
+        while True:
+            message = await self.old_queue.get()
+            if message is None:
+                return
+            try:
+                await message.delete()
+                self.deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException:
+                self.failed += 1
@@ -0,0 +1,206 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# gateway dispatches the logging and moderation cogs react to
+EVENTS = ("MESSAGE_CREATE", "MESSAGE_UPDATE", "MESSAGE_DELETE", "MESSAGE_DELETE_BULK",
+          "GUILD_MEMBER_ADD", "GUILD_MEMBER_REMOVE", "GUILD_MEMBER_UPDATE")
+
+
+class GatewayRecorder():
+    """Records gateway dispatches for our guild to a gzipped JSON lines file, so
+    real traffic can be replayed offline with `python -m benchmarks.replay`.
+
+    A recording starts with a header (the bot's config and user) and a
+    snapshot of the guild in the shape of a GUILD_CREATE, followed by one
+    `[seconds since start, event, data]` line per dispatch. Every start
+    appends a new gzip member, which readers see as one continuous file.
+
+    Dispatches are hooked at discord.py's parsers, before they turn into
+    models, so recording costs one `json.dumps` per event on the loop.
+    Compression and writes happen on a background thread.
+    """
+
+    def __init__(self, bot: discord.Client, path: str, flush_size: int = 1000, flush_interval: float = 5.0):
+        """Initialize recorder
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        path : str
+            File to append the recording to
+        flush_size : int, optional
+            Buffered events that trigger a write, by default 1000
+        flush_interval : float, optional
+            Seconds between periodic writes, by default 5.0
+        """
+
+        self.bot = bot
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self.buffer = []
+        self.parsers = {}
+        self.started = None
+        self.timer = None
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="recorder")
+        self.file = None
+
+        self.recorded = 0
+
+    @property
+    def recording(self) -> bool:
+        return self.started is not None
+
+    def start(self) -> None:
+        """Snapshot the guild and start recording. Does nothing if we're already recording."""
+
+        if self.recording:
+            return
+
+        guild = self.bot.get_guild(self.bot.guild_id)
+        if guild is None:
+            logger.warning("Not recording gateway events, guild %s not found", self.bot.guild_id)
+            return
+
+        self.file = gzip.open(self.path, "at", encoding="UTF-8")
+        self.started = time.monotonic()
+        header = {
+            "user": user_data(self.bot.user),
+            "guild_id": self.bot.guild_id,
+            "channel_public": self.bot.channel_public,
+            "channel_private": self.bot.channel_private,
+            "role_mod": self.bot.role_mod,
+            "role_mute": self.bot.role_mute,
+        }
+        self.buffer.append(json.dumps([0, "HEADER", header]))
+        self.buffer.append(json.dumps([0, "GUILD_CREATE", snapshot(guild)]))
+
+        # the websocket looks parsers up in this dict on every dispatch, so
+        # swapping entries in place hooks them even on a live connection
+        parsers = self.bot._connection.parsers
+        for event in EVENTS:
+            self.parsers[event] = parsers[event]
+            parsers[event] = self._hook(event, parsers[event])
+
+        self.timer = self.bot.loop.create_task(self._flush_periodically())
+        logger.info("Recording gateway events to %s", self.path)
+
+    def _hook(self, event: str, parser):
+        guild_id = str(self.bot.guild_id)
+        buffer = self.buffer
+        dumps = json.dumps
+        monotonic = time.monotonic
+
+        def record(data):
+            if data.get("guild_id") == guild_id:
+                # serialize before parsing, parsers change the data they're given
+                buffer.append(dumps([round(monotonic() - self.started, 3), event, data]))
+                if len(buffer) >= self.flush_size:
+                    self.flush()
+            parser(data)
+
+        return record
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        lines = self.buffer[:]
+        del self.buffer[:]
+        self.recorded += len(lines)
+        self.writer.submit(self._write, self.file, lines)
+
+    def _write(self, file, lines: list) -> None:
+        try:
+            file.write("\n".join(lines) + "\n")
+        except Exception:
+            logger.exception(f"Failed to write {len(lines)} gateway events")
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def stop(self) -> None:
+        """Stop recording, and write and close the file"""
+
+        if not self.recording:
+            return
+
+        parsers = self.bot._connection.parsers
+        for event, parser in self.parsers.items():
+            parsers[event] = parser
+        self.parsers = {}
+        self.timer.cancel()
+
+        self.flush()
+        file, self.file = self.file, None
+        await asyncio.get_event_loop().run_in_executor(self.writer, file.close)
+        self.started = None
+        logger.info("Stopped recording gateway events, %s events in %s", self.recorded, self.path)
+
+    def stats(self) -> dict:
+        return {
+            'recording': self.recording,
+            'recorded': self.recorded + len(self.buffer),
+            'buffered': len(self.buffer),
+        }
+
+
+def user_data(user: discord.abc.User) -> dict:
+    return {"id": str(user.id), "username": user.name, "discriminator": user.discriminator,
+            "avatar": user.avatar, "bot": user.bot}
+
+
+def snapshot(guild: discord.Guild) -> dict:
+    """The parts of a GUILD_CREATE payload discord.py needs to rebuild `guild`
+
+    Parameters
+    ----------
+    guild : discord.Guild
+        Guild to snapshot
+
+    Returns
+    -------
+    dict
+        Gateway-shaped guild data
+    """
+
+    def overwrites(channel):
+        data = []
+        for target, overwrite in channel.overwrites.items():
+            allow, deny = overwrite.pair()
+            data.append({"id": str(target.id), "type": "role" if isinstance(target, discord.Role) else "member",
+                         "allow": str(allow.value), "deny": str(deny.value)})
+        return data
+
+    return {
+        "id": str(guild.id),
+        "name": guild.name,
+        "owner_id": str(guild.owner_id),
+        "member_count": guild.member_count,
+        "large": guild.large,
+        "features": guild.features,
+        "premium_tier": guild.premium_tier,
+        "emojis": [],
+        "roles": [{"id": str(role.id), "name": role.name, "permissions": str(role.permissions.value),
+                   "position": role.position, "color": role.colour.value, "hoist": role.hoist,
+                   "managed": role.managed, "mentionable": role.mentionable} for role in guild.roles],
+        "channels": [{"id": str(channel.id), "name": channel.name, "type": channel.type.value,
+                      "position": channel.position, "permission_overwrites": overwrites(channel),
+                      "parent_id": str(channel.category_id) if channel.category_id else None}
+                     for channel in guild.channels],
+        "members": [{"user": user_data(member), "nick": member.nick,
+                     "roles": [str(role.id) for role in member.roles[1:]],
+                     "joined_at": member.joined_at.isoformat() if member.joined_at else None,
+                     "deaf": False, "mute": False} for member in guild.members],
+    }
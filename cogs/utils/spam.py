@@ -0,0 +1,165 @@
+from array import array
+from collections import OrderedDict
+
+from cogs.utils.metrics import REGISTRY
+
+# fields kept per message in a user's ring
+FIELDS = 4
+# time of empty slots, outside of any window
+NEVER = -(1 << 62)
+
+SPAM_TRIPS = REGISTRY.counter("cuthbert_spam_trips_total", "Members caught by anti-spam, per rule", ("rule",))
+
+
+class UserState():
+    __slots__ = ('ring', 'next', 'seen')
+
+    def __init__(self, ring: array):
+        # the user's last messages: time (ms), content hash, mentions, attachments
+        self.ring = ring
+        self.next = 0
+        self.seen = 0.0
+
+
+class SpamEngine():
+    """Per-user sliding window counters for message rate, duplicate content,
+    mentions and attachments.
+
+    Every user gets a fixed-size ring of their last messages, so checking a
+    message looks at a constant number of slots however many users are
+    talking. Sums over a window (mentions, attachments) only see the
+    messages still in the ring, which is enough: filling the ring inside a
+    window trips the rate limit first.
+
+    Users are kept in least recently seen order and dropped once they've
+    been quiet for longer than the longest window, since nothing they sent
+    can count anymore, or when there are more than `max_users`.
+    """
+
+    def __init__(self, rate: tuple = (7, 5.0), duplicates: tuple = (4, 15.0), mentions: tuple = (8, 10.0),
+                 attachments: tuple = (6, 10.0), ring: int = 10, max_users: int = 100000):
+        """Initialize engine
+
+        Parameters
+        ----------
+        rate : tuple, optional
+            Messages per seconds, by default 7 in 5 seconds
+        duplicates : tuple, optional
+            Messages with the same content per seconds, by default 4 in 15 seconds
+        mentions : tuple, optional
+            User and role mentions per seconds, by default 8 in 10 seconds
+        attachments : tuple, optional
+            Attachments per seconds, by default 6 in 10 seconds
+        ring : int, optional
+            Messages remembered per user, at least the rate and duplicate limits, by default 10
+        max_users : int, optional
+            Most users tracked at once, by default 100000
+        """
+
+        self.rules = (("rate", rate), ("duplicates", duplicates), ("mentions", mentions), ("attachments", attachments))
+        self.rate_limit, self.rate_ms = rate[0], int(rate[1] * 1000)
+        self.duplicate_limit, self.duplicate_ms = duplicates[0], int(duplicates[1] * 1000)
+        self.mention_limit, self.mention_ms = mentions[0], int(mentions[1] * 1000)
+        self.attachment_limit, self.attachment_ms = attachments[0], int(attachments[1] * 1000)
+        self.ring = max(ring, rate[0], duplicates[0])
+        self.empty = array('q', [NEVER, 0, 0, 0] * self.ring)
+        self.idle = max(window for _, (_, window) in self.rules)
+        self.max_users = max_users
+
+        self.users = OrderedDict()
+
+        self.checked = 0
+        self.evicted = 0
+        self.tripped = {name: 0 for name, _ in self.rules}
+
+    def check(self, user_id: int, now: float, content_hash: int, mentions: int, attachments: int) -> str:
+        """Count a message and check it against every rule. A user who trips
+        a rule starts over with empty counters.
+
+        Parameters
+        ----------
+        user_id : int
+            Author of the message
+        now : float
+            Time of the message in seconds, from a monotonic clock
+        content_hash : int
+            Hash of the message content, 0 if it has none
+        mentions : int
+            User and role mentions in the message
+        attachments : int
+            Attachments in the message
+
+        Returns
+        -------
+        str
+            Description of the rule that tripped, or None
+        """
+
+        self.checked += 1
+        users = self.users
+        state = users.get(user_id)
+        if state is None:
+            self.evict(now)
+            state = users[user_id] = UserState(self.empty[:])
+        else:
+            users.move_to_end(user_id)
+        state.seen = now
+
+        ms = int(now * 1000)
+        ring = state.ring
+        slot = state.next * FIELDS
+        ring[slot] = ms
+        ring[slot + 1] = content_hash
+        ring[slot + 2] = mentions
+        ring[slot + 3] = attachments
+        state.next = (state.next + 1) % self.ring
+
+        count = same = mention_sum = attachment_sum = 0
+        for i in range(0, len(ring), FIELDS):
+            age = ms - ring[i]
+            if age <= self.rate_ms:
+                count += 1
+            if age <= self.duplicate_ms and content_hash and ring[i + 1] == content_hash:
+                same += 1
+            if age <= self.mention_ms:
+                mention_sum += ring[i + 2]
+            if age <= self.attachment_ms:
+                attachment_sum += ring[i + 3]
+
+        if count >= self.rate_limit:
+            return self._trip(user_id, "rate", count)
+        if same >= self.duplicate_limit:
+            return self._trip(user_id, "duplicates", same)
+        if mention_sum >= self.mention_limit:
+            return self._trip(user_id, "mentions", mention_sum)
+        if attachment_sum >= self.attachment_limit:
+            return self._trip(user_id, "attachments", attachment_sum)
+        return None
+
+    def _trip(self, user_id: int, name: str, value: int) -> str:
+        del self.users[user_id]
+        self.tripped[name] += 1
+        SPAM_TRIPS.inc((name,))
+        window = dict(self.rules)[name][1]
+        what = {"rate": "messages", "duplicates": "identical messages"}.get(name, name)
+        return f"{value} {what} in {window:g}s"
+
+    def evict(self, now: float) -> None:
+        """Drop users who've been quiet for longer than the longest window,
+        and the least recently seen ones past `max_users`"""
+
+        users = self.users
+        while users:
+            user_id, state = next(iter(users.items()))
+            if now - state.seen <= self.idle and len(users) < self.max_users:
+                break
+            del users[user_id]
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self.users),
+            'checked': self.checked,
+            'evicted': self.evicted,
+            'tripped': dict(self.tripped),
+        }
@@ -1,14 +1,15 @@
+import asyncio
 import logging
 from datetime import datetime
 
 import discord
 from apscheduler.executors.pool import ThreadPoolExecutor
-from apscheduler.jobstores.mongodb import MongoDBJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from cogs.utils.jobstore import AsyncMongoJobStore
 from cogs.utils.logging import prepare_unmute_log
 
 jobstores = {
-    'default': MongoDBJobStore(database="cuthbert", collection="jobs", host="127.0.0.1"),
+    'default': AsyncMongoJobStore(database="cuthbert", collection="jobs", host="127.0.0.1"),
 }
 
 executors = {
@@ -43,7 +44,10 @@ class Tasks():
 
         self.tasks = AsyncIOScheduler(
             jobstores=jobstores, executors=executors, job_defaults=job_defaults, event_loop=bot.loop)
-        self.tasks.start()
+        # stay paused until `reconcile` has handled unmutes that were missed while
+        # we were offline, otherwise APScheduler drops them as misfires
+        self.tasks.start(paused=True)
+        self.reconciled = False
 
     def schedule_unmute(self, id: int, date: datetime) -> None:
         """Create a task to unmute user given by ID `id`, at time `date`
@@ -70,6 +74,109 @@ class Tasks():
 
         self.tasks.remove_job(str(id), 'default')
 
+    async def reconcile(self, batch_size: int = 10, batch_delay: float = 1.0) -> dict:
+        """Compare pending unmute jobs against members who have the mute role, run any
+        unmutes that were missed while the bot was offline, then start the scheduler.
+        Should be called once the member cache is ready. If the guild or the mute
+        role can't be found yet, the scheduler stays paused and the next call (on
+        the next ready event) tries again.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Overdue unmutes to run concurrently, by default 10
+        batch_delay : float, optional
+            Seconds to wait between batches, to stay clear of rate limits, by default 1.0
+
+        Returns
+        -------
+        dict
+            Counts of overdue unmutes, removed orphan jobs and muted members without a job,
+            or None if there was nothing to reconcile against
+        """
+
+        if self.reconciled:
+            return None
+        self.reconciled = True
+
+        try:
+            report = await self._reconcile(batch_size, batch_delay)
+        except Exception:
+            # some unmutes may have run already, don't hold back the rest
+            self.tasks.resume()
+            raise
+
+        if report is None:
+            # resuming now would run every overdue unmute without checking who's still muted
+            self.reconciled = False
+            logging.warning("Couldn't find the guild or the mute role, unmute scheduler stays paused until the next ready")
+            return None
+
+        self.tasks.resume()
+        logging.info(f"Mute reconciliation: {report}")
+        return report
+
+    async def _reconcile(self, batch_size: int, batch_delay: float) -> dict:
+        guild = BOT_GLOBAL.get_guild(BOT_GLOBAL.guild_id)
+        mute_role = guild.get_role(BOT_GLOBAL.role_mute) if guild else None
+        if mute_role is None:
+            return None
+
+        # the job store holds every pending job in memory, loaded in a single query at startup
+        jobs = self.tasks.get_jobs()
+        muted = {member.id for member in mute_role.members}
+
+        overdue = []
+        orphan_jobs = []
+        scheduled = set()
+        for job in jobs:
+            if job.func_ref != f"{__name__}:unmute_callback" or job.next_run_time is None:
+                continue
+            id = job.args[0]
+            scheduled.add(id)
+            if id not in muted:
+                # member left or was unmuted by hand, nothing to do anymore
+                orphan_jobs.append(job.id)
+            elif job.next_run_time <= datetime.now(job.next_run_time.tzinfo):
+                overdue.append(id)
+                orphan_jobs.append(job.id)
+
+        for job_id in orphan_jobs:
+            self.tasks.remove_job(job_id, 'default')
+
+        for i in range(0, len(overdue), batch_size):
+            results = await asyncio.gather(*(remove_mute(id) for id in overdue[i:i + batch_size]), return_exceptions=True)
+            for id, result in zip(overdue[i:i + batch_size], results):
+                if isinstance(result, Exception):
+                    logging.error(f"Failed to unmute {id} during reconciliation: {result!r}")
+            if i + batch_size < len(overdue):
+                await asyncio.sleep(batch_delay)
+
+        # permanent mutes also end up here, so these are only reported
+        unscheduled = muted - scheduled
+
+        report = {
+            "overdue": len(overdue),
+            "orphan_jobs": len(orphan_jobs) - len(overdue),
+            "muted_without_job": len(unscheduled),
+        }
+
+        private_chan = guild.get_channel(BOT_GLOBAL.channel_private)
+        if private_chan and (overdue or orphan_jobs or unscheduled):
+            embed = discord.Embed(title="Mute reconciliation")
+            embed.color = discord.Color.gold()
+            embed.add_field(name="Missed unmutes", value=f"{len(overdue)} processed", inline=True)
+            embed.add_field(name="Orphaned jobs", value=f"{report['orphan_jobs']} removed", inline=True)
+            members = ", ".join(f"<@{id}>" for id in list(unscheduled)[:30])
+            if len(unscheduled) > 30:
+                members += f" and {len(unscheduled) - 30} more"
+            embed.add_field(name="Muted without unmute job",
+                            value=members or "None", inline=False)
+            embed.timestamp = datetime.now()
+            await private_chan.send(embed=embed)
+
+        return report
+
 
 def unmute_callback(id: int) -> None:
     """Callback function for actually unmuting. Creates asyncio task
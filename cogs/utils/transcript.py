@@ -0,0 +1,147 @@
+import gzip
+import json
+import tempfile
+
+import discord
+
+FORMATS = ("txt", "txt.gz", "jsonl", "jsonl.gz")
+
+# gzip holds some output back in its compressor, leave room for it when deciding to roll over
+COMPRESSION_SLACK = 256 * 1024
+
+
+class TranscriptWriter():
+    """Streams a transcript of messages into one or more files, starting a new
+    part whenever the current one would go over the upload size limit.
+
+    Each part is a temporary file that stays in memory up to 1MB and spills
+    to disk after that, so large transcripts don't have to fit in memory.
+    """
+
+    def __init__(self, name: str, format: str = "txt", max_size: int = 8 * 1024 * 1024):
+        """Initialize writer
+
+        Parameters
+        ----------
+        name : str
+            Base file name, without extension
+        format : str, optional
+            One of "txt", "txt.gz", "jsonl" or "jsonl.gz", by default "txt"
+        max_size : int, optional
+            Size limit of a single file in bytes, by default 8MB
+        """
+
+        if format not in FORMATS:
+            raise ValueError(f"Unknown transcript format {format}")
+
+        self.name = name
+        self.format = format
+        self.jsonl = format.startswith("jsonl")
+        self.compress = format.endswith(".gz")
+        self.max_size = max_size - (COMPRESSION_SLACK if self.compress else 0)
+
+        self.parts = []
+        self.raw = None
+        self.stream = None
+        self.count = 0
+        self._open_part()
+
+    def write(self, message: discord.Message) -> None:
+        """Append a message to the transcript
+
+        Parameters
+        ----------
+        message : discord.Message
+            Message to write
+        """
+
+        if self.jsonl:
+            line = json.dumps({
+                "id": message.id,
+                "author_id": message.author.id,
+                "author": str(message.author),
+                "created_at": message.created_at.isoformat(),
+                "content": message.content,
+                "attachments": [attachment.url for attachment in message.attachments],
+            }) + "\n"
+        else:
+            line = f'{message.author} ({message.author.id}) [{message.created_at.strftime("%B %d, %Y, %I:%M %p")}]) UTC\n'
+            line += message.content
+            for attachment in message.attachments:
+                line += f'\n{attachment.url}'
+            line += "\n\n"
+
+        data = line.encode("UTF-8")
+        if self.count and self.raw.tell() + len(data) > self.max_size:
+            self._close_part()
+            self._open_part()
+
+        self.stream.write(data)
+        self.count += 1
+
+    def files(self) -> list:
+        """Finish the transcript
+
+        Returns
+        -------
+        list
+            A `discord.File` per part
+        """
+
+        self._close_part()
+        files = []
+        for i, part in enumerate(self.parts):
+            suffix = f".part{i + 1}" if len(self.parts) > 1 else ""
+            files.append(discord.File(part, f"{self.name}{suffix}.{self.format}"))
+        return files
+
+    def _open_part(self) -> None:
+        self.raw = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb") if self.compress else self.raw
+        self.count = 0
+
+    def _close_part(self) -> None:
+        if self.raw is None:
+            return
+        if self.compress:
+            self.stream.close()
+        self.raw.seek(0)
+        self.parts.append(self.raw)
+        self.raw = self.stream = None
+
+
+def summarize_members(members: list, limit: int = 1024) -> str:
+    """Mentions of `members` as an English list that fits in `limit` characters,
+    i.e "@a, @b and 3 others"
+
+    Parameters
+    ----------
+    members : list
+        Users to mention
+    limit : int, optional
+        Most characters to use, by default 1024 (embed field limit)
+
+    Returns
+    -------
+    str
+        The list
+    """
+
+    mentions = []
+    length = 0
+    for member in members:
+        mention = member.mention
+        # leave room for ", " and " and N others"
+        if length + len(mention) + 2 > limit - 20:
+            break
+        mentions.append(mention)
+        length += len(mention) + 2
+
+    others = len(members) - len(mentions)
+    if not members:
+        return ""
+    if others:
+        return ", ".join(mentions) + f" and {others} others"
+    if len(mentions) == 1:
+        return mentions[0]
+    return ", ".join(mentions[:-1]) + f" and {mentions[-1]}"
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+from cogs.utils.metrics import REGISTRY
+
+USER_LOOKUPS = REGISTRY.counter(
+    "cuthbert_user_lookups_total", "User lookups by where the answer came from", ("source",))
+
+
+class UserResolver():
+    """Looks up users by ID without asking the API more than needed.
+
+    Lookups try our own cache first, then the users discord.py already has
+    (members of our guilds), and only then `fetch_user`. Fetched users are
+    kept in an LRU cache for `ttl` seconds. Unknown IDs are remembered for
+    `negative_ttl` seconds, so a raid list with dead accounts doesn't cost a
+    round trip per attempt. Concurrent lookups of the same ID share a
+    single fetch.
+    """
+
+    def __init__(self, bot: discord.Client, size: int = 10000, ttl: float = 3600, negative_ttl: float = 300):
+        """Initialize resolver
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        size : int, optional
+            Most users (and unknown IDs) kept, by default 10000
+        ttl : float, optional
+            How long (seconds) fetched users are kept, by default 1 hour
+        negative_ttl : float, optional
+            How long (seconds) unknown IDs are remembered, by default 5 minutes
+        """
+
+        self.bot = bot
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        # ID -> (expires at, user or the NotFound we got)
+        self.cache = OrderedDict()
+        self.pending = {}
+
+        self.lookups = {source: 0 for source in ("cache", "members", "negative", "coalesced", "api")}
+
+    async def resolve(self, id: int) -> discord.User:
+        """Find a user by ID
+
+        Parameters
+        ----------
+        id : int
+            ID of the user
+
+        Returns
+        -------
+        discord.User
+            The user
+
+        Raises
+        ------
+        discord.NotFound
+            No user has this ID
+        """
+
+        entry = self.cache.get(id)
+        if entry is not None:
+            expires, user = entry
+            if expires > time.monotonic():
+                self.cache.move_to_end(id)
+                if isinstance(user, discord.NotFound):
+                    self._count("negative")
+                    raise user
+                self._count("cache")
+                return user
+            del self.cache[id]
+
+        user = self.bot.get_user(id)
+        if user is not None:
+            self._count("members")
+            return user
+
+        task = self.pending.get(id)
+        if task is None:
+            task = self.pending[id] = asyncio.get_event_loop().create_task(self._fetch(id))
+            task.add_done_callback(lambda _: self.pending.pop(id, None))
+        else:
+            self._count("coalesced")
+        # a cancelled caller shouldn't cancel the fetch for everyone else
+        return await asyncio.shield(task)
+
+    async def _fetch(self, id: int) -> discord.User:
+        self._count("api")
+        try:
+            user = await self.bot.fetch_user(id)
+        except discord.NotFound as e:
+            self._store(id, e, self.negative_ttl)
+            raise
+        self._store(id, user, self.ttl)
+        return user
+
+    def _store(self, id: int, value, ttl: float) -> None:
+        self.cache[id] = (time.monotonic() + ttl, value)
+        self.cache.move_to_end(id)
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+
+    def _count(self, source: str) -> None:
+        self.lookups[source] += 1
+        USER_LOOKUPS.inc((source,))
+
+    def invalidate(self, id: int) -> None:
+        self.cache.pop(id, None)
+
+    def stats(self) -> dict:
+        """Snapshot of resolver metrics
+
+        Returns
+        -------
+        dict
+            Cache size, lookups per source, API calls saved and hit rate
+        """
+
+        total = sum(self.lookups.values())
+        saved = total - self.lookups['api']
+        return {
+            'size': len(self.cache),
+            'lookups': dict(self.lookups),
+            'saved_calls': saved,
+            'hit_rate': saved / total if total else 0.0,
+        }
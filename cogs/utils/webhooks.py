@@ -0,0 +1,169 @@
+import asyncio
+import logging
+
+import aiohttp
+import discord
+from cogs.utils.outbound import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_NAME = "cuthbert logs"
+# executions per seconds a single webhook is allowed
+WEBHOOK_LIMIT = (5, 2.0)
+
+
+class Lane():
+    __slots__ = ('webhook', 'bucket', 'sent')
+
+    def __init__(self, webhook: discord.Webhook, bucket: TokenBucket):
+        self.webhook = webhook
+        self.bucket = bucket
+        self.sent = 0
+
+
+class WebhookPool():
+    """Delivers messages to one channel through a pool of webhooks.
+
+    Every webhook has its own rate limit, separate from the bot's channel
+    send route and from its global limit, so spreading log messages over a
+    few of them multiplies how many we can post. Webhooks are picked round
+    robin, skipping any that a token bucket says are out of requests, and
+    they all share one aiohttp session (and its connection pool).
+    """
+
+    def __init__(self, bot: discord.Client, channel: discord.TextChannel, size: int = 4,
+                 session: aiohttp.ClientSession = None, base: str = None):
+        """Initialize pool
+
+        Parameters
+        ----------
+        bot : discord.Client
+            instance of Discord client
+        channel : discord.TextChannel
+            Channel to deliver to
+        size : int, optional
+            Number of webhooks to use, by default 4
+        session : aiohttp.ClientSession, optional
+            Session to send with, by default one is created (and closed) by the pool
+        base : str, optional
+            API base URL, only to point the pool at a local stand-in
+        """
+
+        self.bot = bot
+        self.channel = channel
+        self.size = size
+        self.session = session
+        self.own_session = session is None
+        self.base = base
+
+        self.lanes = []
+        self.next = 0
+        # one message in flight per webhook
+        self.slots = asyncio.Semaphore(size)
+
+        self.sent = 0
+        self.retried = 0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.lanes)
+
+    async def setup(self) -> None:
+        """Reuse our webhooks on the channel and create any that are missing
+
+        Raises
+        ------
+        discord.Forbidden
+            We're not allowed to manage webhooks in the channel
+        """
+
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.size * 2))
+
+        existing = [webhook for webhook in await self.channel.webhooks()
+                    if webhook.name == WEBHOOK_NAME and webhook.token]
+        for webhook in existing[:self.size]:
+            self._add(webhook.id, webhook.token)
+        for _ in range(self.size - len(self.lanes)):
+            webhook = await self.channel.create_webhook(name=WEBHOOK_NAME, reason="Log delivery")
+            self._add(webhook.id, webhook.token)
+
+    def _add(self, id: int, token: str) -> None:
+        # adapters are bound to a single webhook, the session behind them is shared
+        adapter = discord.AsyncWebhookAdapter(self.session)
+        if self.base is not None:
+            adapter.BASE = self.base
+        webhook = discord.Webhook.partial(id, token, adapter=adapter)
+        self.lanes.append(Lane(webhook, TokenBucket(*WEBHOOK_LIMIT, asyncio.get_event_loop().time())))
+
+    async def _acquire(self) -> Lane:
+        """Next webhook round robin that has a request left, waiting for one if none do"""
+
+        loop = asyncio.get_event_loop()
+        while True:
+            if not self.lanes:
+                raise RuntimeError(f"No webhooks left for channel {self.channel.id}")
+
+            now = loop.time()
+            for i in range(len(self.lanes)):
+                lane = self.lanes[(self.next + i) % len(self.lanes)]
+                lane.bucket.refill(now)
+                if lane.bucket.tokens >= 1:
+                    lane.bucket.tokens -= 1
+                    self.next = (self.next + i + 1) % len(self.lanes)
+                    return lane
+
+            await asyncio.sleep(min(lane.bucket.ready_at(now) for lane in self.lanes) - now)
+
+    async def send(self, embeds: list = None, files: list = None) -> None:
+        """Send a message through the pool, retrying through other webhooks if one fails
+
+        Parameters
+        ----------
+        embeds : list, optional
+            Up to 10 embeds
+        files : list, optional
+            Files to upload
+
+        Raises
+        ------
+        Exception
+            The last error, if every attempt failed
+        """
+
+        error = None
+        for attempt in range(3):
+            for file in files or ():
+                file.reset(seek=attempt)
+
+            lane = await self._acquire()
+            try:
+                await lane.webhook.send(embeds=embeds, files=files or None, username=self.bot.user.name,
+                                        avatar_url=str(self.bot.user.avatar_url),
+                                        allowed_mentions=discord.AllowedMentions.none())
+            except discord.NotFound as e:
+                # the webhook was deleted, stop using it
+                error = e
+                if lane in self.lanes:
+                    self.lanes.remove(lane)
+                    logger.warning(f"Log webhook {lane.webhook.id} is gone, {len(self.lanes)} left")
+            except (discord.HTTPException, aiohttp.ClientError) as e:
+                error = e
+            else:
+                lane.sent += 1
+                self.sent += 1
+                return
+            self.retried += 1
+        raise error
+
+    async def close(self) -> None:
+        if self.own_session and self.session is not None:
+            await self.session.close()
+
+    def stats(self) -> dict:
+        return {
+            'webhooks': len(self.lanes),
+            'sent': self.sent,
+            'retried': self.retried,
+            'per_webhook': [lane.sent for lane in self.lanes],
+        }
@@ -0,0 +1,52 @@
+import time
+
+
+class SlidingWindow():
+    """Detects when more than `threshold` events happen within `window` seconds.
+
+    Only the last `threshold` timestamps are kept, in a ring buffer, so
+    recording an event is O(1) no matter how fast events come in.
+    """
+
+    __slots__ = ('threshold', 'window', '_ring', '_index')
+
+    def __init__(self, threshold: int, window: float):
+        """Initialize window
+
+        Parameters
+        ----------
+        threshold : int
+            Number of events allowed per window, at least 1
+        window : float
+            Window length in seconds
+        """
+
+        if threshold < 1:
+            raise ValueError("threshold must be at least 1")
+
+        self.threshold = threshold
+        self.window = window
+        self._ring = [float('-inf')] * threshold
+        self._index = 0
+
+    def hit(self, now: float = None) -> bool:
+        """Record an event
+
+        Parameters
+        ----------
+        now : float, optional
+            Timestamp of the event, by default time.monotonic()
+
+        Returns
+        -------
+        bool
+            True if this event puts the rate over the threshold
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        oldest = self._ring[self._index]
+        self._ring[self._index] = now
+        self._index = (self._index + 1) % self.threshold
+        return now - oldest <= self.window
@@ -2,7 +2,18 @@ import logging
 import os
 
 import discord
+from cogs.utils.audit import AuditSink
+from cogs.utils.cases import CaseStore
+from cogs.utils.dispatcher import LogDispatcher
+from cogs.utils.filters import FilterStore
+from cogs.utils.loop_monitor import LoopMonitor
+from cogs.utils.message_cache import MessageCache
+from cogs.utils.metrics import instrument_http
+from cogs.utils.outbound import OutboundScheduler, respond_first
+from cogs.utils.permissions import Level, PermissionResolver
+from cogs.utils.recorder import GatewayRecorder
 from cogs.utils.tasks import Tasks
+from cogs.utils.users import UserResolver
 from discord.ext import commands
 from dotenv import find_dotenv, load_dotenv
 
@@ -22,6 +33,7 @@ def get_prefix(bot, message):
 
 initial_extensions = [
                     'cogs.commands.modactions',
+                    'cogs.commands.cases',
                     # 'cogs.commands.mod.modutils',
                     # 'cogs.commands.misc.admin',
                     # 'cogs.commands.misc.genius',
@@ -32,9 +44,11 @@ initial_extensions = [
                     # 'cogs.commands.info.devices',
                     'cogs.commands.help',
                     # 'cogs.commands.info.stats',
+                    'cogs.commands.stats',
                     # 'cogs.commands.info.tags',
                     # 'cogs.commands.info.userinfo',
-                    # 'cogs.commands.mod.filter',
+                    'cogs.commands.filter',
+                    'cogs.commands.antispam',
                     # 'cogs.monitors.birthday',
                     # 'cogs.monitors.boosteremojis',
                     'cogs.commands.logs',
@@ -49,8 +63,38 @@ intents.messages = True
 intents.presences = True
 mentions = discord.AllowedMentions(everyone=False, users=True, roles=False)
 
-bot = commands.Bot(command_prefix=get_prefix,
-                   intents=intents, allowed_mentions=mentions)
+class Bot(commands.Bot):
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        self.invalidate_help()
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        self.invalidate_help()
+
+    def invalidate_help(self):
+        # the help cog caches every cog's commands, loading or unloading one makes that stale
+        help = self.get_cog("Utilities")
+        if help is not None:
+            help.invalidate_index()
+
+    async def close(self):
+        self.loop_monitor.stop()
+        if self.recorder is not None:
+            await self.recorder.stop()
+        # flush anything still buffered before we lose the connection
+        logs = self.get_cog("Logging")
+        if logs is not None:
+            await logs.flush()
+        await self.audit.drain()
+        await self.log_dispatcher.drain()
+        await self.log_dispatcher.close()
+        self.message_cache.close()
+        await super().close()
+
+
+bot = Bot(command_prefix=get_prefix,
+          intents=intents, allowed_mentions=mentions)
 bot.max_messages = 10000
 
 
@@ -64,11 +108,34 @@ async def send_error(ctx, error):
 # Here we load our extensions(cogs) listed above in [initial_extensions].
 if __name__ == '__main__':
     bot.tasks = Tasks(bot)
+    bot.log_dispatcher = LogDispatcher(bot)
+    bot.cases = CaseStore(database="cuthbert", collection="cases", host="127.0.0.1")
+    bot.filters = FilterStore(database="cuthbert", collection="filter", host="127.0.0.1")
+    bot.audit = AuditSink(bot, database="cuthbert", collection="audit", host="127.0.0.1")
+    bot.message_cache = MessageCache(os.environ.get("MESSAGE_CACHE_PATH", "messages.db"),
+                                     hot_size=int(os.environ.get("MESSAGE_CACHE_SIZE", 50000)),
+                                     retention=int(os.environ.get("MESSAGE_CACHE_DAYS", 7)) * 86400)
     bot.channel_public = int(os.environ.get("CHANNEL_PUBLIC_LOGS"))
     bot.channel_private = int(os.environ.get("CHANNEL_PRIVATE_LOGS"))
     bot.role_mod = int(os.environ.get("ROLE_MODERATOR"))
     bot.role_mute = int(os.environ.get("ROLE_MUTE"))
     bot.guild_id = int(os.environ.get("GUILD_ID"))
+    bot.perms = PermissionResolver(bot, {bot.role_mod: Level.MOD})
+    bot.user_resolver = UserResolver(bot)
+    bot.raid_threshold = int(os.environ.get("RAID_THRESHOLD", 10))
+    bot.raid_window = int(os.environ.get("RAID_WINDOW", 60))
+    bot.transcript_format = os.environ.get("BULK_TRANSCRIPT_FORMAT", "txt")
+    bot.filter_mute = int(os.environ.get("FILTER_MUTE", 600))
+    bot.spam_mute = int(os.environ.get("SPAM_MUTE", 900))
+    bot.metrics_port = int(os.environ.get("METRICS_PORT", 9090))
+    bot.log_webhooks = int(os.environ.get("LOG_WEBHOOKS", 0))
+    instrument_http(bot.http)
+    bot.outbound = OutboundScheduler(bot.http)
+    bot.before_invoke(respond_first)
+    bot.loop_monitor = LoopMonitor(bot, threshold=int(os.environ.get("LOOP_SLOW_THRESHOLD", 100)) / 1000)
+    bot.loop_monitor.start()
+    record_path = os.environ.get("GATEWAY_RECORD_PATH")
+    bot.recorder = GatewayRecorder(bot, record_path) if record_path else None
     bot.send_error = send_error
     bot.remove_command("help")
     for extension in initial_extensions:
@@ -78,6 +145,11 @@ if __name__ == '__main__':
 @bot.event
 async def on_ready():
     await bot.wait_until_ready()
+    await bot.tasks.reconcile()
+    if bot.log_webhooks:
+        await bot.log_dispatcher.use_webhooks(bot.get_channel(bot.channel_private), bot.log_webhooks)
+    if bot.recorder is not None:
+        bot.recorder.start()
 
     print(
         f'\n\nLogged in as: {bot.user.name} - {bot.user.id}\nVersion: {discord.__version__}\n')